@@ -1,5 +1,8 @@
+from asgiref.sync import sync_to_async
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from core.metrics import stage
+
 class CookieJWTAuthentication(JWTAuthentication):
     """
     Custom JWT authentication class that retrieves the token from cookies.
@@ -9,8 +12,30 @@ class CookieJWTAuthentication(JWTAuthentication):
         access_token = request.COOKIES.get("access_token")
 
         if access_token:
-            validated_token = self.get_validated_token(access_token)
-            user = self.get_user(validated_token)
+            with stage("jwt"):
+                validated_token = self.get_validated_token(access_token)
+            with stage("user"):
+                user = self.get_user(validated_token)
             return (user, validated_token)
 
-        return super().authenticate(request)
\ No newline at end of file
+        return super().authenticate(request)
+
+    async def aauthenticate(self, request):
+        """
+        Async counterpart of ``authenticate`` for plain Django async views.
+        The token is decoded inline; only the user lookup runs in a thread.
+        """
+        raw_token = request.COOKIES.get("access_token")
+        if not raw_token:
+            header = self.get_header(request)
+            if header is None:
+                return None
+            raw_token = self.get_raw_token(header)
+            if raw_token is None:
+                return None
+
+        with stage("jwt"):
+            validated_token = self.get_validated_token(raw_token)
+        with stage("user"):
+            user = await sync_to_async(self.get_user)(validated_token)
+        return (user, validated_token)
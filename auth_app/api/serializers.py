@@ -1,14 +1,31 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 from django.contrib.auth import get_user_model, authenticate
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.conf import settings
+from django.contrib.auth.models import update_last_login
+from django.db.models.functions import Lower
+from rest_framework_simplejwt.settings import api_settings
+from .tokens import CachedBlacklistRefreshToken
 
 User = get_user_model()
 
+
+def users_by_email(email):
+    """ Case-insensitive e-mail lookup served by the ``auth_user_email_lower_uniq`` index.
+        The index is partial (``WHERE email <> ''``); excluding empty addresses
+        lets Postgres prove the predicate and use it.
+        Args:
+            email (str): The e-mail address to look up.
+        Returns:
+            QuerySet: The users whose e-mail matches.
+    """
+    return User.objects.exclude(email='').annotate(email_lower=Lower('email')).filter(email_lower=email.lower())
+
+
 class RegistrationSerializer(serializers.ModelSerializer):
     confirmed_password = serializers.CharField(write_only=True)
     
@@ -42,7 +59,7 @@ class RegistrationSerializer(serializers.ModelSerializer):
             Returns:
                 str: The validated email address.
         """
-        if User.objects.filter(email=value).exists():
+        if users_by_email(value).exists():
             raise serializers.ValidationError("A user with this email already exists.")
         return value
     
@@ -70,6 +87,7 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     Used to customize the token claims if needed.
     Currently, it does not add any additional claims.
     """
+    token_class = CachedBlacklistRefreshToken
     email = serializers.EmailField()
     password = serializers.CharField(write_only=True)  
     
@@ -85,16 +103,18 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     
     def validate(self, attrs):
         """
-        Validates the user's credentials.
-        Checks the email and password, ensures the user exists and is active.
-        If the credentials are valid, the username is added for token generation.
+        Validates the user's credentials and issues the token pair.
+        The user is looked up through the case-insensitive e-mail index and the
+        password is hashed exactly once; tokens are created directly instead of
+        going through ``authenticate()``, which would hash it a second time.
         """
         email = attrs.get('email')
         password = attrs.get('password')
 
-        try:
-            user = User.objects.get(email=email)
-        except User.DoesNotExist:
+        user = users_by_email(email).first()
+        if user is None:
+            # Hash anyway, so unknown addresses take as long as wrong passwords.
+            User().set_password(password)
             raise serializers.ValidationError({"detail": "email or password does not exist."})
 
         if not user.check_password(password):
@@ -105,10 +125,19 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
                 {"detail": "Account is not active. Please check your email for the activation link."}
             )
 
-        attrs['username'] = user.username
-        data = super().validate(attrs)
-        return data
+        self.user = user
+        refresh = self.get_token(user)
+        if api_settings.UPDATE_LAST_LOGIN:
+            update_last_login(None, user)
+        return {'refresh': str(refresh), 'access': str(refresh.access_token)}
     
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Token refresh serializer checking the Redis-backed blacklist.
+    """
+    token_class = CachedBlacklistRefreshToken
+
+
 class ResetPasswordSerializer(serializers.Serializer):
     """
     Serializer for handling password reset requests.
@@ -125,7 +154,7 @@ class ResetPasswordSerializer(serializers.Serializer):
             Returns:
                 str: The validated email address.
         """
-        if not User.objects.filter(email=value).exists():
+        if not users_by_email(value).exists():
             raise serializers.ValidationError({"detail": "Please enter a valid email address."})
         return value
     
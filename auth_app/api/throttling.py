@@ -0,0 +1,111 @@
+import hashlib
+import logging
+import uuid
+
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+# Trims the window, counts and records the request in one round trip.
+# Returns 0 if the request is allowed, otherwise the milliseconds until the
+# oldest request in the window expires.
+SLIDING_WINDOW_SCRIPT = """
+local window = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+if redis.call('ZCARD', KEYS[1]) < limit then
+    redis.call('ZADD', KEYS[1], now, ARGV[3])
+    redis.call('PEXPIRE', KEYS[1], window)
+    return 0
+end
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+return math.max(1, tonumber(oldest[2]) + window - now)
+"""
+
+_script = None
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 60 * 60 * 24}
+
+
+def _sliding_window():
+    global _script
+    if _script is None:
+        _script = get_redis_connection("default").register_script(SLIDING_WINDOW_SCRIPT)
+    return _script
+
+
+def parse_rate(rate):
+    """
+        Parse a DRF rate string such as "5/min".
+
+        Returns:
+            tuple[int, int]: The number of requests and the window in seconds.
+    """
+    count, period = rate.split("/")
+    return int(count), PERIODS[period[0]]
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """
+    Sliding-window rate limit stored in Redis.
+
+    The rate is looked up in DEFAULT_THROTTLE_RATES under
+    ``<view.throttle_scope>_<kind>``, e.g. ``login_ip`` = "20/min". Views
+    without a rate for the scope are not throttled. If Redis is unavailable
+    requests are let through.
+    """
+    kind = None
+
+    def get_ident_value(self, request):
+        raise NotImplementedError(".get_ident_value() must be overridden")
+
+    def allow_request(self, request, view):
+        self.retry_after = None
+        scope = getattr(view, "throttle_scope", None)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(f"{scope}_{self.kind}")
+        ident = self.get_ident_value(request)
+        if not (scope and rate and ident):
+            return True
+
+        limit, window = parse_rate(rate)
+        key = f"videoflix:throttle:{scope}:{self.kind}:{ident}"
+        try:
+            wait_ms = _sliding_window()(keys=[key], args=[window * 1000, limit, uuid.uuid4().hex])
+        except RedisError:
+            logger.warning("Throttle %s unavailable, letting request through", key, exc_info=True)
+            return True
+        if wait_ms:
+            self.retry_after = wait_ms / 1000
+            logger.info("Throttled %s %s on %s", self.kind, ident, scope)
+            return False
+        return True
+
+    def wait(self):
+        return self.retry_after
+
+
+class IPSlidingWindowThrottle(SlidingWindowThrottle):
+    """
+    Limits requests per client IP (honours NUM_PROXIES).
+    """
+    kind = "ip"
+
+    def get_ident_value(self, request):
+        return self.get_ident(request)
+
+
+class EmailSlidingWindowThrottle(SlidingWindowThrottle):
+    """
+    Limits requests per e-mail address in the request body, whatever the source IP.
+    """
+    kind = "email"
+
+    def get_ident_value(self, request):
+        email = request.data.get("email") if hasattr(request.data, "get") else None
+        if not isinstance(email, str) or not email.strip():
+            return None
+        return hashlib.sha1(email.strip().lower().encode()).hexdigest()
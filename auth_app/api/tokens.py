@@ -0,0 +1,76 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import BlacklistMixin, RefreshToken
+
+logger = logging.getLogger(__name__)
+
+
+def _blacklist_key(jti):
+    return f"jwt:blacklist:{jti}"
+
+
+def revoke_jti(jti, expires_at):
+    """
+    Record a revoked JTI in the "token_blacklist" cache until ``expires_at`` (a Unix timestamp).
+    """
+    remaining = int(expires_at - time.time())
+    if remaining > 0:
+        caches["token_blacklist"].set(_blacklist_key(jti), 1, timeout=remaining)
+
+
+class CachedBlacklistRefreshToken(RefreshToken):
+    """
+    Refresh token whose blacklist lives in Redis instead of the
+    OutstandingToken/BlacklistedToken tables.
+
+    A revoked JTI is cached for the remaining lifetime of the token in the
+    non-evicting "token_blacklist" cache, so the refresh check is a single
+    lookup and entries expire on their own. With JWT_BLACKLIST_AUDIT the
+    database tables are written as well and consulted when Redis has no
+    entry (e.g. after a Redis data loss).
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        if settings.JWT_BLACKLIST_AUDIT:
+            return super().for_user(user)
+        # Skip BlacklistMixin.for_user, which inserts an OutstandingToken row per login.
+        return super(BlacklistMixin, cls).for_user(user)
+
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        if caches["token_blacklist"].get(_blacklist_key(jti)):
+            raise TokenError(_("Token is blacklisted"))
+        if settings.JWT_BLACKLIST_AUDIT and BlacklistedToken.objects.filter(token__jti=jti).exists():
+            revoke_jti(jti, self.payload["exp"])
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        """
+        Revoke this token until it expires; writes the audit rows if JWT_BLACKLIST_AUDIT is set.
+        """
+        revoke_jti(self.payload[api_settings.JTI_CLAIM], self.payload["exp"])
+        if settings.JWT_BLACKLIST_AUDIT:
+            return super().blacklist()
+        return None
+
+    def outstand(self):
+        if settings.JWT_BLACKLIST_AUDIT:
+            return super().outstand()
+        return None
+
+
+def prune_audit_tokens():
+    """
+    Periodic job removing expired rows from the blacklist audit tables.
+    """
+    call_command("flushexpiredtokens")
+    logger.info("Flushed expired tokens from the blacklist audit tables")
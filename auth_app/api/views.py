@@ -2,7 +2,6 @@ from rest_framework import status
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
@@ -13,12 +12,16 @@ from auth_app.api.authentication import CookieJWTAuthentication
 from auth_app.utils.activate_email import send_activation_email
 from auth_app.utils.password_reset_email import send_password_reset_email
 from core import settings
-from .serializers import CustomTokenObtainPairSerializer, RegistrationSerializer, ResetPasswordSerializer, ConfirmPasswordResetSerializer
+from .throttling import EmailSlidingWindowThrottle, IPSlidingWindowThrottle
+from .tokens import CachedBlacklistRefreshToken
+from .serializers import CustomTokenObtainPairSerializer, CustomTokenRefreshSerializer, RegistrationSerializer, ResetPasswordSerializer, ConfirmPasswordResetSerializer, users_by_email
 
 
 User = get_user_model()
 class RegistrationView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [IPSlidingWindowThrottle, EmailSlidingWindowThrottle]
+    throttle_scope = 'register'
     def post(self, request):
         """  Handle user registration by validating the input data, creating a new user, and returning an appropriate response.
 
@@ -47,6 +50,8 @@ class RegistrationView(APIView):
 
 class ActivateAccountView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [IPSlidingWindowThrottle]
+    throttle_scope = 'activate'
     def get(self, request, uidb64, token):
         """ Handle account activation by validating the provided UID and token, activating the user account if valid, and returning an appropriate response. 
 
@@ -73,6 +78,8 @@ class ActivateAccountView(APIView):
         
 class CookieTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
+    throttle_classes = [IPSlidingWindowThrottle, EmailSlidingWindowThrottle]
+    throttle_scope = 'login'
     def post(self, request, *args, **kwargs):
         '''Override the post method to set the JWT token in an HttpOnly cookie.
         Args:
@@ -115,6 +122,7 @@ class CookieTokenRefreshView(TokenRefreshView):
     """
     View for refreshing the access token using a cookie-based refresh token.
     """
+    serializer_class = CustomTokenRefreshSerializer
 
     def post(self, request, *args, **kwargs):
         """
@@ -170,7 +178,7 @@ class LogoutView(APIView):
         response = Response(
             {"detail": "Log-Out successfully! All Tokens will be deleted. Refresh token is now invalid."}, status=status.HTTP_200_OK)
         
-        token = RefreshToken(request.COOKIES.get("refresh_token"))
+        token = CachedBlacklistRefreshToken(request.COOKIES.get("refresh_token"))
         token.blacklist()
         response.delete_cookie("access_token")
         response.delete_cookie("refresh_token")
@@ -181,6 +189,8 @@ class LogoutView(APIView):
 class ResetPasswordView(APIView):
     permission_classes = [AllowAny]
     serializer_class = ResetPasswordSerializer
+    throttle_classes = [IPSlidingWindowThrottle, EmailSlidingWindowThrottle]
+    throttle_scope = 'password_reset'
     def post(self, request):
         """ Handle password reset requests by validating the provided email, generating a password reset link if the user exists, and returning an appropriate response.
 
@@ -192,7 +202,7 @@ class ResetPasswordView(APIView):
         serializer = self.serializer_class(data=request.data)
         if serializer.is_valid(raise_exception=True):
             email = serializer.validated_data['email']
-            user = User.objects.get(email=email)
+            user = users_by_email(email).get()
             uid = urlsafe_base64_encode(force_bytes(user.pk))
             token = default_token_generator.make_token(user)
             send_password_reset_email(user, uid, token)
@@ -207,6 +217,8 @@ class ResetPasswordView(APIView):
 class PasswordResetConfirmView(APIView):
     permission_classes = [AllowAny]
     serializer_class = ConfirmPasswordResetSerializer
+    throttle_classes = [IPSlidingWindowThrottle]
+    throttle_scope = 'password_confirm'
     def post(self, request, uidb64, token):
         """ Handle password reset confirmation by validating the provided UID and token, allowing the user to set a new password if valid, and returning an appropriate response.
 
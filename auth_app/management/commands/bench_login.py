@@ -0,0 +1,74 @@
+import time
+
+from django.contrib.auth import authenticate, get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+
+from auth_app.api.serializers import CustomTokenObtainPairSerializer
+
+User = get_user_model()
+PASSWORD = "Bench-passw0rd"
+
+
+def _double_hash_login(email):
+    """
+        The former login path: unindexed lookup, check_password, then authenticate() hashing again.
+    """
+    user = User.objects.get(email=email)
+    if not user.check_password(PASSWORD):
+        raise CommandError("Benchmark user rejected")
+    user = authenticate(username=user.username, password=PASSWORD)
+    refresh = TokenObtainPairSerializer.get_token(user)
+    return str(refresh), str(refresh.access_token)
+
+
+def _single_hash_login(email):
+    serializer = CustomTokenObtainPairSerializer(data={"email": email, "password": PASSWORD})
+    if not serializer.is_valid():
+        raise CommandError(f"Benchmark user rejected: {serializer.errors}")
+    return serializer.validated_data["refresh"], serializer.validated_data["access"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure logins per second on one core for the former double-hash path and the "
+        "single-hash serializer path. Users are created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1_000, help="Users in the table during the run.")
+        parser.add_argument("--logins", type=int, default=50, help="Logins per path.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            template = User(username="bench-login-template")
+            template.set_password(PASSWORD)
+            User.objects.bulk_create(
+                (
+                    User(
+                        username=f"bench-login-{i}",
+                        email=f"bench-login-{i}@example.com",
+                        password=template.password,
+                        is_active=True,
+                    )
+                    for i in range(options["users"])
+                ),
+                batch_size=5_000,
+            )
+            emails = [f"bench-login-{i % options['users']}@example.com" for i in range(options["logins"])]
+
+            self.stdout.write(f"{'path':<14} {'logins/s/core':>14} {'ms/login':>10}")
+            results = {}
+            for name, login in (("double-hash", _double_hash_login), ("single-hash", _single_hash_login)):
+                started = time.process_time()
+                wall_started = time.perf_counter()
+                for email in emails:
+                    login(email)
+                cpu = time.process_time() - started
+                wall = time.perf_counter() - wall_started
+                results[name] = len(emails) / cpu
+                self.stdout.write(f"{name:<14} {results[name]:>14.1f} {wall * 1000 / len(emails):>10.1f}")
+            self.stdout.write(f"speedup x{results['single-hash'] / results['double-hash']:.2f}")
+
+            transaction.set_rollback(True)
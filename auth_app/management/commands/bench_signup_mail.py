@@ -0,0 +1,136 @@
+import pickle
+import socketserver
+import statistics
+import threading
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+
+from auth_app.api.views import RegistrationView
+from auth_app.utils.mailer import OUTBOX_KEY, flush_outbox
+from core.jobs import hold_coalesced, release_coalesced
+from django_redis import get_redis_connection
+
+
+class SlowSMTPHandler(socketserver.StreamRequestHandler):
+    """
+    Minimal SMTP server that accepts every message and waits ``server.delay``
+    seconds before each reply, like an overloaded relay.
+    """
+
+    def reply(self, line):
+        time.sleep(self.server.delay)
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.reply("220 localhost slow SMTP stand-in")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.reply("250 localhost")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                self.server.received += 1
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+
+class SlowSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, delay):
+        super().__init__(("127.0.0.1", 0), SlowSMTPHandler)
+        self.delay = delay
+        self.received = 0
+
+
+def _summary(samples):
+    ordered = sorted(samples)
+    return statistics.median(ordered) * 1000, ordered[max(0, round(0.95 * len(ordered)) - 1)] * 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure sign-up latency against a local SMTP stand-in that answers slowly, "
+        "comparing the former inline send with the queued outbox and one batched flush. "
+        "Users are created in a transaction that is rolled back. Run this on a development "
+        "stack only: the flush job is held back while the benchmark drains the outbox itself."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--signups", type=int, default=50)
+        parser.add_argument("--delay-ms", type=int, default=200, help="Delay before every SMTP reply.")
+
+    def handle(self, *args, **options):
+        server = SlowSMTPServer(options["delay_ms"] / 1000)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address
+        smtp_settings = dict(
+            EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+            EMAIL_HOST=host, EMAIL_PORT=port, EMAIL_HOST_USER="", EMAIL_HOST_PASSWORD="",
+            EMAIL_USE_TLS=False, EMAIL_USE_SSL=False,
+        )
+        factory = APIRequestFactory()
+        # Without throttles: the 50 sign-ups would hit register_ip and fill the real throttle key.
+        view = RegistrationView.as_view(throttle_classes=[])
+        redis = get_redis_connection("default")
+
+        try:
+            with override_settings(**smtp_settings):
+                hold_coalesced(flush_outbox)
+                signup_times = []
+                with transaction.atomic():
+                    for i in range(options["signups"]):
+                        email = f"bench-signup-{i}-{time.time_ns()}@example.com"
+                        request = factory.post("/api/register/", {
+                            "email": email, "password": "Bench-passw0rd", "confirmed_password": "Bench-passw0rd",
+                        }, format="json")
+                        started = time.perf_counter()
+                        response = view(request)
+                        signup_times.append(time.perf_counter() - started)
+                        if response.status_code != 201:
+                            raise CommandError(f"Sign-up {i} returned {response.status_code}: {response.data}")
+                    transaction.set_rollback(True)
+
+                messages = [pickle.loads(raw)["message"] for raw in redis.lrange(OUTBOX_KEY, 0, -1)]
+                inline_times = []
+                for message in messages:
+                    started = time.perf_counter()
+                    message.connection = get_connection(fail_silently=False)
+                    message.send()
+                    inline_times.append(time.perf_counter() - started)
+                    message.connection = None
+
+                started = time.perf_counter()
+                flushed = flush_outbox()
+                flush_seconds = time.perf_counter() - started
+        finally:
+            release_coalesced(flush_outbox)
+            server.shutdown()
+            server.server_close()
+
+        signup_p50, signup_p95 = _summary(signup_times)
+        inline_p50, inline_p95 = _summary(inline_times or [0])
+        self.stdout.write(f"SMTP reply delay: {options['delay_ms']} ms, sign-ups: {options['signups']}")
+        self.stdout.write(f"{'path':<28} {'p50 ms':>10} {'p95 ms':>10}")
+        self.stdout.write(f"{'sign-up request (queued)':<28} {signup_p50:>10.1f} {signup_p95:>10.1f}")
+        self.stdout.write(f"{'inline send per sign-up':<28} {inline_p50:>10.1f} {inline_p95:>10.1f}")
+        self.stdout.write(
+            f"Inline, one connection per message: {len(inline_times)} messages in {sum(inline_times) * 1000:.0f} ms"
+        )
+        self.stdout.write(f"Batched flush, shared connection: {flushed} messages in {flush_seconds * 1000:.0f} ms")
+        self.stdout.write(f"Messages received by the stand-in: {server.received}")
@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def check_case_insensitive_duplicates(apps, schema_editor):
+    """
+    Refuse to build the unique index while e-mail addresses differ only by case,
+    naming the affected addresses instead of failing with an IntegrityError.
+    """
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    duplicates = list(
+        User.objects.exclude(email='')
+        .values(email_lower=Lower('email'))
+        .annotate(accounts=Count('pk'))
+        .filter(accounts__gt=1)
+        .order_by('email_lower')[:20]
+    )
+    if duplicates:
+        listing = ", ".join(f"{row['email_lower']} ({row['accounts']} accounts)" for row in duplicates)
+        raise RuntimeError(
+            "Cannot create the case-insensitive unique index on auth_user.email: these addresses "
+            f"are used by several accounts that differ only in case: {listing}. Merge the accounts "
+            "or change their e-mail addresses, then run migrate again."
+        )
+
+
+class Migration(migrations.Migration):
+    """
+    Unique, case-insensitive index on auth_user.email used by the login lookup.
+    Users without an e-mail address (e.g. created with createsuperuser) are not indexed.
+    """
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(check_case_insensitive_duplicates, migrations.RunPython.noop),
+        migrations.RunSQL(
+            sql="CREATE UNIQUE INDEX IF NOT EXISTS auth_user_email_lower_uniq ON auth_user (lower(email)) WHERE email <> ''",
+            reverse_sql="DROP INDEX IF EXISTS auth_user_email_lower_uniq",
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations
+from django.utils import timezone
+
+
+def backfill_token_blacklist(apps, schema_editor):
+    """
+    Copy tokens revoked before the Redis blacklist existed into it, so they stay revoked until they expire.
+    """
+    from auth_app.api.tokens import revoke_jti
+
+    BlacklistedToken = apps.get_model('token_blacklist', 'BlacklistedToken')
+    rows = (
+        BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+        .values_list('token__jti', 'token__expires_at')
+    )
+    for jti, expires_at in rows.iterator():
+        revoke_jti(jti, expires_at.timestamp())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0001_user_email_lower_unique'),
+        ('token_blacklist', '__latest__'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_token_blacklist, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,297 @@
-from django.test import TestCase
+import importlib
+import pickle
+import uuid
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.apps import apps
+from django.core import mail
+from django.core.cache import caches
+from django.core.mail import EmailMessage
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+from rest_framework.parsers import JSONParser
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from auth_app.api import throttling
+from auth_app.api.tokens import CachedBlacklistRefreshToken
+from auth_app.api.serializers import CustomTokenObtainPairSerializer, ResetPasswordSerializer, users_by_email
+from auth_app.api.views import ResetPasswordView
+from auth_app.utils import mailer
+
+User = get_user_model()
+
+
+class CaseInsensitiveEmailTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="jane", email="Jane.Doe@Example.com", password="s3cret-pass")
+        User.objects.create_user(username="admin", email="", password="admin-pass")
+
+    def login(self, email, password):
+        serializer = CustomTokenObtainPairSerializer(data={"email": email, "password": password})
+        return serializer, serializer.is_valid()
+
+    def test_lookup_ignores_case(self):
+        self.assertEqual(list(users_by_email("jane.doe@example.COM")), [self.user])
+
+    def test_lookup_never_matches_users_without_email(self):
+        self.assertFalse(users_by_email("").exists())
+
+    def test_lookup_uses_partial_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            plan = users_by_email("jane.doe@example.com").explain()
+        self.assertIn("auth_user_email_lower_uniq", plan)
+
+    def test_login_with_other_case(self):
+        serializer, valid = self.login("JANE.DOE@example.com", "s3cret-pass")
+        self.assertTrue(valid, serializer.errors)
+        self.assertEqual(serializer.user, self.user)
+        self.assertIn("access", serializer.validated_data)
+
+    def test_login_hashes_password_once(self):
+        with mock.patch.object(User, "check_password", autospec=True, return_value=True) as check:
+            serializer, valid = self.login("jane.doe@example.com", "s3cret-pass")
+        self.assertTrue(valid, serializer.errors)
+        self.assertEqual(check.call_count, 1)
+
+    def test_login_rejects_wrong_password_and_unknown_email(self):
+        self.assertFalse(self.login("jane.doe@example.com", "wrong")[1])
+        self.assertFalse(self.login("nobody@example.com", "s3cret-pass")[1])
+
+    def test_login_rejects_inactive_user(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertFalse(self.login("jane.doe@example.com", "s3cret-pass")[1])
+
+    def test_password_reset_accepts_other_case(self):
+        self.assertTrue(ResetPasswordSerializer(data={"email": "JANE.DOE@EXAMPLE.COM"}).is_valid())
+
+        view = ResetPasswordView.as_view(throttle_classes=[])
+        request = APIRequestFactory().post("/api/password_reset/", {"email": "JANE.DOE@EXAMPLE.COM"}, format="json")
+        with mock.patch("auth_app.api.views.send_password_reset_email") as send:
+            response = view(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(send.call_args.args[0], self.user)
+
+
+class SlidingWindowThrottleTests(SimpleTestCase):
+    """
+    Runs against the Redis of the development stack; every test uses its own scope.
+    """
+
+    def setUp(self):
+        self.scope = f"test{uuid.uuid4().hex}"
+        rates = {f"{self.scope}_ip": "2/min", f"{self.scope}_email": "1/min"}
+        override = override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": rates})
+        override.enable()
+        self.addCleanup(override.disable)
+        self.view = SimpleNamespace(throttle_scope=self.scope)
+        self.addCleanup(self.delete_keys)
+
+    def delete_keys(self):
+        redis = get_redis_connection("default")
+        keys = list(redis.scan_iter(f"videoflix:throttle:{self.scope}:*"))
+        if keys:
+            redis.delete(*keys)
+
+    def request(self, email="jane@example.com", ip="203.0.113.7"):
+        return APIRequestFactory().post("/", {"email": email}, format="json", REMOTE_ADDR=ip)
+
+    def allowed(self, throttle_class, request):
+        throttle = throttle_class()
+        # The email throttle reads request.data, which only a DRF Request has.
+        return throttle.allow_request(Request(request, parsers=[JSONParser()]), self.view), throttle
+
+    def test_parse_rate(self):
+        self.assertEqual(throttling.parse_rate("5/min"), (5, 60))
+        self.assertEqual(throttling.parse_rate("10/hour"), (10, 3600))
+
+    def test_ip_limit_and_retry_after(self):
+        self.assertTrue(self.allowed(throttling.IPSlidingWindowThrottle, self.request())[0])
+        self.assertTrue(self.allowed(throttling.IPSlidingWindowThrottle, self.request())[0])
+        allowed, throttle = self.allowed(throttling.IPSlidingWindowThrottle, self.request())
+        self.assertFalse(allowed)
+        self.assertGreater(throttle.wait(), 0)
+        self.assertLessEqual(throttle.wait(), 60)
+        self.assertTrue(self.allowed(throttling.IPSlidingWindowThrottle, self.request(ip="203.0.113.8"))[0])
+
+    def test_email_limit_ignores_case_and_ip(self):
+        self.assertTrue(self.allowed(throttling.EmailSlidingWindowThrottle, self.request("Jane@Example.com"))[0])
+        self.assertFalse(self.allowed(
+            throttling.EmailSlidingWindowThrottle, self.request("jane@example.COM", ip="198.51.100.1"),
+        )[0])
+
+    def test_views_without_rate_are_not_throttled(self):
+        self.view = SimpleNamespace(throttle_scope="unconfigured")
+        for _ in range(5):
+            self.assertTrue(self.allowed(throttling.IPSlidingWindowThrottle, self.request())[0])
+
+    def test_fails_open_without_redis(self):
+        failing = mock.Mock(side_effect=RedisError("down"))
+        with mock.patch.object(throttling, "_sliding_window", return_value=failing):
+            for _ in range(3):
+                self.assertTrue(self.allowed(throttling.IPSlidingWindowThrottle, self.request())[0])
+
+
+@override_settings(
+    EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+    DEFAULT_FROM_EMAIL="fallback@example.com",
+    MAIL_MAX_ATTEMPTS=2,
+    MAIL_BATCH_SIZE=2,
+)
+class MailOutboxTests(SimpleTestCase):
+    """
+    Uses a per-test outbox key in the Redis of the development stack; no RQ job is enqueued.
+    """
+
+    def setUp(self):
+        self.redis = get_redis_connection("default")
+        self.key = f"videoflix:test:outbox:{uuid.uuid4().hex}"
+        self.addCleanup(self.redis.delete, self.key)
+        patchers = [mock.patch.object(mailer, "OUTBOX_KEY", self.key), mock.patch.object(mailer, "enqueue_coalesced")]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.enqueue = mailer.enqueue_coalesced
+
+    def queue(self, to="jane@example.com", subject="Hello"):
+        mailer.queue_email(EmailMessage(subject, "Body", "noreply@example.com", [to]))
+
+    def outbox_items(self):
+        return [pickle.loads(raw) for raw in self.redis.lrange(self.key, 0, -1)]
+
+    def failing_smtp(self):
+        return mock.patch.object(EmailBackend, "send_messages", side_effect=OSError("connection refused"))
+
+    def test_queue_email_enqueues_a_flush(self):
+        self.queue()
+        self.assertEqual(len(self.outbox_items()), 1)
+        self.assertIs(self.enqueue.call_args.args[0], mailer.flush_outbox)
+
+    def test_flush_sends_all_batches(self):
+        for i in range(5):
+            self.queue(subject=f"Mail {i}")
+
+        self.assertEqual(mailer.flush_outbox(), 5)
+        self.assertEqual([message.subject for message in mail.outbox], [f"Mail {i}" for i in range(5)])
+        self.assertEqual(self.outbox_items(), [])
+
+    def test_failed_message_is_requeued_and_retried(self):
+        self.queue()
+        with self.failing_smtp(), self.assertRaises(ConnectionError):
+            mailer.flush_outbox()
+        self.assertEqual([item["attempts"] for item in self.outbox_items()], [1])
+
+        self.assertEqual(mailer.flush_outbox(), 1)
+        self.assertEqual(mail.outbox[0].to, ["jane@example.com"])
+
+    def test_undeliverable_message_falls_back_to_default_email(self):
+        self.queue()
+        with self.failing_smtp():
+            for _ in range(2):
+                with self.assertRaises(ConnectionError):
+                    mailer.flush_outbox()
+        items = self.outbox_items()
+        self.assertEqual([(item["message"].to, item["attempts"]) for item in items], [(["fallback@example.com"], 0)])
+
+        self.assertEqual(mailer.flush_outbox(), 1)
+        self.assertEqual(mail.outbox[0].to, ["fallback@example.com"])
+
+    def test_fallback_is_dropped_after_max_attempts(self):
+        self.queue()
+        with self.failing_smtp():
+            for _ in range(3):
+                with self.assertRaises(ConnectionError):
+                    mailer.flush_outbox()
+            self.assertEqual(mailer.flush_outbox(), 0)
+        self.assertEqual(self.outbox_items(), [])
+
+    def test_killed_flush_keeps_unsent_mail_for_recovery(self):
+        for i in range(3):
+            self.queue(subject=f"Mail {i}")
+        with mock.patch.object(EmailBackend, "send_messages", side_effect=[1, SystemExit("killed")]), \
+                self.assertRaises(SystemExit):
+            mailer.flush_outbox()
+        self.assertEqual([item["message"].subject for item in self.outbox_items()], ["Mail 2"])
+
+        self.assertEqual(mailer.requeue_orphaned_batches(), 1)
+        self.assertEqual([item["message"].subject for item in self.outbox_items()], ["Mail 1", "Mail 2"])
+        self.assertEqual(list(self.redis.scan_iter(f"{self.key}:processing:*")), [])
+
+    def test_batches_of_a_running_flush_are_left_alone(self):
+        self.redis.rpush(f"{self.key}:processing:run", pickle.dumps({"message": EmailMessage("Busy"), "attempts": 0}))
+        self.redis.set(f"{self.key}:lease:run", 1)
+        self.addCleanup(self.redis.delete, f"{self.key}:processing:run", f"{self.key}:lease:run")
+
+        self.assertEqual(mailer.requeue_orphaned_batches(), 0)
+        self.assertEqual(self.outbox_items(), [])
+
+    def test_periodic_job_restarts_flush_only_while_mail_waits(self):
+        self.assertFalse(mailer.flush_pending_mail())
+        self.enqueue.assert_not_called()
+
+        self.redis.rpush(self.key, pickle.dumps({"message": EmailMessage("Stranded", "", to=["a@example.com"]), "attempts": 0}))
+        self.assertTrue(mailer.flush_pending_mail())
+        self.assertIs(self.enqueue.call_args.args[0], mailer.flush_outbox)
+
+
+@override_settings(CACHES={
+    **settings.CACHES,
+    "token_blacklist": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "token-blacklist-tests"},
+})
+class CachedBlacklistRefreshTokenTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="jane", email="jane@example.com", password="s3cret-pass")
+
+    def setUp(self):
+        caches["token_blacklist"].clear()
+
+    def refresh(self, token):
+        return CachedBlacklistRefreshToken(str(token))
+
+    def test_login_writes_no_outstanding_rows(self):
+        CachedBlacklistRefreshToken.for_user(self.user)
+        self.assertFalse(OutstandingToken.objects.exists())
+
+    def test_revoked_token_is_rejected(self):
+        token = CachedBlacklistRefreshToken.for_user(self.user)
+        self.refresh(token)
+        token.blacklist()
+        with self.assertRaises(TokenError):
+            self.refresh(token)
+
+    @override_settings(JWT_BLACKLIST_AUDIT=True)
+    def test_audit_rows_are_consulted_without_a_cache_entry(self):
+        token = CachedBlacklistRefreshToken.for_user(self.user)
+        token.blacklist()
+        caches["token_blacklist"].clear()
+
+        with self.assertRaises(TokenError):
+            self.refresh(token)
+        with mock.patch.object(BlacklistedToken.objects, "filter") as query, self.assertRaises(TokenError):
+            self.refresh(token)
+        query.assert_not_called()
+
+    @override_settings(JWT_BLACKLIST_AUDIT=True)
+    def test_migration_backfills_tokens_revoked_before_rollout(self):
+        token = CachedBlacklistRefreshToken.for_user(self.user)
+        token.blacklist()
+        caches["token_blacklist"].clear()
+        migration = importlib.import_module("auth_app.migrations.0002_backfill_token_blacklist")
+
+        migration.backfill_token_blacklist(apps, None)
+
+        with override_settings(JWT_BLACKLIST_AUDIT=False), self.assertRaises(TokenError):
+            self.refresh(token)
@@ -3,11 +3,12 @@ from django.template.loader import render_to_string
 from django.core.validators import validate_email
 from django.core.exceptions import ValidationError
 from django.conf import settings
+from auth_app.utils.mailer import queue_email
 import logging
 logger = logging.getLogger(__name__)
 
 
-def send_activation_email(request, user, uid, token):
+def build_activation_email(user, uid, token):
     activation_link = f"{settings.FRONTEND_URL}/pages/auth/activate.html?uid={uid}&token={token}"
     subject = "Activate Videoflix account"
     try:
@@ -21,27 +22,18 @@ def send_activation_email(request, user, uid, token):
         "emails/activate.html", {"user": user, "activation_link": activation_link,},
     )
 
-    def trySendEmail(recipient):
-        email = EmailMultiAlternatives(
-            subject=subject,
-            body=body,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[recipient],
-        )
-        email.attach_alternative(html_content, "text/html")
-        email.send(fail_silently=False)
-    
-    try:
-        trySendEmail(recipient)
-    except Exception as e:
-        logger.error("Error send failed to %s: %s", recipient, e)
-        if recipient != settings.DEFAULT_FROM_EMAIL:
-            try:
-                logger.info("fallinf back to default email")
-                trySendEmail(settings.DEFAULT_FROM_EMAIL)
-            except Exception as fallback_error:
-                logger.error("Fallback email also failed: %s", fallback_error)
-                raise ConnectionError("All email attempts failed")
-    return True      
+    email = EmailMultiAlternatives(
+        subject=subject,
+        body=body,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[recipient],
+    )
+    email.attach_alternative(html_content, "text/html")
+    return email
 
 
+def send_activation_email(request, user, uid, token):
+    """ Queue the activation email; it is delivered by the flush_outbox RQ job. """
+    queue_email(build_activation_email(user, uid, token))
+    logger.info("Activation email queued for user %s", user.pk)
+    return True
@@ -0,0 +1,182 @@
+import logging
+import pickle
+import uuid
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django_redis import get_redis_connection
+from rq import Retry
+
+from core.jobs import enqueue_coalesced, release_coalesced
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_KEY = "videoflix:mail:outbox"
+
+
+def queue_email(message):
+    """
+        Put an e-mail into the outbox and make sure a flush job is queued.
+
+        The message is delivered by ``flush_outbox`` on the RQ worker, so the
+        HTTP request never waits for the mail server.
+
+        Args:
+            message (EmailMessage): A fully built message, without a connection.
+    """
+    message.connection = None
+    get_redis_connection("default").rpush(OUTBOX_KEY, pickle.dumps({"message": message, "attempts": 0}))
+    _enqueue_flush()
+
+
+def _enqueue_flush():
+    enqueue_coalesced(flush_outbox, retry=Retry(max=len(settings.MAIL_RETRY_INTERVALS), interval=settings.MAIL_RETRY_INTERVALS))
+
+
+def _processing_key(run_id):
+    return f"{OUTBOX_KEY}:processing:{run_id}"
+
+
+def _lease_key(run_id):
+    return f"{OUTBOX_KEY}:lease:{run_id}"
+
+
+def requeue_orphaned_batches():
+    """
+        Move messages claimed by a flush that died (its lease expired) back to the front of the outbox.
+
+        Returns:
+            int: The number of messages requeued.
+    """
+    redis = get_redis_connection("default")
+    requeued = 0
+    for key in redis.scan_iter(_processing_key("*")):
+        run_id = key.decode().rsplit(":", 1)[1]
+        if redis.exists(_lease_key(run_id)):
+            continue
+        while redis.lmove(key, OUTBOX_KEY, "RIGHT", "LEFT") is not None:
+            requeued += 1
+    if requeued:
+        logger.warning("Requeued %s e-mails of interrupted flushes", requeued)
+    return requeued
+
+
+def flush_pending_mail():
+    """
+        Periodic job (PERIODIC_JOBS) that starts a new ``flush_outbox`` run while the outbox is not empty.
+
+        RQ gives up on ``flush_outbox`` after the last MAIL_RETRY_INTERVALS step,
+        which can leave requeued messages (including the copy redirected to
+        DEFAULT_FROM_EMAIL) behind with no job to send them. Messages of a
+        flush that was killed mid-batch are put back first.
+
+        Returns:
+            bool: Whether mail was waiting.
+    """
+    requeue_orphaned_batches()
+    if not get_redis_connection("default").llen(OUTBOX_KEY):
+        return False
+    _enqueue_flush()
+    return True
+
+
+def _give_up(item):
+    """
+        Handle a message that failed MAIL_MAX_ATTEMPTS times.
+
+        Like the inline senders did before, undeliverable mail is redirected
+        once to DEFAULT_FROM_EMAIL; after that it is dropped.
+
+        Returns:
+            dict | None: The item to requeue, or None.
+    """
+    message = item["message"]
+    if message.to == [settings.DEFAULT_FROM_EMAIL]:
+        logger.error("Dropping e-mail %r after %s attempts", message.subject, item["attempts"])
+        return None
+    logger.error("Delivery of %r to %s failed, falling back to default email", message.subject, message.to)
+    message.to = [settings.DEFAULT_FROM_EMAIL]
+    return {"message": message, "attempts": 0}
+
+
+def _claim_batch(redis, processing):
+    """
+        Atomically move up to MAIL_BATCH_SIZE messages from the outbox to a processing list.
+    """
+    pipe = redis.pipeline()
+    for _ in range(settings.MAIL_BATCH_SIZE):
+        pipe.lmove(OUTBOX_KEY, processing, "LEFT", "RIGHT")
+    return [raw for raw in pipe.execute() if raw is not None]
+
+
+def flush_outbox():
+    """
+        RQ job delivering the outbox in batches of MAIL_BATCH_SIZE.
+
+        Each batch is moved (LMOVE) to a processing list of this run and sent
+        over one SMTP connection with ``send_messages``; a message leaves the
+        processing list only once it was sent. If the work horse is killed
+        mid-batch, its lease expires after the RQ job timeout and
+        ``flush_pending_mail`` puts the unsent messages back. Messages that
+        fail are put back into the outbox and the job raises, so RQ retries
+        it after the next MAIL_RETRY_INTERVALS step.
+
+        Returns:
+            int: The number of messages sent.
+
+        Raises:
+            ConnectionError: If any message has to be retried.
+    """
+    release_coalesced(flush_outbox)
+    redis = get_redis_connection("default")
+    run_id = uuid.uuid4().hex
+    processing = _processing_key(run_id)
+    redis.set(_lease_key(run_id), 1, ex=settings.RQ_QUEUES['default']['DEFAULT_TIMEOUT'])
+    sent = 0
+    failed = []
+    try:
+        while True:
+            batch = _claim_batch(redis, processing)
+            if not batch:
+                break
+            connection = get_connection(fail_silently=False)
+            try:
+                connection.open()
+            except Exception:
+                logger.exception("Could not connect to the mail server")
+                failed.extend(batch)
+                break
+            try:
+                for raw in batch:
+                    message = pickle.loads(raw)["message"]
+                    try:
+                        sent += connection.send_messages([message])
+                    except Exception as e:
+                        logger.warning("Sending %r to %s failed: %s", message.subject, message.to, e)
+                        failed.append(raw)
+                    else:
+                        redis.lrem(processing, 1, raw)
+            finally:
+                connection.close()
+
+        requeue = []
+        for raw in failed:
+            item = pickle.loads(raw)
+            item["attempts"] += 1
+            if item["attempts"] >= settings.MAIL_MAX_ATTEMPTS:
+                item = _give_up(item)
+            if item:
+                requeue.append(pickle.dumps(item))
+        pipe = redis.pipeline()
+        if requeue:
+            pipe.rpush(OUTBOX_KEY, *requeue)
+        pipe.delete(processing)
+        pipe.execute()
+    finally:
+        redis.delete(_lease_key(run_id))
+
+    if sent:
+        logger.info("Sent %s e-mails", sent)
+    if requeue:
+        raise ConnectionError(f"{len(requeue)} e-mails could not be sent and were requeued")
+    return sent
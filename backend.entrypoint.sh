@@ -38,6 +38,15 @@ else:
     print(f"Superuser '{username}' already exists.")
 EOF
 
-python manage.py rqworker default &
+# Prometheus samples of all processes are aggregated from this directory (see core/metrics.py).
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
 
-exec gunicorn core.wsgi:application --bind 0.0.0.0:8000 --reload
+python manage.py rqworker default --with-scheduler &
+python manage.py schedule_periodic_jobs
+
+if [ "$SERVER_MODE" = "asgi" ]; then
+  exec gunicorn core.asgi:application -c gunicorn_asgi.py
+fi
+
+exec gunicorn core.wsgi:application -c gunicorn_hooks.py --bind 0.0.0.0:8000 --reload
@@ -0,0 +1,9 @@
+def percentile(values, pct):
+    """
+        Return the ``pct`` percentile of ``values`` using the nearest-rank method.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
@@ -0,0 +1,92 @@
+import uuid
+from datetime import timedelta
+
+import django_rq
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+from rq.job import JobStatus
+
+ACTIVE_STATUSES = {JobStatus.QUEUED, JobStatus.SCHEDULED, JobStatus.DEFERRED, JobStatus.STARTED}
+
+
+def _pending_key(func):
+    return f"jobs:pending:{func.__module__}.{func.__name__}"
+
+
+def enqueue_coalesced(func, *args, **kwargs):
+    """
+        Enqueue ``func`` on the default RQ queue unless a run is already waiting.
+
+        Bursts of triggers (e.g. a bulk delete in the admin firing one signal per
+        row) collapse into a single job. The job must call ``release_coalesced``
+        as its first step, so triggers that arrive while it runs queue one more run.
+    """
+    timeout = settings.RQ_QUEUES['default']['DEFAULT_TIMEOUT']
+    if cache.add(_pending_key(func), 1, timeout=timeout):
+        django_rq.enqueue(func, *args, **kwargs)
+
+
+def hold_coalesced(func, timeout=None):
+    """
+        Mark ``func`` as pending without enqueuing it, so ``enqueue_coalesced``
+        skips it until ``release_coalesced`` is called (or ``timeout`` passes).
+    """
+    cache.set(_pending_key(func), 1, timeout=timeout)
+
+
+def release_coalesced(func):
+    """
+        Allow the next ``enqueue_coalesced`` call for ``func`` to enqueue a new job.
+    """
+    cache.delete(_pending_key(func))
+
+
+def _periodic_key(path):
+    return f"jobs:periodic:{path}"
+
+
+def run_periodic(path, interval):
+    """
+        RQ entry point of a periodic job: run the function, then schedule the next run.
+
+        Args:
+            path (str): Dotted path of the function to run.
+            interval (int): Seconds until the next run.
+    """
+    try:
+        import_string(path)()
+    finally:
+        schedule_periodic(path, interval, delay=interval)
+
+
+def schedule_periodic(path, interval, delay=0):
+    """
+        Enqueue the next run of a periodic job and remember its job id.
+        Delayed runs need a worker started with ``--with-scheduler``.
+    """
+    queue = django_rq.get_queue('default')
+    job_id = f"periodic:{path}:{uuid.uuid4().hex}"
+    if delay:
+        queue.enqueue_in(timedelta(seconds=delay), run_periodic, path, interval, job_id=job_id)
+    else:
+        queue.enqueue(run_periodic, path, interval, job_id=job_id)
+    cache.set(_periodic_key(path), job_id, timeout=None)
+
+
+def ensure_periodic_jobs():
+    """
+        Start every job in PERIODIC_JOBS that has no pending or running instance.
+
+        Returns:
+            list[str]: The dotted paths of the jobs that were (re)started.
+    """
+    queue = django_rq.get_queue('default')
+    started = []
+    for path, interval in settings.PERIODIC_JOBS.items():
+        job_id = cache.get(_periodic_key(path))
+        job = queue.fetch_job(job_id) if job_id else None
+        if job is None or job.get_status() not in ACTIVE_STATUSES:
+            schedule_periodic(path, interval)
+            started.append(path)
+    return started
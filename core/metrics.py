@@ -0,0 +1,232 @@
+import hmac
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timezone as dt_timezone
+
+import django_rq
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils import timezone
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Histogram, generate_latest, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger("videoflix.slow_requests")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REQUEST_SECONDS = Histogram(
+    "videoflix_request_seconds", "Time until the view returned a response.",
+    ["endpoint", "method", "status"], buckets=LATENCY_BUCKETS,
+)
+STAGE_SECONDS = Histogram(
+    "videoflix_request_stage_seconds", "Time spent per stage of a request (jwt, user, db, fs, cache, ...).",
+    ["endpoint", "stage"], buckets=LATENCY_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    "videoflix_request_db_queries", "Database queries per request.",
+    ["endpoint"], buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+RESPONSE_BYTES = Histogram(
+    "videoflix_response_bytes", "Bytes sent per response.",
+    ["endpoint"], buckets=(1024, 16 * 1024, 128 * 1024, 512 * 1024, 1024 ** 2, 4 * 1024 ** 2, 16 * 1024 ** 2),
+)
+
+_current = ContextVar("videoflix_request_timings", default=None)
+
+
+class RequestTimings:
+    """
+    Stage durations of the request being handled, filled by ``stage()`` and the DB wrapper.
+    """
+    __slots__ = ("started", "stages", "db_queries")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.db_queries = 0
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name):
+    """
+        Time a block of code as stage ``name`` of the current request.
+
+        Outside an instrumented request (management commands, RQ jobs) this
+        is a no-op apart from two clock reads.
+
+        Usage:
+            with stage("fs"):
+                path = resolve_segment_path(...)
+    """
+    timings = _current.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings.add(name, time.perf_counter() - started)
+
+
+def _db_execute_wrapper(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db_queries += 1
+        timings.add("db", time.perf_counter() - started)
+
+
+@receiver(connection_created)
+def install_db_timer(sender, connection, **kwargs):
+    """
+    Count and time the queries of every new database connection, in any thread.
+    """
+    if _db_execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_db_execute_wrapper)
+
+
+class MetricsMiddleware:
+    """
+    Records request latency, stage timings, DB query count/time and response
+    size per endpoint, and logs a sample of slow requests with their breakdown.
+    Works under WSGI and ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.path == "/metrics":
+            return self.get_response(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, timings)
+        return response
+
+    async def __acall__(self, request):
+        if request.path == "/metrics":
+            return await self.get_response(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, timings)
+        return response
+
+    def record(self, request, response, timings):
+        elapsed = time.perf_counter() - timings.started
+        match = request.resolver_match
+        endpoint = match.view_name if match else "unmatched"
+
+        REQUEST_SECONDS.labels(endpoint, request.method, response.status_code).observe(elapsed)
+        for name, seconds in timings.stages.items():
+            STAGE_SECONDS.labels(endpoint, name).observe(seconds)
+        DB_QUERIES.labels(endpoint).observe(timings.db_queries)
+        size = _response_size(response)
+        if size is not None:
+            RESPONSE_BYTES.labels(endpoint).observe(size)
+
+        if elapsed * 1000 >= settings.SLOW_REQUEST_THRESHOLD_MS and random.random() < settings.SLOW_REQUEST_SAMPLE_RATE:
+            breakdown = " ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in sorted(timings.stages.items()))
+            slow_logger.warning(
+                "%s %s %s %.1fms endpoint=%s queries=%s bytes=%s %s",
+                request.method, request.path, response.status_code, elapsed * 1000,
+                endpoint, timings.db_queries, size, breakdown,
+            )
+
+
+def _response_size(response):
+    """
+        Return the body size of a response, or None for streams of unknown length.
+    """
+    if response.has_header("Content-Length"):
+        return int(response["Content-Length"])
+    if not response.streaming:
+        return len(response.content)
+    return None
+
+
+class RQQueueCollector:
+    """
+    Reports the depth and the age of the oldest waiting job of every RQ queue.
+    Read from Redis at scrape time, so the numbers agree across processes.
+    """
+
+    def collect(self):
+        depth = GaugeMetricFamily("videoflix_rq_queue_depth", "Jobs waiting in the RQ queue.", labels=["queue"])
+        oldest = GaugeMetricFamily(
+            "videoflix_rq_oldest_job_age_seconds", "Seconds the oldest waiting job has been queued.", labels=["queue"],
+        )
+        now = timezone.now()
+        for name in settings.RQ_QUEUES:
+            queue = django_rq.get_queue(name)
+            try:
+                depth.add_metric([name], queue.count)
+                job_ids = queue.get_job_ids(0, 1)
+                job = queue.fetch_job(job_ids[0]) if job_ids else None
+            except RedisError:
+                logger.warning("Could not read RQ queue %s", name)
+                continue
+            age = 0.0
+            if job is not None and job.enqueued_at is not None:
+                enqueued_at = job.enqueued_at
+                if timezone.is_naive(enqueued_at):
+                    enqueued_at = enqueued_at.replace(tzinfo=dt_timezone.utc)
+                age = max((now - enqueued_at).total_seconds(), 0.0)
+            oldest.add_metric([name], age)
+        yield depth
+        yield oldest
+
+
+_rq_collector = RQQueueCollector()
+REGISTRY.register(_rq_collector)
+
+
+def metrics_view(request):
+    """
+        Expose all metrics in the Prometheus text format.
+
+        With PROMETHEUS_MULTIPROC_DIR set (gunicorn), the samples of all
+        worker processes are aggregated. Scrapers must send METRICS_TOKEN as a
+        bearer token; without a token the endpoint is only open with DEBUG.
+    """
+    if settings.METRICS_TOKEN:
+        expected = f"Bearer {settings.METRICS_TOKEN}"
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), expected):
+            return HttpResponseForbidden()
+    elif settings.DEBUG not in (True, "True"):  # DEBUG is the raw environment string in settings.py
+        return HttpResponseForbidden("Set METRICS_TOKEN to enable /metrics.")
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(_rq_collector)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
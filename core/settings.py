@@ -56,6 +56,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework_simplejwt',
     'rest_framework_simplejwt.token_blacklist',
     'rest_framework',
@@ -67,6 +68,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -122,10 +124,109 @@ CACHES = {
             "CLIENT_CLASS": "django_redis.client.DefaultClient"
         },
         "KEY_PREFIX": "videoflix"
-    }
+    },
+    # Revoked refresh tokens; an evicted entry would un-revoke a token, so this Redis must run with
+    # maxmemory-policy noeviction (the Redis default). Use a separate instance if the cache evicts.
+    "token_blacklist": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": os.environ.get("JWT_BLACKLIST_REDIS_LOCATION", default="redis://redis:6379/2"),
+        "OPTIONS": {
+            "CLIENT_CLASS": "django_redis.client.DefaultClient"
+        },
+        "KEY_PREFIX": "videoflix"
+    },
 }
 
 
+# Rendition playlists are cached per process (LRU) and in Redis once conversion finishes.
+MANIFEST_CACHE_TIMEOUT = int(os.environ.get("MANIFEST_CACHE_TIMEOUT", default=60 * 60 * 24))
+MANIFEST_CACHE_LOCAL_ENTRIES = int(os.environ.get("MANIFEST_CACHE_LOCAL_ENTRIES", default=2048))
+MANIFEST_CACHE_LOCAL_TTL = int(os.environ.get("MANIFEST_CACHE_LOCAL_TTL", default=60))
+
+# Hot HLS segments are kept mapped and page-cache resident with TinyLFU admission (per worker budget).
+SEGMENT_CACHE_MAX_BYTES = int(os.environ.get("SEGMENT_CACHE_MAX_BYTES", default=256 * 1024 * 1024))
+SEGMENT_CACHE_MAX_ITEM_BYTES = int(os.environ.get("SEGMENT_CACHE_MAX_ITEM_BYTES", default=8 * 1024 * 1024))
+SEGMENT_CACHE_SKETCH_WIDTH = int(os.environ.get("SEGMENT_CACHE_SKETCH_WIDTH", default=4096))
+SEGMENT_CACHE_TTL = int(os.environ.get("SEGMENT_CACHE_TTL", default=300))
+
+# After segment N is served, segments N+1..N+COUNT are prefetched into the page cache for sequential viewers.
+SEGMENT_READAHEAD_COUNT = int(os.environ.get("SEGMENT_READAHEAD_COUNT", default=2))
+SEGMENT_READAHEAD_WORKERS = int(os.environ.get("SEGMENT_READAHEAD_WORKERS", default=2))
+SEGMENT_READAHEAD_MAX_PENDING = int(os.environ.get("SEGMENT_READAHEAD_MAX_PENDING", default=64))
+SEGMENT_READAHEAD_MAX_SESSIONS = int(os.environ.get("SEGMENT_READAHEAD_MAX_SESSIONS", default=10000))
+
+# Async HLS views for the ASGI (uvicorn worker) deployment, see gunicorn_asgi.py.
+HLS_ASYNC_VIEWS = os.environ.get("HLS_ASYNC_VIEWS", default="False") == "True"
+ASYNC_FILE_READ_WORKERS = int(os.environ.get("ASYNC_FILE_READ_WORKERS", default=16))
+ASYNC_FILE_CHUNK_SIZE = int(os.environ.get("ASYNC_FILE_CHUNK_SIZE", default=256 * 1024))
+
+# Catalog pages are cached per catalog version; Video signals bump the version.
+CATALOG_PAGE_SIZE = int(os.environ.get("CATALOG_PAGE_SIZE", default=30))
+CATALOG_MAX_PAGE_SIZE = int(os.environ.get("CATALOG_MAX_PAGE_SIZE", default=100))
+CATALOG_CACHE_TIMEOUT = int(os.environ.get("CATALOG_CACHE_TIMEOUT", default=60 * 60))
+CATALOG_GROUP_SIZE = int(os.environ.get("CATALOG_GROUP_SIZE", default=20))
+
+# Text search configuration used for Video.search_vector and search queries.
+SEARCH_CONFIG = os.environ.get("SEARCH_CONFIG", default="english")
+SEARCH_RESULT_LIMIT = int(os.environ.get("SEARCH_RESULT_LIMIT", default=50))
+
+# Where HLS trees live: "local" (VIDEO_ROOT) or "s3" (any S3-compatible bucket, e.g. MinIO).
+MEDIA_STORE_BACKEND = os.environ.get("MEDIA_STORE_BACKEND", default="local")
+MEDIA_STORE_S3_BUCKET = os.environ.get("MEDIA_STORE_S3_BUCKET", default="videoflix")
+MEDIA_STORE_S3_PREFIX = os.environ.get("MEDIA_STORE_S3_PREFIX", default="hls")
+MEDIA_STORE_S3_ENDPOINT_URL = os.environ.get("MEDIA_STORE_S3_ENDPOINT_URL", default="")
+MEDIA_STORE_S3_PUBLIC_ENDPOINT_URL = os.environ.get("MEDIA_STORE_S3_PUBLIC_ENDPOINT_URL", default="")
+MEDIA_STORE_S3_REGION = os.environ.get("MEDIA_STORE_S3_REGION", default="us-east-1")
+MEDIA_STORE_S3_ACCESS_KEY = os.environ.get("MEDIA_STORE_S3_ACCESS_KEY", default="")
+MEDIA_STORE_S3_SECRET_KEY = os.environ.get("MEDIA_STORE_S3_SECRET_KEY", default="")
+MEDIA_STORE_PRESIGN_TTL = int(os.environ.get("MEDIA_STORE_PRESIGN_TTL", default=300))
+MEDIA_STORE_SCRATCH_ROOT = os.environ.get("MEDIA_STORE_SCRATCH_ROOT", default="")
+MEDIA_STORE_UPLOAD_WORKERS = int(os.environ.get("MEDIA_STORE_UPLOAD_WORKERS", default=8))
+MEDIA_STORE_POLL_INTERVAL = float(os.environ.get("MEDIA_STORE_POLL_INTERVAL", default=0.5))
+
+# Media of deleted videos is removed by a background job; orphans are collected periodically.
+MEDIA_DELETE_BATCH_SIZE = int(os.environ.get("MEDIA_DELETE_BATCH_SIZE", default=50))
+MEDIA_DELETE_MAX_ATTEMPTS = int(os.environ.get("MEDIA_DELETE_MAX_ATTEMPTS", default=5))
+MEDIA_DELETE_RETRY_SECONDS = int(os.environ.get("MEDIA_DELETE_RETRY_SECONDS", default=300))
+MEDIA_GC_INTERVAL = int(os.environ.get("MEDIA_GC_INTERVAL", default=60 * 60 * 6))
+MEDIA_GC_GRACE_SECONDS = int(os.environ.get("MEDIA_GC_GRACE_SECONDS", default=60 * 60))
+
+# Conversions are admitted only if their estimated HLS output fits the disk budget.
+HLS_DISK_RESERVE_BYTES = int(os.environ.get("HLS_DISK_RESERVE_BYTES", default=5 * 1024 ** 3))
+HLS_DISK_BUDGET_BYTES = int(os.environ.get("HLS_DISK_BUDGET_BYTES", default=0))
+HLS_SIZE_OVERHEAD = float(os.environ.get("HLS_SIZE_OVERHEAD", default=1.1))
+HLS_ADMISSION_RETRY_SECONDS = int(os.environ.get("HLS_ADMISSION_RETRY_SECONDS", default=300))
+
+# What happens to the original upload once conversion completed: "keep", "compress", "move" or "delete".
+ORIGINAL_LIFECYCLE_POLICY = os.environ.get("ORIGINAL_LIFECYCLE_POLICY", default="keep")
+ORIGINAL_ARCHIVE_ROOT = os.environ.get("ORIGINAL_ARCHIVE_ROOT", default=str(BASE_DIR / "archive"))
+ORIGINAL_COMPRESS_CRF = int(os.environ.get("ORIGINAL_COMPRESS_CRF", default=28))
+
+# Player heartbeats go to Redis hashes and are flushed to WatchProgress periodically.
+WATCH_PROGRESS_FLUSH_INTERVAL = int(os.environ.get("WATCH_PROGRESS_FLUSH_INTERVAL", default=30))
+WATCH_PROGRESS_FLUSH_BATCH = int(os.environ.get("WATCH_PROGRESS_FLUSH_BATCH", default=1000))
+WATCH_PROGRESS_CACHE_TTL = int(os.environ.get("WATCH_PROGRESS_CACHE_TTL", default=60 * 60 * 24 * 30))
+WATCH_PROGRESS_COMPLETE_RATIO = float(os.environ.get("WATCH_PROGRESS_COMPLETE_RATIO", default=0.95))
+WATCH_PROGRESS_LIST_LIMIT = int(os.environ.get("WATCH_PROGRESS_LIST_LIMIT", default=20))
+
+# Segment/manifest requests are counted in process, flushed to hourly Redis hashes and rolled up into Postgres.
+POPULARITY_FLUSH_INTERVAL = float(os.environ.get("POPULARITY_FLUSH_INTERVAL", default=5))
+POPULARITY_REDIS_TTL = int(os.environ.get("POPULARITY_REDIS_TTL", default=60 * 60 * 48))
+POPULARITY_ROLLUP_INTERVAL = int(os.environ.get("POPULARITY_ROLLUP_INTERVAL", default=60 * 15))
+POPULARITY_TRENDING_HOURS = int(os.environ.get("POPULARITY_TRENDING_HOURS", default=24))
+POPULARITY_RESULT_LIMIT = int(os.environ.get("POPULARITY_RESULT_LIMIT", default=20))
+POPULARITY_CACHE_TIMEOUT = int(os.environ.get("POPULARITY_CACHE_TIMEOUT", default=60))
+
+# Prometheus metrics on /metrics (bearer METRICS_TOKEN; without a token only with DEBUG); a sample of requests slower than the threshold is logged with a stage breakdown.
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", default="")
+SLOW_REQUEST_THRESHOLD_MS = int(os.environ.get("SLOW_REQUEST_THRESHOLD_MS", default=500))
+SLOW_REQUEST_SAMPLE_RATE = float(os.environ.get("SLOW_REQUEST_SAMPLE_RATE", default=0.1))
+
+# "Slowest conversions" admin page: look-back window in days and number of rows.
+TELEMETRY_SLOWEST_DAYS = int(os.environ.get("TELEMETRY_SLOWEST_DAYS", default=7))
+TELEMETRY_SLOWEST_LIMIT = int(os.environ.get("TELEMETRY_SLOWEST_LIMIT", default=50))
+
+
 RQ_QUEUES = {
     'default': {
         'HOST': os.environ.get("REDIS_HOST", default="redis"),
@@ -137,6 +238,14 @@ RQ_QUEUES = {
 }
 
 
+# Functions run by `python manage.py schedule_periodic_jobs` every N seconds (see core/jobs.py).
+PERIODIC_JOBS = {
+    'videoflix_app.api.media_gc.collect_orphan_media': MEDIA_GC_INTERVAL,
+    'videoflix_app.api.progress.flush_watch_progress': WATCH_PROGRESS_FLUSH_INTERVAL,
+    'videoflix_app.api.popularity.rollup_popularity': POPULARITY_ROLLUP_INTERVAL,
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -190,6 +299,13 @@ EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER", default="admin@gmail.com")
 EMAIL_HOST_PASSWORD = str(os.getenv("EMAIL_HOST_PASSWORD", default="securepassword"))
 DEFAULT_FROM_EMAIL = str(os.getenv("DEFAULT_FROM_EMAIL", default="contact@rucel-tsafack.com"))
 
+# Outgoing mail is queued in Redis and sent in batches by an RQ job over one SMTP connection.
+MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", default=50))
+MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", default=4))
+MAIL_RETRY_INTERVALS = [int(s) for s in os.getenv("MAIL_RETRY_INTERVALS", default="10,60,300").split(",")]
+MAIL_FLUSH_INTERVAL = int(os.getenv("MAIL_FLUSH_INTERVAL", default=600))
+PERIODIC_JOBS['auth_app.utils.mailer.flush_pending_mail'] = MAIL_FLUSH_INTERVAL
+
 
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -199,9 +315,27 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
 }
 
+# Revoked refresh tokens are kept in Redis until they expire; set to also record them in Postgres.
+JWT_BLACKLIST_AUDIT = os.environ.get("JWT_BLACKLIST_AUDIT", default="False") == "True"
+JWT_AUDIT_PRUNE_INTERVAL = int(os.environ.get("JWT_AUDIT_PRUNE_INTERVAL", default=60 * 60 * 24))
+if JWT_BLACKLIST_AUDIT:
+    PERIODIC_JOBS['auth_app.api.tokens.prune_audit_tokens'] = JWT_AUDIT_PRUNE_INTERVAL
+
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+    ),
+    # Sliding-window limits of the auth endpoints ("<count>/<sec|min|hour|day>").
+    'DEFAULT_THROTTLE_RATES': {
+        'register_ip': os.environ.get("THROTTLE_REGISTER_IP", default="10/hour"),
+        'register_email': os.environ.get("THROTTLE_REGISTER_EMAIL", default="3/hour"),
+        'login_ip': os.environ.get("THROTTLE_LOGIN_IP", default="30/min"),
+        'login_email': os.environ.get("THROTTLE_LOGIN_EMAIL", default="5/min"),
+        'password_reset_ip': os.environ.get("THROTTLE_PASSWORD_RESET_IP", default="10/hour"),
+        'password_reset_email': os.environ.get("THROTTLE_PASSWORD_RESET_EMAIL", default="3/hour"),
+        'password_confirm_ip': os.environ.get("THROTTLE_PASSWORD_CONFIRM_IP", default="10/hour"),
+        'activate_ip': os.environ.get("THROTTLE_ACTIVATE_IP", default="30/hour"),
+    },
+    'NUM_PROXIES': int(os.environ.get("NUM_PROXIES", default=0)) or None,
 }
\ No newline at end of file
@@ -18,10 +18,12 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
+from core.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('django-rq/', include('django_rq.urls')),
+    path('metrics', metrics_view, name='metrics'),
     path('api/', include('auth_app.api.urls')),
     path('api/', include('videoflix_app.api.urls')),
 ]
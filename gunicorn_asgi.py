@@ -0,0 +1,22 @@
+"""
+Gunicorn profile for the ASGI deployment (SERVER_MODE=asgi).
+
+Runs core.asgi:application on uvicorn workers so a few processes can hold
+thousands of concurrent HLS streams, and switches the HLS URLs to the async
+views in videoflix_app/api/async_views.py.
+
+    gunicorn core.asgi:application -c gunicorn_asgi.py
+"""
+import multiprocessing
+import os
+
+from gunicorn_hooks import child_exit  # noqa: F401
+
+os.environ.setdefault("HLS_ASYNC_VIEWS", "True")
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+worker_class = "uvicorn_worker.UvicornWorker"
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count()))
+keepalive = 75
+timeout = 60
+graceful_timeout = 30
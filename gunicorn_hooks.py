@@ -0,0 +1,15 @@
+"""
+Gunicorn server hooks shared by the WSGI and ASGI profiles.
+
+Removes the Prometheus multiprocess files of a dead worker, so /metrics
+stops reporting its live gauges.
+
+    gunicorn core.wsgi:application -c gunicorn_hooks.py
+"""
+import os
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,9 +1,76 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib import admin
+from django.db.models import Sum
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
 
-from .models import Video
+from .api.search import search_videos
+from .models import ConversionTelemetry, Video, WatchProgress
 
 @admin.register(Video)
 class VideoAdmin(admin.ModelAdmin):
-    list_display = ('id','title', 'description', 'created_at', 'category', 'thumbnail_url', 'video_file', 'conversion_status')
+    list_display = ('id','title', 'description', 'created_at', 'category', 'thumbnail_url', 'video_file', 'conversion_status', 'segment_requests')
     search_fields = ('title', 'description')
     list_filter = ('created_at', 'category')
+    change_list_template = 'admin/videoflix_app/video/change_list.html'
+
+    def get_urls(self):
+        urls = [
+            path('slowest-jobs/', self.admin_site.admin_view(self.slowest_jobs_view), name='videoflix_app_video_slowest_jobs'),
+        ]
+        return urls + super().get_urls()
+
+    def slowest_jobs_view(self, request):
+        """
+        Slowest conversion runs of the last TELEMETRY_SLOWEST_DAYS days.
+        """
+        since = timezone.now() - timedelta(days=settings.TELEMETRY_SLOWEST_DAYS)
+        runs = (
+            ConversionTelemetry.objects
+            .filter(started_at__gte=since)
+            .order_by('-total_seconds')[:settings.TELEMETRY_SLOWEST_LIMIT]
+        )
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Slowest conversion jobs',
+            'runs': runs,
+            'days': settings.TELEMETRY_SLOWEST_DAYS,
+        }
+        return TemplateResponse(request, 'admin/videoflix_app/video/slowest_jobs.html', context)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(total_segment_requests=Sum('hourly_stats__segment_requests'))
+
+    @admin.display(description='Segment requests', ordering='total_segment_requests')
+    def segment_requests(self, obj):
+        """
+        All-time segment requests, from the rolled-up VideoHourlyStats rows.
+        """
+        return obj.total_segment_requests or 0
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Use the indexed full-text/trigram search instead of ILIKE scans.
+        """
+        if not search_term:
+            return queryset, False
+        return search_videos(search_term, queryset), False
+
+
+@admin.register(WatchProgress)
+class WatchProgressAdmin(admin.ModelAdmin):
+    list_display = ('user', 'video', 'position', 'duration', 'updated_at')
+    list_select_related = ('user', 'video')
+    raw_id_fields = ('user', 'video')
+
+
+@admin.register(ConversionTelemetry)
+class ConversionTelemetryAdmin(admin.ModelAdmin):
+    list_display = ('source_video_id', 'video_title', 'status', 'worker_host', 'started_at', 'total_seconds', 'encode_speed', 'output_bytes')
+    list_filter = ('status', 'worker_host', 'started_at')
+    search_fields = ('video_title',)
+    raw_id_fields = ('video',)
@@ -0,0 +1,129 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseNotModified, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework.exceptions import AuthenticationFailed
+
+from auth_app.api.authentication import CookieJWTAuthentication
+from core.metrics import stage
+from .manifest_cache import get_manifest
+from .popularity import MANIFEST, SEGMENT, count_request
+from .readahead import schedule_readahead
+from .segment_cache import segment_cache
+from .storage import get_media_store
+from .views import HLS_CONTENT_TYPE, TS_CONTENT_TYPE, presigned_segment_url, resolve_segment_path
+
+_file_executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_FILE_READ_WORKERS,
+    thread_name_prefix="hls-file-read",
+)
+
+
+async def _iter_file(path, chunk_size):
+    """
+        Stream a file in chunks without blocking the event loop.
+        Every open/read runs on the file-read executor.
+    """
+    loop = asyncio.get_running_loop()
+    f = await loop.run_in_executor(_file_executor, open, path, "rb")
+    try:
+        while True:
+            chunk = await loop.run_in_executor(_file_executor, f.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        f.close()
+
+
+def _prepare_segment(key, hit):
+    """
+        Resolve a segment on disk and offer it to the segment cache after a miss.
+
+        Returns:
+            tuple[Path, int]: The segment path and its size in bytes.
+    """
+    candidate = resolve_segment_path(*key)
+    if not hit:
+        segment_cache.admit(key, candidate)
+    return candidate, candidate.stat().st_size
+
+
+class AsyncHlsView(View):
+    """
+    Base class for the async HLS views: authenticates from the JWT cookie
+    without blocking the event loop and answers 401 like the DRF views do.
+    """
+    authentication = CookieJWTAuthentication()
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            result = await self.authentication.aauthenticate(request)
+        except AuthenticationFailed as e:
+            return JsonResponse({"detail": e.detail}, status=401)
+        if result is None:
+            return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+        request.user, request.auth = result
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class AsyncVideoHlsStreamManifestView(AsyncHlsView):
+    """
+    Async version of VideoHlsStreamManifestView for the ASGI deployment.
+    """
+
+    async def get(self, request, video_id=None, resolution=None):
+        if not (video_id and resolution):
+            raise Http404("Video or resolution not specified")
+
+        with stage("cache"):
+            entry = await sync_to_async(get_manifest, thread_sensitive=False)(video_id, resolution)
+        if entry is None:
+            raise Http404('HLS manifest not found')
+        count_request(video_id, resolution, MANIFEST)
+
+        body, etag = entry
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(body, content_type=HLS_CONTENT_TYPE.lower())
+        response['ETag'] = etag
+        return response
+
+
+class AsyncVideoHlsSegmentView(AsyncHlsView):
+    """
+    Async version of VideoHlsSegmentView for the ASGI deployment.
+    Segments are streamed in chunks through an executor-backed reader.
+    """
+
+    async def get(self, request, video_id=None, resolution=None, segment=None):
+        if not (video_id and resolution and segment):
+            raise Http404(f"Segment not specified with {video_id}, {resolution}, {segment}")
+
+        store = get_media_store()
+        if store.is_remote:
+            with stage("presign"):
+                url = presigned_segment_url(store, video_id, resolution, segment)
+            count_request(video_id, resolution, SEGMENT)
+            return HttpResponseRedirect(url)
+
+        key = (video_id, resolution, segment)
+        with stage("cache"):
+            hit = segment_cache.touch(key)
+
+        loop = asyncio.get_running_loop()
+        with stage("fs"):
+            candidate, size = await loop.run_in_executor(_file_executor, _prepare_segment, key, hit)
+        response = StreamingHttpResponse(
+            _iter_file(candidate, settings.ASYNC_FILE_CHUNK_SIZE),
+            content_type=TS_CONTENT_TYPE.lower(),
+        )
+        response['Content-Length'] = str(size)
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        count_request(video_id, resolution, SEGMENT)
+        schedule_readahead(request.user.pk, video_id, resolution, segment)
+        return response
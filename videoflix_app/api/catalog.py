@@ -0,0 +1,133 @@
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from rest_framework.renderers import JSONRenderer
+
+from core.jobs import release_coalesced
+from videoflix_app.models import Video
+from .serializers import VIDEO_VALUE_FIELDS, serialize_video_rows
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION_KEY = "catalog:version"
+GROUPED_SNAPSHOT_KEY = "catalog:grouped:rows"
+
+
+def _initial_version():
+    """
+        Seed for a missing version counter: the current time in milliseconds.
+
+        If Redis evicts the counter (LRU ignores ``timeout=None``), restarting
+        at a fixed value would bring back pages cached under earlier versions;
+        a timestamp is always ahead of every version handed out before.
+    """
+    return int(time.time() * 1000)
+
+
+def get_catalog_version():
+    """
+        Return the current catalog version, initialising it on first use.
+
+        Returns:
+            int: A counter that changes whenever a Video row changes.
+    """
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        seed = _initial_version()
+        cache.add(CATALOG_VERSION_KEY, seed, timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY, seed)
+    return version
+
+
+def bump_catalog_version():
+    """
+        Invalidate every cached catalog page by moving to a new version.
+    """
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.add(CATALOG_VERSION_KEY, _initial_version(), timeout=None)
+
+
+def catalog_cache_key(prefix, version, request):
+    """
+        Build the cache key of a catalog response.
+
+        The key covers the catalog version, the query string and the host,
+        because thumbnail URLs are absolute.
+
+        Returns:
+            str: The cache key.
+    """
+    digest = hashlib.sha1(request.build_absolute_uri().encode()).hexdigest()
+    return f"catalog:{prefix}:v{version}:{digest}"
+
+
+def build_grouped_catalog():
+    """
+        Build the category-grouped catalog snapshot and store it in Redis.
+
+        A single query ranks the videos of every category with ROW_NUMBER()
+        over (category, created_at DESC, id DESC), served by the
+        ``video_category_created_idx`` index, and keeps the newest
+        CATALOG_GROUP_SIZE per category. The snapshot holds the plain rows;
+        the view serializes them with absolute thumbnail URLs for the
+        requesting host. The ETag is taken from the relative rendering, so
+        it is the same for every host.
+
+        Returns:
+            tuple[list[tuple[str, list[dict]]], str]: The rows per category and the quoted ETag.
+    """
+    release_coalesced(build_grouped_catalog)
+    rows = (
+        Video.objects
+        .annotate(row_number=Window(
+            RowNumber(),
+            partition_by=[F('category')],
+            order_by=[F('created_at').desc(), F('id').desc()],
+        ))
+        .filter(row_number__lte=settings.CATALOG_GROUP_SIZE)
+        .order_by('category', 'row_number')
+    )
+    groups = {}
+    for row in rows.values(*VIDEO_VALUE_FIELDS):
+        groups.setdefault(row['category'], []).append(row)
+    groups = list(groups.items())
+
+    body = JSONRenderer().render(serialize_grouped_catalog(groups))
+    snapshot = (groups, f'"{hashlib.sha1(body).hexdigest()}"')
+    cache.set(GROUPED_SNAPSHOT_KEY, snapshot, timeout=None)
+    logger.info("Grouped catalog snapshot rebuilt with %s categories", len(groups))
+    return snapshot
+
+
+def serialize_grouped_catalog(groups, request=None):
+    """
+        Serialize the snapshot rows to ``[{"category": str, "videos": [...]}, ...]``.
+
+        Args:
+            groups (list[tuple[str, list[dict]]]): Rows per category from ``build_grouped_catalog``.
+            request (HttpRequest, optional): Used to build absolute thumbnail URLs.
+    """
+    return [
+        {'category': category, 'videos': serialize_video_rows(rows, request)}
+        for category, rows in groups
+    ]
+
+
+def get_grouped_catalog():
+    """
+        Return the grouped catalog snapshot, building it inline if Redis has none yet.
+
+        Returns:
+            tuple[list[tuple[str, list[dict]]], str]: The rows per category and the quoted ETag.
+    """
+    snapshot = cache.get(GROUPED_SNAPSHOT_KEY)
+    if snapshot is None:
+        snapshot = build_grouped_catalog()
+    return snapshot
@@ -0,0 +1,138 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .storage import get_media_store, hls_key
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "index.m3u8"
+
+
+class _LocalManifestCache:
+    """
+        Small per-process LRU holding manifest bytes and their ETag.
+
+        Entries expire after ``ttl`` seconds so that a purge issued by another
+        worker is picked up without a Redis round trip on every request.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def purge(self, video_id):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == video_id]:
+                del self._entries[key]
+
+
+_local = _LocalManifestCache(
+    max_entries=settings.MANIFEST_CACHE_LOCAL_ENTRIES,
+    ttl=settings.MANIFEST_CACHE_LOCAL_TTL,
+)
+
+
+def _redis_key(video_id, resolution):
+    return f"hls:manifest:{video_id}:{resolution}"
+
+
+def _read_manifest(video_id, resolution):
+    """
+        Read a rendition playlist from the media store.
+
+        Returns:
+            bytes | None: The playlist, or None if the path is invalid or missing.
+    """
+    try:
+        key = hls_key(video_id, resolution, MANIFEST_NAME)
+    except ValueError:
+        return None
+    return get_media_store().read_bytes(key)
+
+
+def _make_entry(body):
+    return body, f'"{hashlib.sha1(body).hexdigest()}"'
+
+
+def get_manifest(video_id, resolution):
+    """
+        Look up a rendition playlist in the process LRU, then Redis, then the media store.
+
+        Args:
+            video_id (int): The ID of the video.
+            resolution (str): The rendition name, e.g. "720p".
+
+        Returns:
+            tuple[bytes, str] | None: The playlist bytes and a quoted ETag,
+            or None if the playlist does not exist.
+    """
+    key = (video_id, resolution)
+    entry = _local.get(key)
+    if entry is not None:
+        return entry
+
+    entry = cache.get(_redis_key(video_id, resolution))
+    if entry is None:
+        body = _read_manifest(video_id, resolution)
+        if body is None:
+            return None
+        entry = _make_entry(body)
+        cache.set(_redis_key(video_id, resolution), entry, timeout=settings.MANIFEST_CACHE_TIMEOUT)
+
+    _local.set(key, entry)
+    return entry
+
+
+def warm_manifests(video_id):
+    """
+        Load every rendition playlist of a converted video into both cache levels.
+
+        Args:
+            video_id (int): The ID of the video whose playlists should be cached.
+    """
+    try:
+        for resolution, body in get_media_store().iter_playlists(video_id):
+            entry = _make_entry(body)
+            cache.set(_redis_key(video_id, resolution), entry, timeout=settings.MANIFEST_CACHE_TIMEOUT)
+            _local.set((video_id, resolution), entry)
+        logger.info("Manifest cache warmed for video %s", video_id)
+    except Exception:
+        logger.exception("Warming manifest cache failed for video %s", video_id)
+
+
+def purge_manifests(video_id):
+    """
+        Drop all cached playlists of a video from Redis and the local LRU.
+
+        Args:
+            video_id (int): The ID of the video whose playlists should be removed.
+    """
+    cache.delete_pattern(_redis_key(video_id, "*"))
+    _local.purge(video_id)
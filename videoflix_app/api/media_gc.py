@@ -0,0 +1,238 @@
+import json
+import logging
+import shutil
+import time
+from datetime import timedelta
+from pathlib import Path
+
+import django_rq
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from core.jobs import enqueue_coalesced, release_coalesced
+from videoflix_app.models import Video
+from .storage import get_media_store
+
+logger = logging.getLogger(__name__)
+
+DELETION_QUEUE_KEY = "videoflix:media:deletions"
+# Running total of the bytes in the local HLS trees, read by the disk admission check.
+HLS_USAGE_KEY = "videoflix:disk:hls_bytes"
+
+
+def _unlink(path):
+    """
+        Delete a file if it exists.
+
+        Returns:
+            int: The number of bytes freed.
+    """
+    try:
+        size = path.stat().st_size
+        path.unlink()
+        return size
+    except FileNotFoundError:
+        return 0
+
+
+def tree_bytes(root):
+    """
+        Return the total size of the files below ``root`` (0 if it does not exist).
+    """
+    root = Path(root)
+    if not root.is_dir():
+        return 0
+    return sum(f.stat().st_size for f in root.rglob("*") if f.is_file())
+
+
+def hls_bytes_used(store=None):
+    """
+        Return the size of the local HLS trees from the running total in Redis.
+
+        A missing total (first use or eviction) is seeded by walking the
+        tree once. Conversions add their output and deletions subtract what
+        they freed; ``collect_orphan_media`` resets the total from disk, which
+        bounds any drift.
+    """
+    store = store or get_media_store()
+    connection = get_redis_connection("default")
+    used = connection.get(HLS_USAGE_KEY)
+    if used is None:
+        used = tree_bytes(store.work_root)
+        connection.set(HLS_USAGE_KEY, used, nx=True)
+    return int(used)
+
+
+def adjust_hls_usage(delta):
+    """
+        Add ``delta`` bytes to the running total, unless it still has to be seeded.
+    """
+    connection = get_redis_connection("default")
+    if delta and connection.exists(HLS_USAGE_KEY):
+        connection.incrby(HLS_USAGE_KEY, delta)
+
+
+def original_archive_dir(video_id):
+    """
+        Directory the "move" lifecycle policy archives the original of a video to.
+    """
+    return Path(settings.ORIGINAL_ARCHIVE_ROOT) / str(int(video_id))
+
+
+def queue_media_deletion(video_id, video_file_name):
+    """
+        Record the media of a deleted video for background removal.
+
+        The records are drained in batches by ``drain_media_deletions``; bursts
+        of deletions (e.g. a bulk delete in the admin) share a single RQ job.
+
+        Args:
+            video_id (int): The ID of the deleted video.
+            video_file_name (str): The name of its original file, relative to MEDIA_ROOT.
+    """
+    get_redis_connection("default").rpush(
+        DELETION_QUEUE_KEY,
+        json.dumps({"video_id": video_id, "video_file": video_file_name}),
+    )
+    enqueue_coalesced(drain_media_deletions)
+
+
+def delete_video_media(video_id, video_file_name, store=None):
+    """
+        Delete the original upload (or its archived copy), thumbnail and HLS tree of a video.
+
+        Returns:
+            int: The number of bytes freed.
+    """
+    store = store or get_media_store()
+    media_root = Path(settings.MEDIA_ROOT)
+    freed = 0
+    if video_file_name:
+        freed += _unlink(media_root / video_file_name)
+    archive_dir = original_archive_dir(video_id)
+    if archive_dir.is_dir():
+        for path in archive_dir.iterdir():
+            freed += _unlink(path)
+        archive_dir.rmdir()
+    freed += _unlink(media_root / "thumbnail" / f"{video_id}.jpg")
+    hls_freed = store.delete_prefix(video_id)
+    if not store.is_remote:
+        adjust_hls_usage(-hls_freed)
+    return freed + hls_freed
+
+
+def _retry_deletions():
+    django_rq.get_queue("default").enqueue_in(
+        timedelta(seconds=settings.MEDIA_DELETE_RETRY_SECONDS), drain_media_deletions
+    )
+
+
+def drain_media_deletions():
+    """
+        RQ job deleting queued video media in batches of MEDIA_DELETE_BATCH_SIZE.
+
+        Records whose deletion fails are pushed back once the queue is drained
+        and retried after MEDIA_DELETE_RETRY_SECONDS. After
+        MEDIA_DELETE_MAX_ATTEMPTS failures a record is dropped and its files
+        are left to ``collect_orphan_media``.
+
+        Returns:
+            int: The number of bytes freed.
+    """
+    release_coalesced(drain_media_deletions)
+    connection = get_redis_connection("default")
+    store = get_media_store()
+    freed = 0
+    deleted = 0
+    failed = []
+    while True:
+        batch = connection.lpop(DELETION_QUEUE_KEY, settings.MEDIA_DELETE_BATCH_SIZE)
+        if not batch:
+            break
+        for raw in batch:
+            item = json.loads(raw)
+            try:
+                freed += delete_video_media(item["video_id"], item["video_file"], store)
+                deleted += 1
+            except Exception:
+                logger.exception("Deleting media of video %s failed", item["video_id"])
+                item["attempts"] = item.get("attempts", 0) + 1
+                if item["attempts"] >= settings.MEDIA_DELETE_MAX_ATTEMPTS:
+                    logger.error(
+                        "Giving up deleting media of video %s after %s attempts",
+                        item["video_id"], item["attempts"],
+                    )
+                else:
+                    failed.append(json.dumps(item))
+    if failed:
+        connection.rpush(DELETION_QUEUE_KEY, *failed)
+        _retry_deletions()
+    if deleted:
+        logger.info("Deleted media of %s videos, %s bytes freed", deleted, freed)
+    return freed
+
+
+def collect_orphan_media(dry_run=False):
+    """
+        Reconcile the media directories against the Video table and delete orphans.
+
+        Covers HLS trees in the media store, originals in MEDIA_ROOT/video,
+        archived originals in ORIGINAL_ARCHIVE_ROOT and thumbnails in
+        MEDIA_ROOT/thumbnail. Files and directories younger than
+        MEDIA_GC_GRACE_SECONDS (or of unknown age) are kept, so uploads and
+        conversions in flight are never touched.
+
+        Args:
+            dry_run (bool): Only report what would be deleted.
+
+        Returns:
+            dict: Number of orphans and bytes reclaimed per media kind.
+    """
+    cutoff = time.time() - settings.MEDIA_GC_GRACE_SECONDS
+    video_ids = set(Video.objects.values_list("id", flat=True))
+    video_files = set(Video.objects.values_list("video_file", flat=True))
+    media_root = Path(settings.MEDIA_ROOT)
+    store = get_media_store()
+    report = {kind: {"count": 0, "bytes": 0} for kind in ("hls", "originals", "archived", "thumbnails")}
+
+    def reclaim(kind, freed):
+        report[kind]["count"] += 1
+        report[kind]["bytes"] += freed
+
+    for video_id, modified in list(store.iter_video_ids()):
+        if video_id in video_ids or modified is None or modified > cutoff:
+            continue
+        reclaim("hls", 0 if dry_run else store.delete_prefix(video_id))
+    if not dry_run and not store.is_remote:
+        get_redis_connection("default").set(HLS_USAGE_KEY, tree_bytes(store.work_root))
+
+    originals_dir = media_root / "video"
+    if originals_dir.is_dir():
+        for path in originals_dir.iterdir():
+            stat = path.stat()
+            if not path.is_file() or f"video/{path.name}" in video_files or stat.st_mtime > cutoff:
+                continue
+            reclaim("originals", stat.st_size if dry_run else _unlink(path))
+
+    archive_root = Path(settings.ORIGINAL_ARCHIVE_ROOT)
+    if archive_root.is_dir():
+        for path in archive_root.iterdir():
+            if not path.is_dir() or not path.name.isdigit() or int(path.name) in video_ids:
+                continue
+            if path.stat().st_mtime > cutoff:
+                continue
+            size = tree_bytes(path)
+            if not dry_run:
+                shutil.rmtree(path, ignore_errors=True)
+            reclaim("archived", size)
+
+    thumbnail_dir = media_root / "thumbnail"
+    if thumbnail_dir.is_dir():
+        for path in thumbnail_dir.glob("*.jpg"):
+            stat = path.stat()
+            if not path.stem.isdigit() or int(path.stem) in video_ids or stat.st_mtime > cutoff:
+                continue
+            reclaim("thumbnails", stat.st_size if dry_run else _unlink(path))
+
+    logger.info("Media garbage collection%s: %s", " (dry run)" if dry_run else "", report)
+    return report
@@ -0,0 +1,210 @@
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django_redis import get_redis_connection
+
+from videoflix_app.models import Video, VideoHourlyStats
+
+logger = logging.getLogger(__name__)
+
+HOURS_KEY = "videoflix:popularity:hours"
+SEGMENT, MANIFEST = "s", "m"
+
+# Requests since the last flush. deque.append is atomic, so the hot path takes no lock.
+_events = deque()
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def _hour_key(hour):
+    return f"videoflix:popularity:{hour}"
+
+
+def _current_hour():
+    return int(time.time() // 3600)
+
+
+def _start_flusher():
+    """
+        Start the per-process flush thread lazily, so it runs after gunicorn forks its workers.
+    """
+    global _flusher
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name="popularity-flush", daemon=True)
+            _flusher.start()
+            atexit.register(flush_counters)
+
+
+def count_request(video_id, resolution, kind=SEGMENT):
+    """
+        Count one segment or manifest request of a video rendition.
+
+        Only appends to an in-process buffer, so the cost on the request path
+        stays well below a microsecond; ``flush_counters`` aggregates the buffer
+        and ships the counts to Redis every POPULARITY_FLUSH_INTERVAL seconds.
+
+        Args:
+            video_id (int): The requested video.
+            resolution (str): The rendition, e.g. "720p".
+            kind (str): SEGMENT or MANIFEST.
+    """
+    if _flusher is None:
+        _start_flusher()
+    _events.append((video_id, resolution, kind))
+
+
+def _flush_loop():
+    while True:
+        time.sleep(settings.POPULARITY_FLUSH_INTERVAL)
+        try:
+            flush_counters()
+        except Exception:
+            logger.exception("Flushing popularity counters failed")
+
+
+def flush_counters():
+    """
+        Aggregate the buffered requests and add them to the Redis hash of the
+        current hour. All increments go out as one pipelined round trip.
+    """
+    counts = Counter(_events.popleft() for _ in range(len(_events)))
+    if not counts:
+        return
+    hour = _current_hour()
+    key = _hour_key(hour)
+    pipe = get_redis_connection("default").pipeline(transaction=False)
+    for (video_id, resolution, kind), amount in counts.items():
+        pipe.hincrby(key, f"{video_id}:{resolution}:{kind}", amount)
+    pipe.expire(key, settings.POPULARITY_REDIS_TTL)
+    pipe.sadd(HOURS_KEY, hour)
+    pipe.execute()
+
+
+def _aggregate_hour(raw):
+    """
+        Turn an hourly Redis hash into ``{(video_id, resolution): [segments, manifests]}``.
+    """
+    totals = {}
+    for field, value in raw.items():
+        video_id, resolution, kind = field.decode().rsplit(":", 2)
+        counts = totals.setdefault((int(video_id), resolution), [0, 0])
+        counts[0 if kind == SEGMENT else 1] += int(value)
+    return totals
+
+
+def rollup_popularity():
+    """
+        Periodic job moving finished hours from Redis into VideoHourlyStats.
+
+        An hour is rolled up once the following hour is over too, so late
+        flushes from other processes have landed. Rows of deleted videos are
+        skipped.
+
+        Returns:
+            int: The number of rows written.
+    """
+    connection = get_redis_connection("default")
+    last_open_hour = _current_hour() - 1
+    written = 0
+    for hour in sorted(int(h) for h in connection.smembers(HOURS_KEY)):
+        if hour >= last_open_hour:
+            continue
+        totals = _aggregate_hour(connection.hgetall(_hour_key(hour)))
+        existing = set(Video.objects.filter(pk__in={v for v, _ in totals}).values_list('id', flat=True))
+        started_at = datetime.fromtimestamp(hour * 3600, tz=timezone.utc)
+        rows = [
+            VideoHourlyStats(
+                video_id=video_id,
+                hour=started_at,
+                resolution=resolution,
+                segment_requests=segments,
+                manifest_requests=manifests,
+            )
+            for (video_id, resolution), (segments, manifests) in totals.items()
+            if video_id in existing
+        ]
+        VideoHourlyStats.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['video', 'hour', 'resolution'],
+            update_fields=['segment_requests', 'manifest_requests'],
+        )
+        pipe = connection.pipeline(transaction=False)
+        pipe.delete(_hour_key(hour))
+        pipe.srem(HOURS_KEY, hour)
+        pipe.execute()
+        written += len(rows)
+    if written:
+        logger.info("Rolled up %s hourly popularity rows", written)
+    return written
+
+
+def _recent_segment_counts(hours):
+    """
+        Sum segment requests per video over the last ``hours`` hours.
+        Hours not rolled up yet are read from Redis.
+    """
+    since_hour = _current_hour() - hours + 1
+    totals = Counter(dict(
+        VideoHourlyStats.objects
+        .filter(hour__gte=datetime.fromtimestamp(since_hour * 3600, tz=timezone.utc))
+        .values_list('video_id')
+        .annotate(total=Sum('segment_requests'))
+    ))
+    connection = get_redis_connection("default")
+    pending = [int(h) for h in connection.smembers(HOURS_KEY) if int(h) >= since_hour]
+    pipe = connection.pipeline(transaction=False)
+    for hour in pending:
+        pipe.hgetall(_hour_key(hour))
+    for raw in pipe.execute() if pending else []:
+        for (video_id, _), (segments, _) in _aggregate_hour(raw).items():
+            totals[video_id] += segments
+    return totals
+
+
+def get_trending(hours=None, limit=None):
+    """
+        Return the most requested videos of the last ``hours`` hours.
+
+        Cached for POPULARITY_CACHE_TIMEOUT seconds.
+
+        Returns:
+            list[tuple[int, int]]: ``(video_id, segment_requests)`` pairs, most requested first.
+    """
+    hours = hours or settings.POPULARITY_TRENDING_HOURS
+    limit = limit or settings.POPULARITY_RESULT_LIMIT
+    key = f"popularity:trending:{hours}:{limit}"
+    result = cache.get(key)
+    if result is None:
+        result = _recent_segment_counts(hours).most_common(limit)
+        cache.set(key, result, timeout=settings.POPULARITY_CACHE_TIMEOUT)
+    return result
+
+
+def get_most_watched(limit=None):
+    """
+        Return the videos with the most segment requests of all time (rolled-up hours only).
+
+        Returns:
+            list[tuple[int, int]]: ``(video_id, segment_requests)`` pairs, most requested first.
+    """
+    limit = limit or settings.POPULARITY_RESULT_LIMIT
+    key = f"popularity:most_watched:{limit}"
+    result = cache.get(key)
+    if result is None:
+        result = list(
+            VideoHourlyStats.objects
+            .values_list('video_id')
+            .annotate(total=Sum('segment_requests'))
+            .order_by('-total')[:limit]
+        )
+        cache.set(key, result, timeout=settings.POPULARITY_CACHE_TIMEOUT)
+    return result
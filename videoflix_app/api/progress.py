@@ -0,0 +1,181 @@
+import json
+import logging
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django_redis import get_redis_connection
+
+from videoflix_app.models import Video, WatchProgress
+
+logger = logging.getLogger(__name__)
+
+DIRTY_ENTRIES_KEY = "videoflix:progress:dirty"
+# Marks a user hash as merged with Postgres, so later reads never hit the database.
+LOADED_FIELD = "_"
+
+
+def _user_key(user_id):
+    return f"videoflix:progress:{user_id}"
+
+
+def _decode_entry(video_id, raw):
+    position, duration, updated_at = json.loads(raw)
+    return {"video_id": int(video_id), "position": position, "duration": duration, "updated_at": updated_at}
+
+
+def _is_finished(entry):
+    duration = entry["duration"]
+    return bool(duration) and entry["position"] >= duration * settings.WATCH_PROGRESS_COMPLETE_RATIO
+
+
+def record_progress(user_id, video_id, position, duration=None):
+    """
+        Store a player heartbeat in Redis; Postgres is updated by ``flush_watch_progress``.
+
+        Costs one pipelined round trip: the entry is written to the user's hash,
+        the hash TTL is refreshed and the entry is marked dirty.
+
+        Args:
+            user_id (int): The watching user.
+            video_id (int): The video being played.
+            position (float): Playback position in seconds.
+            duration (float, optional): Duration of the video in seconds.
+    """
+    key = _user_key(user_id)
+    pipe = get_redis_connection("default").pipeline(transaction=False)
+    pipe.hset(key, str(video_id), json.dumps([position, duration, time.time()]))
+    pipe.expire(key, settings.WATCH_PROGRESS_CACHE_TTL)
+    pipe.sadd(DIRTY_ENTRIES_KEY, f"{user_id}:{video_id}")
+    pipe.execute()
+
+
+def _load_user_progress(connection, user_id, cached=None):
+    """
+        Merge a user's Postgres rows into their Redis hash after it expired or was never built.
+
+        Entries already in Redis come from newer heartbeats and are kept.
+
+        Returns:
+            dict: The merged hash contents, as returned by HGETALL.
+    """
+    key = _user_key(user_id)
+    loaded = {LOADED_FIELD.encode(): b"1"}
+    for row in WatchProgress.objects.filter(user_id=user_id).values('video_id', 'position', 'duration', 'updated_at'):
+        value = json.dumps([row['position'], row['duration'], row['updated_at'].timestamp()])
+        loaded[str(row['video_id']).encode()] = value.encode()
+    pipe = connection.pipeline(transaction=False)
+    for field, value in loaded.items():
+        pipe.hsetnx(key, field, value)
+    pipe.expire(key, settings.WATCH_PROGRESS_CACHE_TTL)
+    pipe.execute()
+    return {**loaded, **(cached or {})}
+
+
+def get_user_progress(user_id):
+    """
+        Return all progress entries of a user, most recently watched first.
+
+        Served by a single HGETALL while the user's hash is warm.
+
+        Returns:
+            list[dict]: Entries with ``video_id``, ``position``, ``duration`` and ``updated_at`` (epoch seconds).
+    """
+    connection = get_redis_connection("default")
+    raw = connection.hgetall(_user_key(user_id))
+    if LOADED_FIELD.encode() not in raw:
+        raw = _load_user_progress(connection, user_id, raw)
+    entries = [
+        _decode_entry(video_id, value)
+        for video_id, value in raw.items()
+        if video_id.decode() != LOADED_FIELD
+    ]
+    return sorted(entries, key=lambda entry: entry["updated_at"], reverse=True)
+
+
+def get_continue_watching(user_id, limit=None):
+    """
+        Return the videos a user started but did not finish, most recent first.
+    """
+    entries = [entry for entry in get_user_progress(user_id) if not _is_finished(entry)]
+    return entries[:limit or settings.WATCH_PROGRESS_LIST_LIMIT]
+
+
+def get_video_progress(user_id, video_id):
+    """
+        Return the progress entry of one video, or None if the user never played it.
+    """
+    connection = get_redis_connection("default")
+    pipe = connection.pipeline(transaction=False)
+    pipe.hget(_user_key(user_id), str(video_id))
+    pipe.hexists(_user_key(user_id), LOADED_FIELD)
+    raw, loaded = pipe.execute()
+    if raw is None and not loaded:
+        raw = _load_user_progress(connection, user_id).get(str(video_id).encode())
+    return _decode_entry(video_id, raw) if raw is not None else None
+
+
+def flush_watch_progress():
+    """
+        Periodic job writing changed progress entries to Postgres.
+
+        Dirty entries are taken from Redis in batches of
+        WATCH_PROGRESS_FLUSH_BATCH and upserted with one
+        ``bulk_create(update_conflicts=True)`` per batch. Entries of deleted
+        users or videos are dropped from Redis instead.
+
+        Returns:
+            int: The number of rows written.
+    """
+    connection = get_redis_connection("default")
+    written = 0
+    while True:
+        members = connection.spop(DIRTY_ENTRIES_KEY, settings.WATCH_PROGRESS_FLUSH_BATCH)
+        if not members:
+            break
+        try:
+            written += _flush_entries(connection, [tuple(map(int, m.split(b":"))) for m in members])
+        except Exception:
+            connection.sadd(DIRTY_ENTRIES_KEY, *members)
+            raise
+    if written:
+        logger.info("Flushed %s watch progress rows", written)
+    return written
+
+
+def _flush_entries(connection, pairs):
+    pipe = connection.pipeline(transaction=False)
+    for user_id, video_id in pairs:
+        pipe.hget(_user_key(user_id), str(video_id))
+    values = pipe.execute()
+
+    entries = [
+        (user_id, _decode_entry(video_id, value))
+        for (user_id, video_id), value in zip(pairs, values)
+        if value is not None
+    ]
+    videos = set(Video.objects.filter(pk__in={e["video_id"] for _, e in entries}).values_list('id', flat=True))
+    users = set(get_user_model().objects.filter(pk__in={u for u, _ in entries}).values_list('id', flat=True))
+
+    rows = []
+    pipe = connection.pipeline(transaction=False)
+    for user_id, entry in entries:
+        if entry["video_id"] not in videos or user_id not in users:
+            pipe.hdel(_user_key(user_id), str(entry["video_id"]))
+            continue
+        rows.append(WatchProgress(
+            user_id=user_id,
+            video_id=entry["video_id"],
+            position=entry["position"],
+            duration=entry["duration"],
+            updated_at=datetime.fromtimestamp(entry["updated_at"], tz=timezone.utc),
+        ))
+    WatchProgress.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['user', 'video'],
+        update_fields=['position', 'duration', 'updated_at'],
+    )
+    pipe.execute()
+    return len(rows)
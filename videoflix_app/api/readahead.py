@@ -0,0 +1,140 @@
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PATTERN = re.compile(r"^(\d+)\.ts$")
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+_pending_lock = threading.Lock()
+_sessions = OrderedDict()
+_sessions_lock = threading.Lock()
+
+
+def _get_executor():
+    """
+        Create the read-ahead thread pool lazily, so it is started after gunicorn forks its workers.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.SEGMENT_READAHEAD_WORKERS,
+                    thread_name_prefix="segment-readahead",
+                )
+    return _executor
+
+
+def _next_segments(segment, count):
+    """
+        Build the file names of the ``count`` segments following ``segment``.
+
+        Args:
+            segment (str): The requested segment name, e.g. "007.ts".
+            count (int): How many following segments to return.
+
+        Returns:
+            tuple[int, list[tuple[int, str]]] | None: The index of ``segment``
+            and ``(index, name)`` pairs of its successors, or None if the name
+            does not follow the ffmpeg ``%03d.ts`` pattern.
+    """
+    match = SEGMENT_PATTERN.match(segment)
+    if not match:
+        return None
+    digits = match.group(1)
+    index = int(digits)
+    width = len(digits)
+    return index, [(i, f"{i:0{width}d}.ts") for i in range(index + 1, index + count + 1)]
+
+
+def _claim_window(session_key, index, last_wanted):
+    """
+        Decide which part of the read-ahead window still has to be scheduled for a client.
+
+        Only sequential playback triggers read-ahead: a request that jumps away
+        from the previous position (seeking, scrubbing) resets the window
+        without prefetching, so a scrubbing client cannot flood the page cache.
+
+        Returns:
+            int | None: The first index that still needs prefetching, or None.
+    """
+    with _sessions_lock:
+        previous = _sessions.get(session_key)
+        sequential = previous is None or index == previous[0] + 1
+        prefetched_until = previous[1] if previous is not None and sequential else index
+        _sessions[session_key] = (index, max(prefetched_until, last_wanted) if sequential else index)
+        _sessions.move_to_end(session_key)
+        while len(_sessions) > settings.SEGMENT_READAHEAD_MAX_SESSIONS:
+            _sessions.popitem(last=False)
+    if not sequential or prefetched_until >= last_wanted:
+        return None
+    return max(prefetched_until, index) + 1
+
+
+def _prefetch(path):
+    """
+        Ask the kernel to pull a segment file into the page cache.
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        else:
+            while os.read(fd, 1024 * 1024):
+                pass
+    except OSError as e:
+        logger.debug("Read-ahead failed for %s: %s", path, e)
+    finally:
+        os.close(fd)
+        with _pending_lock:
+            _pending.discard(path)
+
+
+def schedule_readahead(client_id, video_id, resolution, segment):
+    """
+        Prefetch the segments that follow ``segment`` in the background.
+
+        Prefetching is bounded twice: per client it only follows sequential
+        playback, and globally at most SEGMENT_READAHEAD_MAX_PENDING files may
+        be queued at once; further requests are dropped rather than queued.
+
+        Args:
+            client_id: Identifies the viewer, usually the user's ID.
+            video_id (int): The ID of the video.
+            resolution (str): The rendition name, e.g. "720p".
+            segment (str): The segment that was just requested.
+    """
+    count = settings.SEGMENT_READAHEAD_COUNT
+    if count <= 0:
+        return
+    following = _next_segments(segment, count)
+    if following is None:
+        return
+    index, successors = following
+    first_index = _claim_window((client_id, video_id, resolution), index, index + count)
+    if first_index is None:
+        return
+
+    rendition_dir = Path(settings.VIDEO_ROOT) / str(video_id) / resolution
+    for successor_index, name in successors:
+        if successor_index < first_index:
+            continue
+        path = str(rendition_dir / name)
+        with _pending_lock:
+            if path in _pending or len(_pending) >= settings.SEGMENT_READAHEAD_MAX_PENDING:
+                continue
+            _pending.add(path)
+        _get_executor().submit(_prefetch, path)
@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db.models import F, Q
+
+from videoflix_app.models import Video
+
+
+def video_search_vector():
+    """
+        Expression for the stored ``Video.search_vector`` column: titles weigh more than descriptions.
+    """
+    return (
+        SearchVector('title', weight='A', config=settings.SEARCH_CONFIG)
+        + SearchVector('description', weight='B', config=settings.SEARCH_CONFIG)
+    )
+
+
+def update_search_vector(*pks):
+    """
+        Recompute the stored search vector of the given videos, or of all videos if none are given.
+
+        Returns:
+            int: The number of updated rows.
+    """
+    queryset = Video.objects.all()
+    if pks:
+        queryset = queryset.filter(pk__in=pks)
+    return queryset.update(search_vector=video_search_vector())
+
+
+def search_videos(term, queryset=None):
+    """
+        Full-text search over titles and descriptions with trigram typo tolerance.
+
+        Matches either the GIN-indexed ``search_vector`` (websearch syntax) or
+        titles that are trigram-similar to the term (``video_title_trgm_idx``),
+        ranked by text rank first and title similarity second.
+
+        Args:
+            term (str): The user's search input.
+            queryset (QuerySet, optional): The videos to search, defaults to all.
+
+        Returns:
+            QuerySet: The matching videos, best match first.
+    """
+    if queryset is None:
+        queryset = Video.objects.all()
+    query = SearchQuery(term, search_type='websearch', config=settings.SEARCH_CONFIG)
+    return (
+        queryset
+        .filter(Q(search_vector=query) | Q(title__trigram_similar=term))
+        .annotate(
+            rank=SearchRank(F('search_vector'), query),
+            similarity=TrigramSimilarity('title', term),
+        )
+        .order_by('-rank', '-similarity', '-created_at')
+    )
@@ -0,0 +1,210 @@
+import hashlib
+import logging
+import mmap
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class FrequencySketch:
+    """
+        Count-min sketch with periodic halving, used as the TinyLFU frequency filter.
+
+        Counts are approximate and only ever over-estimate. After ``sample_size``
+        increments every counter is halved so that old popularity fades out.
+    """
+
+    DEPTH = 4
+
+    def __init__(self, width, sample_size):
+        self.width = width
+        self.sample_size = sample_size
+        self._rows = [[0] * width for _ in range(self.DEPTH)]
+        self._additions = 0
+
+    def _indexes(self, key):
+        digest = hashlib.blake2b(repr(key).encode(), digest_size=4 * self.DEPTH).digest()
+        return [
+            int.from_bytes(digest[i * 4:(i + 1) * 4], "little") % self.width
+            for i in range(self.DEPTH)
+        ]
+
+    def increment(self, key):
+        for row, index in zip(self._rows, self._indexes(key)):
+            row[index] += 1
+        self._additions += 1
+        if self._additions >= self.sample_size:
+            self._reset()
+
+    def estimate(self, key):
+        return min(row[index] for row, index in zip(self._rows, self._indexes(key)))
+
+    def _reset(self):
+        for row in self._rows:
+            for i, value in enumerate(row):
+                row[i] = value >> 1
+        self._additions //= 2
+
+
+class SegmentCache:
+    """
+        Bounded, size-aware residency set of hot HLS segments kept as read-only mmaps.
+
+        Segments are mapped straight from VIDEO_ROOT and hinted with
+        ``MADV_WILLNEED``, so the most requested segments stay in the kernel
+        page cache that every gunicorn worker shares. The cache never serves
+        bytes itself: the views always answer with ``FileResponse``, which
+        sends the (now resident) file with ``sendfile`` where available.
+
+        Admission follows TinyLFU: every request is counted in a frequency
+        sketch and a new segment only displaces LRU victims that are requested
+        less often than itself.
+
+        Entries expire ``ttl`` seconds after admission. A purge only reaches
+        the worker that handled the delete; the others drop their mappings of
+        deleted files (and release the unlinked inodes) on expiry.
+    """
+
+    def __init__(self, max_bytes, max_item_bytes, sketch_width, ttl):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.ttl = ttl
+        self._next_sweep = time.monotonic() + ttl
+        self._sketch = FrequencySketch(sketch_width, sample_size=sketch_width * 10)
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejections = 0
+
+    def touch(self, key):
+        """
+            Record a request for ``key`` and report whether it is resident.
+
+            Args:
+                key (tuple): ``(video_id, resolution, segment)``.
+
+            Returns:
+                bool: True on a hit, False if the segment should be offered
+                to ``admit``.
+        """
+        with self._lock:
+            self._sketch.increment(key)
+            now = time.monotonic()
+            if now >= self._next_sweep:
+                self._sweep(now)
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= now:
+                self._evict(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True
+
+    def admit(self, key, path):
+        """
+            Offer a segment file to the cache after a miss.
+
+            Args:
+                key (tuple): ``(video_id, resolution, segment)``.
+                path (Path): The segment file on disk.
+
+            Returns:
+                bool: True if the segment was admitted.
+        """
+        if self.max_bytes <= 0:
+            return False
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0 or size > self.max_item_bytes or size > self.max_bytes:
+                return False
+            with self._lock:
+                if key in self._entries:
+                    return True
+                if not self._make_room(key, size):
+                    self.rejections += 1
+                    return False
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                if hasattr(mapped, "madvise"):
+                    mapped.madvise(mmap.MADV_WILLNEED)
+                self._entries[key] = (mapped, time.monotonic() + self.ttl)
+                self._size += size
+        return True
+
+    def _make_room(self, key, size):
+        """
+            Evict LRU victims until ``size`` bytes fit, unless a victim is more
+            popular than the candidate. Must be called with the lock held.
+        """
+        if self._size + size <= self.max_bytes:
+            return True
+        candidate_frequency = self._sketch.estimate(key)
+        victims = []
+        freed = 0
+        for victim_key, (mapped, _) in self._entries.items():
+            if self._size - freed + size <= self.max_bytes:
+                break
+            if self._sketch.estimate(victim_key) >= candidate_frequency:
+                return False
+            victims.append(victim_key)
+            freed += len(mapped)
+        for victim_key in victims:
+            self._evict(victim_key)
+        return True
+
+    def _evict(self, key):
+        mapped, _ = self._entries.pop(key)
+        self._size -= len(mapped)
+        mapped.close()
+        self.evictions += 1
+
+    def _sweep(self, now):
+        """
+            Evict every expired entry. Must be called with the lock held.
+        """
+        for key in [k for k, (_, expires_at) in self._entries.items() if expires_at <= now]:
+            self._evict(key)
+        self._next_sweep = now + self.ttl
+
+    def purge(self, video_id):
+        """
+            Drop every cached segment of a video from this process.
+            Other workers drop theirs when the entries expire.
+
+            Args:
+                video_id (int): The ID of the video.
+        """
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == video_id]:
+                self._evict(key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "rejections": self.rejections,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
+
+
+segment_cache = SegmentCache(
+    max_bytes=settings.SEGMENT_CACHE_MAX_BYTES,
+    max_item_bytes=settings.SEGMENT_CACHE_MAX_ITEM_BYTES,
+    sketch_width=settings.SEGMENT_CACHE_SKETCH_WIDTH,
+    ttl=settings.SEGMENT_CACHE_TTL,
+)
+
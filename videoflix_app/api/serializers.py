@@ -1,6 +1,10 @@
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
 from videoflix_app.models import Video
 
+VIDEO_VALUE_FIELDS = ('id', 'title', 'description', 'category', 'created_at')
+
 
 class VideoSerializer(serializers.ModelSerializer):
     thumbnail_url = serializers.SerializerMethodField()
@@ -19,8 +23,61 @@ class VideoSerializer(serializers.ModelSerializer):
         """
             Dynamically build thumbnail URL based on video ID
         """
-        request = self.context.get('request')
-        path = f"/media/thumbnail/{obj.id}.jpg"
-        if request:
-            return request.build_absolute_uri(path)
-        return path
\ No newline at end of file
+        return f"{thumbnail_base_url(self.context.get('request'))}{obj.id}.jpg"
+
+
+def thumbnail_base_url(request=None):
+    """
+        Return the URL thumbnails live under (MEDIA_URL/thumbnail/), absolute if a request is given.
+    """
+    path = f"{settings.MEDIA_URL}thumbnail/"
+    return request.build_absolute_uri(path) if request else path
+
+
+def _format_datetime(value):
+    """
+        Format a datetime exactly like DRF's ISO 8601 DateTimeField output.
+    """
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    text = value.isoformat()
+    if text.endswith('+00:00'):
+        text = text[:-6] + 'Z'
+    return text
+
+
+def serialize_video_rows(rows, request=None):
+    """
+        Fast path producing the same JSON shape as ``VideoSerializer(many=True)``.
+
+        Works on plain ``.values(*VIDEO_VALUE_FIELDS)`` rows instead of model
+        instances and resolves the absolute thumbnail base URL once per call
+        instead of once per video.
+
+        Args:
+            rows (iterable[dict]): Rows from ``queryset.values(*VIDEO_VALUE_FIELDS)``.
+            request (HttpRequest, optional): Used to build absolute thumbnail URLs.
+
+        Returns:
+            list[dict]: The serialized videos.
+    """
+    thumbnail_base = thumbnail_base_url(request)
+    return [
+        {
+            'id': row['id'],
+            'title': row['title'],
+            'description': row['description'],
+            'category': row['category'],
+            'thumbnail_url': f"{thumbnail_base}{row['id']}.jpg",
+            'created_at': _format_datetime(row['created_at']),
+        }
+        for row in rows
+    ]
+
+
+class WatchProgressSerializer(serializers.Serializer):
+    """
+    Player heartbeat: playback position and, if known, the video duration in seconds.
+    """
+    position = serializers.FloatField(min_value=0)
+    duration = serializers.FloatField(min_value=0, required=False, allow_null=True)
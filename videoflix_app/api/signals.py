@@ -1,39 +1,55 @@
-from django.conf import settings
 from django.dispatch import receiver
-from django.db import transaction
-from django.db.models.signals import post_save, post_delete
+from django.db import connections, transaction
+from django.db.models.signals import post_save, post_delete, pre_migrate
 import django_rq
 
 from videoflix_app.models import Video
-from .utils import  convert_and_save
+from core.jobs import enqueue_coalesced
+from .catalog import build_grouped_catalog, bump_catalog_version
+from .manifest_cache import purge_manifests
+from .media_gc import queue_media_deletion
+from .search import update_search_vector
+from .segment_cache import segment_cache
+from .utils import admit_conversion
+
+
+@receiver(pre_migrate)
+def ensure_trigram_extension(sender, using, **kwargs):
+    """
+    Create the pg_trgm extension before migrations add the trigram index on Video.title.
+    """
+    connection = connections[using]
+    if sender.name == 'videoflix_app' and connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+
+def catalog_changed():
+    """
+    Invalidate cached catalog pages and schedule a rebuild of the grouped snapshot.
+    """
+    bump_catalog_version()
+    enqueue_coalesced(build_grouped_catalog)
 
 
 @receiver(post_save, sender=Video)
-def video_post_save(sender, instance, created, **kwargs):
+def video_post_save(sender, instance, created, update_fields=None, **kwargs):
+    transaction.on_commit(catalog_changed)
+    if update_fields is None or {'title', 'description'} & set(update_fields):
+        update_search_vector(instance.pk)
     if created:
         Video.objects.filter(pk=instance.pk).update(conversion_status='processing')
-        transaction.on_commit(lambda: django_rq.enqueue(convert_and_save, instance.id))
+        transaction.on_commit(lambda: django_rq.enqueue(admit_conversion, instance.id))
           
             
 @receiver(post_delete, sender=Video)
 def auto_delete_video_on_delete(sender, instance, **kwargs):
     """
-    Deletes original video and HLS segments when a Video object is deleted.
+    Drops cached playlists and segments of a deleted Video and queues its
+    original, thumbnail and HLS files for deletion by a background job.
     """
-    from pathlib import Path
-    import shutil
-    
-    if instance.video_file:
-        file_path = Path(instance.video_file.path)
-        if file_path.is_file():
-            try:
-                file_path.unlink()
-            except Exception as e:
-                print(f"Error deleting file {file_path}: {e}")
-
-    hls_dir = Path(settings.MEDIA_ROOT) / "hls" / str(instance.id)
-    if hls_dir.exists() and hls_dir.is_dir():
-        try:
-            shutil.rmtree(hls_dir)
-        except Exception as e:
-            print(f"Error deleting HLS folder {hls_dir}: {e}")
+    purge_manifests(instance.id)
+    segment_cache.purge(instance.id)
+    video_id, video_file_name = instance.id, instance.video_file.name
+    transaction.on_commit(catalog_changed)
+    transaction.on_commit(lambda: queue_media_deletion(video_id, video_file_name))
@@ -0,0 +1,261 @@
+import logging
+import re
+import shutil
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger(__name__)
+
+HLS_NAME_PATTERN = re.compile(r"^[\w-]+(\.(ts|m3u8))?$")
+CONTENT_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+}
+
+
+def hls_key(video_id, *parts):
+    """
+        Build the storage key of a file in a video's HLS tree, e.g. ``12/720p/003.ts``.
+
+        Raises:
+            ValueError: If a part is not a plain rendition or file name.
+        Returns:
+            str: The key relative to the HLS root.
+    """
+    for part in parts:
+        if not HLS_NAME_PATTERN.match(part):
+            raise ValueError(f"Invalid HLS path component: {part!r}")
+    return "/".join([str(int(video_id)), *parts])
+
+
+class LocalMediaStore:
+    """
+    HLS trees on the local filesystem under VIDEO_ROOT.
+    ffmpeg writes straight into the store, so nothing has to be uploaded.
+    """
+    is_remote = False
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    @property
+    def work_root(self):
+        """
+        Directory under which ffmpeg writes the HLS trees of all videos.
+        """
+        return self.root
+
+    def work_dir(self, video_id):
+        return self.work_root / str(video_id)
+
+    def path(self, key):
+        return self.root / key
+
+    def upload_file(self, local_path, key):
+        target = self.path(key)
+        if Path(local_path).resolve() != target.resolve():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(local_path, target)
+
+    def read_bytes(self, key):
+        try:
+            return self.path(key).read_bytes()
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+
+    def iter_playlists(self, video_id):
+        for playlist in self.work_dir(video_id).glob("*/index.m3u8"):
+            yield playlist.parent.name, playlist.read_bytes()
+
+    def delete_prefix(self, video_id):
+        """
+        Delete a video's HLS tree and return the number of bytes freed.
+        """
+        video_dir = self.work_dir(video_id)
+        if not video_dir.is_dir():
+            return 0
+        freed = sum(f.stat().st_size for f in video_dir.rglob("*") if f.is_file())
+        shutil.rmtree(video_dir)
+        return freed
+
+    def iter_video_ids(self):
+        """
+        Yield ``(video_id, modified_timestamp)`` for every HLS tree in the store.
+        """
+        if not self.root.is_dir():
+            return
+        for video_dir in self.root.iterdir():
+            if video_dir.is_dir() and video_dir.name.isdigit():
+                yield int(video_dir.name), video_dir.stat().st_mtime
+
+    def presigned_url(self, key):
+        """
+        URL of a file under VIDEO_URL; local files need no signature.
+        """
+        return f"{settings.VIDEO_URL}{key}"
+
+    def finish_upload(self, video_id):
+        pass
+
+
+class S3MediaStore:
+    """
+    HLS trees in an S3-compatible bucket (AWS S3, MinIO, ...).
+
+    ffmpeg writes into a local scratch directory; finished segments are
+    uploaded while the encode is still running, and playback is served by
+    redirecting to short-lived presigned URLs.
+    """
+    is_remote = True
+
+    def __init__(self, bucket, prefix, endpoint_url, public_endpoint_url, region, access_key, secret_key, presign_ttl, scratch_root):
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.endpoint_url = endpoint_url or None
+        self.public_endpoint_url = public_endpoint_url or self.endpoint_url
+        self.region = region or None
+        self.access_key = access_key or None
+        self.secret_key = secret_key or None
+        self.presign_ttl = presign_ttl
+        self.scratch_root = Path(scratch_root or tempfile.gettempdir()) / "videoflix-hls"
+
+    def _make_client(self, endpoint_url):
+        try:
+            import boto3
+            from botocore.config import Config
+        except ImportError:
+            raise ImproperlyConfigured("MEDIA_STORE_BACKEND='s3' requires the boto3 package.")
+        return boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=self.region,
+            aws_access_key_id=self.access_key,
+            aws_secret_access_key=self.secret_key,
+            config=Config(
+                signature_version="s3v4",
+                max_pool_connections=settings.MEDIA_STORE_UPLOAD_WORKERS * 2,
+                s3={"addressing_style": "path"},
+            ),
+        )
+
+    @property
+    def client(self):
+        if not hasattr(self, "_client"):
+            self._client = self._make_client(self.endpoint_url)
+        return self._client
+
+    @property
+    def public_client(self):
+        """
+        Client used only for presigning, so URLs point at the endpoint players can reach.
+        """
+        if not hasattr(self, "_public_client"):
+            self._public_client = self._make_client(self.public_endpoint_url)
+        return self._public_client
+
+    def _object_key(self, key):
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    @property
+    def work_root(self):
+        return self.scratch_root
+
+    def work_dir(self, video_id):
+        return self.work_root / str(video_id)
+
+    def upload_file(self, local_path, key):
+        extra_args = {}
+        content_type = CONTENT_TYPES.get(Path(key).suffix)
+        if content_type:
+            extra_args["ContentType"] = content_type
+        self.client.upload_file(str(local_path), self.bucket, self._object_key(key), ExtraArgs=extra_args)
+
+    def read_bytes(self, key):
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._object_key(key))
+        except self.client.exceptions.NoSuchKey:
+            return None
+        return response["Body"].read()
+
+    def _iter_keys(self, prefix):
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._object_key(prefix)):
+            for item in page.get("Contents", []):
+                yield item
+
+    def iter_playlists(self, video_id):
+        object_prefix = self._object_key(f"{int(video_id)}/")
+        for item in self._iter_keys(f"{int(video_id)}/"):
+            parts = item["Key"][len(object_prefix):].split("/")
+            if len(parts) == 2 and parts[1] == "index.m3u8":
+                yield parts[0], self.read_bytes(hls_key(video_id, *parts))
+
+    def delete_prefix(self, video_id):
+        batch = []
+        freed = 0
+        for item in self._iter_keys(f"{int(video_id)}/"):
+            batch.append({"Key": item["Key"]})
+            freed += item["Size"]
+            if len(batch) == 1000:
+                self.client.delete_objects(Bucket=self.bucket, Delete={"Objects": batch})
+                batch = []
+        if batch:
+            self.client.delete_objects(Bucket=self.bucket, Delete={"Objects": batch})
+        return freed
+
+    def iter_video_ids(self):
+        """
+        Yield ``(video_id, modified_timestamp)`` for every HLS tree in the bucket.
+
+        S3 has no directory times, so the whole tree is listed and the newest
+        LastModified of its objects is used; a tree still being uploaded
+        therefore counts as recent.
+        """
+        root = self._object_key("")
+        newest = {}
+        for item in self._iter_keys(""):
+            name = item["Key"][len(root):].split("/", 1)[0]
+            if name.isdigit():
+                modified = item["LastModified"].timestamp()
+                newest[int(name)] = max(newest.get(int(name), modified), modified)
+        yield from newest.items()
+
+    def presigned_url(self, key):
+        return self.public_client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self._object_key(key)},
+            ExpiresIn=self.presign_ttl,
+        )
+
+    def finish_upload(self, video_id):
+        shutil.rmtree(self.work_dir(video_id), ignore_errors=True)
+
+
+@lru_cache(maxsize=None)
+def get_media_store():
+    """
+        Return the configured media store (MEDIA_STORE_BACKEND: "local" or "s3").
+
+        Raises:
+            ImproperlyConfigured: If the backend name is unknown.
+    """
+    backend = settings.MEDIA_STORE_BACKEND
+    if backend == "local":
+        return LocalMediaStore(settings.VIDEO_ROOT)
+    if backend == "s3":
+        return S3MediaStore(
+            bucket=settings.MEDIA_STORE_S3_BUCKET,
+            prefix=settings.MEDIA_STORE_S3_PREFIX,
+            endpoint_url=settings.MEDIA_STORE_S3_ENDPOINT_URL,
+            public_endpoint_url=settings.MEDIA_STORE_S3_PUBLIC_ENDPOINT_URL,
+            region=settings.MEDIA_STORE_S3_REGION,
+            access_key=settings.MEDIA_STORE_S3_ACCESS_KEY,
+            secret_key=settings.MEDIA_STORE_S3_SECRET_KEY,
+            presign_ttl=settings.MEDIA_STORE_PRESIGN_TTL,
+            scratch_root=settings.MEDIA_STORE_SCRATCH_ROOT,
+        )
+    raise ImproperlyConfigured(f"Unknown MEDIA_STORE_BACKEND {backend!r}")
@@ -0,0 +1,120 @@
+import logging
+import socket
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone as dt_timezone
+
+from django.utils import timezone
+from rq import get_current_job
+
+from videoflix_app.models import ConversionTelemetry, Video
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar("videoflix_conversion_telemetry", default=None)
+
+
+class ConversionRecorder:
+    """
+    Collects the stage timings and output figures of one pipeline run.
+    """
+
+    def __init__(self, video):
+        self.video_id = video.pk
+        self.video_title = video.title
+        self.started_at = timezone.now()
+        self.started = time.perf_counter()
+        self.queued_seconds = _queued_seconds()
+        self.stages = {}
+        self.values = {}
+        self.errors = []
+
+    def add_stage(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def save(self, status):
+        """
+            Store the run as a ConversionTelemetry row. Errors are logged, never raised.
+        """
+        total = time.perf_counter() - self.started
+        renditions = self.values.get("renditions", {})
+        duration = self.values.get("source_duration")
+        encode = self.stages.get("encode")
+        speed = duration / encode if duration and encode else None
+        try:
+            ConversionTelemetry.objects.create(
+                video=Video.objects.filter(pk=self.video_id).first(),
+                source_video_id=self.video_id,
+                video_title=self.video_title,
+                status=status,
+                worker_host=socket.gethostname(),
+                started_at=self.started_at,
+                queued_seconds=self.queued_seconds,
+                total_seconds=total,
+                stages=self.stages,
+                renditions=renditions,
+                source_duration=duration,
+                encode_speed=speed,
+                output_bytes=sum(r["bytes"] for r in renditions.values()),
+                error="\n".join(self.errors),
+            )
+        except Exception:
+            logger.exception("Storing conversion telemetry of video %s failed", self.video_id)
+
+
+def _queued_seconds():
+    """
+        Seconds the current RQ job waited in the queue, or None outside a worker.
+    """
+    job = get_current_job()
+    if job is None or job.enqueued_at is None:
+        return None
+    enqueued_at = job.enqueued_at
+    if enqueued_at.tzinfo is None:
+        enqueued_at = enqueued_at.replace(tzinfo=dt_timezone.utc)
+    return (datetime.now(dt_timezone.utc) - enqueued_at).total_seconds()
+
+
+@contextmanager
+def record_conversion(video):
+    """
+        Make a ConversionRecorder current for the pipeline run of ``video``.
+
+        Yields:
+            ConversionRecorder: Call ``save(status)`` on it once the run is over.
+    """
+    recorder = ConversionRecorder(video)
+    token = _current.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def stage(name):
+    """
+        Time a pipeline stage (probe, thumbnail, encode, finalize) of the current run.
+        Exceptions are noted on the run and re-raised.
+    """
+    recorder = _current.get()
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        if recorder is not None:
+            recorder.errors.append(f"{name}: {e!r}")
+        raise
+    finally:
+        if recorder is not None:
+            recorder.add_stage(name, time.perf_counter() - started)
+
+
+def record(**values):
+    """
+        Attach figures such as ``source_duration`` or ``renditions`` to the current run.
+    """
+    recorder = _current.get()
+    if recorder is not None:
+        recorder.values.update(values)
@@ -1,8 +1,17 @@
+from django.conf import settings
 from django.urls import path
-from videoflix_app.api.views import VideoHlsSegmentView, VideoHlsStreamManifestView, VideoListView
+from videoflix_app.api.views import ContinueWatchingView, VideoHlsSegmentView, VideoHlsStreamManifestView, VideoListView, VideoCategoryListView, VideoProgressView, VideoSearchView, VideoTrendingView
+
+if settings.HLS_ASYNC_VIEWS:
+    from videoflix_app.api.async_views import AsyncVideoHlsSegmentView as VideoHlsSegmentView, AsyncVideoHlsStreamManifestView as VideoHlsStreamManifestView
 
 urlpatterns = [
     path("video/", VideoListView.as_view(), name="video-list"),
+    path("video/categories/", VideoCategoryListView.as_view(), name="video-categories"),
+    path("video/search/", VideoSearchView.as_view(), name="video-search"),
+    path("video/progress/", ContinueWatchingView.as_view(), name="video-continue-watching"),
+    path("video/trending/", VideoTrendingView.as_view(), name="video-trending"),
+    path("video/<int:video_id>/progress/", VideoProgressView.as_view(), name="video-progress"),
     path("video/<int:video_id>/<str:resolution>/index.m3u8", VideoHlsStreamManifestView.as_view(), name="video-hls-manifest"),
     path("video/<int:video_id>/<str:resolution>/<str:segment>/", VideoHlsSegmentView.as_view(), name="video-hls-segment"),
     
@@ -1,12 +1,42 @@
 import subprocess, json
 import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from django.conf import settings
+from django_redis import get_redis_connection
 from pathlib import Path
+from redis.exceptions import LockError
+import django_rq
 from videoflix_app.models import Video 
+from .manifest_cache import warm_manifests
+from .media_gc import adjust_hls_usage, hls_bytes_used, original_archive_dir, tree_bytes
+from .storage import get_media_store, hls_key
+from . import telemetry
 import logging
 
 logger = logging.getLogger(__name__)
 
+# (name, max width, bitrate, maxrate, bufsize)
+RENDITIONS = [
+    ("480p", 640, "500k", "700k", "900k"),
+    ("720p", 854, "800k", "1000k", "1200k"),
+    ("1080p", 1280, "1500k", "2000k", "3000k"),
+]
+
+# RENDITIONS = [
+#     ("480p", 854, "1400k", "1500k", "2100k"),
+#     ("720p", 1280, "2800k", "3000k", "4200k"),
+#     ("1080p", 1920, "5000k", "5500k", "7500k"),
+# ]
+
+AUDIO_BITRATE = "128k"
+DISK_RESERVATIONS_KEY = "videoflix:disk:reservations"
+# Serializes the budget check and the reservation of concurrent admit_conversion jobs.
+DISK_ADMISSION_LOCK_KEY = "videoflix:disk:admission"
+
 
 def _get_resolution(path):
     """
@@ -44,6 +74,178 @@ def _get_resolution(path):
     return w, h
 
 
+def _get_duration(path):
+    """
+        Return the duration of a media file in seconds using ffprobe.
+
+        Raises:
+            ValueError: If the duration cannot be determined.
+    """
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "json", path
+    ]
+    data = json.loads(subprocess.run(cmd, capture_output=True, text=True).stdout)
+    try:
+        return float(data["format"]["duration"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Could not determine video duration")
+
+
+def _has_audio(path):
+    """
+        Return whether a media file contains at least one audio stream, using ffprobe.
+    """
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "a",
+        "-show_entries", "stream=index",
+        "-of", "json", path
+    ]
+    data = json.loads(subprocess.run(cmd, capture_output=True, text=True).stdout or "{}")
+    return bool(data.get("streams"))
+
+
+def _bitrate_to_bps(value):
+    """
+        Convert an ffmpeg bitrate such as "700k" or "2M" to bits per second.
+    """
+    multipliers = {"k": 1_000, "m": 1_000_000}
+    suffix = value[-1].lower()
+    if suffix in multipliers:
+        return int(float(value[:-1]) * multipliers[suffix])
+    return int(value)
+
+
+def estimate_output_bytes(path):
+    """
+        Estimate the size of the HLS output of a source file from probe data.
+
+        Uses the maxrate of every rendition the source qualifies for plus the
+        audio bitrate, with HLS_SIZE_OVERHEAD for MPEG-TS muxing overhead.
+
+        Args:
+            path (str): Filesystem path of the source video.
+
+        Returns:
+            int: The estimated number of bytes the conversion will write.
+    """
+    width, _ = _get_resolution(path)
+    duration = _get_duration(path)
+    renditions = [r for r in RENDITIONS if r[1] <= width]
+    bits_per_second = sum(
+        _bitrate_to_bps(maxrate) + _bitrate_to_bps(AUDIO_BITRATE)
+        for _, _, _, maxrate, _ in renditions
+    )
+    return int(bits_per_second * duration / 8 * settings.HLS_SIZE_OVERHEAD)
+
+
+def _reserved_bytes():
+    """
+        Sum the disk space reserved by admitted conversions that are still running.
+
+        Reservations of videos that are no longer processing (a worker died
+        before releasing them, or the video was deleted) are dropped here.
+    """
+    connection = get_redis_connection("default")
+    reservations = {int(k): int(v) for k, v in connection.hgetall(DISK_RESERVATIONS_KEY).items()}
+    if not reservations:
+        return 0
+    active = set(
+        Video.objects.filter(pk__in=reservations, conversion_status="processing").values_list("id", flat=True)
+    )
+    stale = [video_id for video_id in reservations if video_id not in active]
+    if stale:
+        connection.hdel(DISK_RESERVATIONS_KEY, *stale)
+    return sum(reservations[video_id] for video_id in active)
+
+
+def release_disk_reservation(video_id):
+    """
+        Return the disk space reserved for a conversion to the budget.
+    """
+    get_redis_connection("default").hdel(DISK_RESERVATIONS_KEY, video_id)
+
+
+def _has_disk_budget(estimate):
+    """
+        Check whether a conversion of ``estimate`` bytes fits the disk budget.
+
+        The budget accounts for space already reserved by admitted conversions
+        that have not finished yet. HLS_DISK_RESERVE_BYTES always stays free on
+        the volume ffmpeg writes to; if HLS_DISK_BUDGET_BYTES is set, it also
+        caps the total size of the local HLS trees (the running total of
+        ``hls_bytes_used``, so the tree is not walked on every admission).
+    """
+    store = get_media_store()
+    work_root = store.work_root
+    work_root.mkdir(parents=True, exist_ok=True)
+    needed = estimate + _reserved_bytes()
+    if shutil.disk_usage(work_root).free - needed < settings.HLS_DISK_RESERVE_BYTES:
+        return False
+    if settings.HLS_DISK_BUDGET_BYTES and not store.is_remote:
+        if hls_bytes_used(store) + needed > settings.HLS_DISK_BUDGET_BYTES:
+            return False
+    return True
+
+
+def _retry_admission(video_id):
+    django_rq.get_queue("default").enqueue_in(
+        timedelta(seconds=settings.HLS_ADMISSION_RETRY_SECONDS), admit_conversion, video_id
+    )
+
+
+def admit_conversion(video_id):
+    """
+        RQ job deciding whether a video can be converted now.
+
+        Estimates the HLS output size from probe data and the rendition ladder.
+        If it fits the disk budget the space is reserved, the video is marked
+        "processing" and convert_and_save is enqueued; otherwise the video is
+        marked "deferred" and the check is retried after
+        HLS_ADMISSION_RETRY_SECONDS. Check, reservation and status change hold
+        a Redis lock, so concurrent admissions cannot both take the last free
+        space, nor drop a reservation whose video is still "deferred". If the
+        lock cannot be taken the check is retried the same way.
+
+        Args:
+            video_id (int): The ID of the uploaded video.
+    """
+    video = Video.objects.filter(pk=video_id).first()
+    if not video:
+        logger.warning("admit_conversion called with non-existent video %s", video_id)
+        return
+
+    try:
+        estimate = estimate_output_bytes(video.video_file.path)
+    except ValueError:
+        logger.exception("Probing video %s failed, converting without admission check", video_id)
+        django_rq.enqueue(convert_and_save, video_id)
+        return
+
+    connection = get_redis_connection("default")
+    try:
+        with connection.lock(DISK_ADMISSION_LOCK_KEY, timeout=60, blocking_timeout=60):
+            admitted = _has_disk_budget(estimate)
+            if admitted:
+                connection.hset(DISK_RESERVATIONS_KEY, video_id, estimate)
+                Video.objects.filter(pk=video_id).update(conversion_status="processing")
+    except LockError:
+        _retry_admission(video_id)
+        logger.warning("Retrying admission of video %s: the disk admission lock is busy", video_id)
+        return
+
+    if not admitted:
+        Video.objects.filter(pk=video_id).update(conversion_status="deferred")
+        _retry_admission(video_id)
+        logger.warning("Deferring conversion of video %s: %s bytes do not fit the disk budget", video_id, estimate)
+        return
+
+    django_rq.enqueue(convert_and_save, video_id)
+    logger.info("Admitted conversion of video %s (estimated %s bytes)", video_id, estimate)
+
+
 def create_video_thumbnail(video_id):
     """
         Generates a visually representative thumbnail using ffmpeg's thumbnail filter.
@@ -82,25 +284,20 @@ def convert_video_to_hls(video_id):
     if not video:
         logger.warning("Video %s not found.", video_id)
         return
-    width, _ = _get_resolution(video.video_file.path)
+    with telemetry.stage("probe"):
+        width, _ = _get_resolution(video.video_file.path)
+        try:
+            telemetry.record(source_duration=_get_duration(video.video_file.path))
+        except ValueError:
+            pass
+        has_audio = _has_audio(video.video_file.path)
     if width < 240:
         raise ValueError(f"Video too small for HLS ({width}px width)")
 
-    out_dir = Path(settings.VIDEO_ROOT) / str(video_id)
+    store = get_media_store()
+    out_dir = store.work_dir(video_id)
     out_dir.mkdir(parents=True, exist_ok=True)
-    renditions = [
-        ("480p", 640, "500k", "700k", "900k"),
-        ("720p", 854, "800k", "1000k", "1200k"),
-        ("1080p", 1280, "1500k", "2000k", "3000k"),
-    ]
-
-    # renditions = [
-    #     ("480p", 854, "1400k", "1500k", "2100k"),
-    #     ("720p", 1280, "2800k", "3000k", "4200k"),
-    #     ("1080p", 1920, "5000k", "5500k", "7500k"),
-    # ]
-
-    renditions = [r for r in renditions if r[1] <= width]
+    renditions = [r for r in RENDITIONS if r[1] <= width]
     if not renditions:
         raise ValueError("No valid renditions for this video")
 
@@ -109,7 +306,9 @@ def convert_video_to_hls(video_id):
         for i, (_, w, *_ ) in enumerate(renditions)
     )
 
-    stream_map = " ".join(f"v:{i},a:{i},name:{name}" for i, (name, *_ ) in enumerate(renditions))
+    # var_stream_map fails on a:N references when the source has no audio track.
+    audio = ",a:{i}" if has_audio else ""
+    stream_map = " ".join(f"v:{i}{audio.format(i=i)},name:{name}" for i, (name, *_ ) in enumerate(renditions))
 
     cmd = [
         "ffmpeg", "-y", "-i", video.video_file.path,
@@ -123,7 +322,7 @@ def convert_video_to_hls(video_id):
         ], []),
 
         "-c:v", "libx264", "-preset", "veryfast", "-crf", "23",
-        "-c:a", "aac", "-b:a", "128k",
+        "-c:a", "aac", "-b:a", AUDIO_BITRATE,
         "-g", "48", "-keyint_min", "48", "-sc_threshold", "0",
         "-f", "hls", "-hls_time", "6", "-hls_playlist_type", "vod",
         "-hls_segment_filename", str(out_dir / "%v/%03d.ts"),
@@ -133,10 +332,212 @@ def convert_video_to_hls(video_id):
     ]
 
     try:
-        subprocess.run(cmd, check=True, capture_output=True, text=True)
+        with telemetry.stage("encode"):
+            telemetry.record(renditions=_run_hls_encode(cmd, out_dir, video_id, store))
         logger.info("HLS conversion finished for video %s", video_id)
     except subprocess.CalledProcessError as e:
         logger.error("HLS conversion failed for video %s: %s", video_id, e.stderr)
+        raise
+    finally:
+        if not store.is_remote:
+            # Partial output of a failed encode is counted too; deleting the video subtracts it again.
+            adjust_hls_usage(tree_bytes(out_dir))
+
+
+def _finished_segments(out_dir):
+    """
+        List the segments ffmpeg has finished writing.
+
+        ffmpeg writes the segments of a rendition one after another, so every
+        segment except the newest one in each rendition directory is complete.
+    """
+    finished = []
+    for rendition_dir in out_dir.iterdir():
+        if rendition_dir.is_dir():
+            finished.extend(sorted(rendition_dir.glob("*.ts"))[:-1])
+    return finished
+
+
+def _rendition_sizes(paths, out_dir):
+    """
+        Sum the output of an encode per rendition directory.
+
+        Returns:
+            dict: ``{rendition: {"bytes": int, "segments": int}}``; the master playlist counts as "master".
+    """
+    sizes = {}
+    for path in paths:
+        parts = path.relative_to(out_dir).parts
+        entry = sizes.setdefault(parts[0] if len(parts) > 1 else "master", {"bytes": 0, "segments": 0})
+        entry["bytes"] += path.stat().st_size
+        entry["segments"] += path.suffix == ".ts"
+    return sizes
+
+
+def _run_hls_encode(cmd, out_dir, video_id, store):
+    """
+        Run the ffmpeg HLS command and publish its output to the media store.
+
+        For the local store ffmpeg writes straight into VIDEO_ROOT. For remote
+        stores finished segments are uploaded concurrently while ffmpeg is
+        still encoding; playlists are uploaded last, so a player can never
+        see a segment that is not in the bucket yet.
+
+        Args:
+            cmd (list[str]): The ffmpeg command line.
+            out_dir (Path): The directory ffmpeg writes to.
+            video_id (int): The ID of the video being converted.
+            store: The media store returned by get_media_store().
+
+        Returns:
+            dict: Output bytes and segment count per rendition, see _rendition_sizes.
+
+        Raises:
+            subprocess.CalledProcessError: If ffmpeg exits with an error.
+    """
+    if not store.is_remote:
+        subprocess.run(cmd, check=True, capture_output=True, text=True)
+        return _rendition_sizes([p for p in out_dir.rglob("*") if p.is_file()], out_dir)
+
+    uploaded = set()
+    try:
+        with ThreadPoolExecutor(max_workers=settings.MEDIA_STORE_UPLOAD_WORKERS) as pool:
+            futures = []
+
+            def publish(paths):
+                for path in paths:
+                    if path not in uploaded:
+                        uploaded.add(path)
+                        key = hls_key(video_id, *path.relative_to(out_dir).parts)
+                        futures.append(pool.submit(store.upload_file, path, key))
+
+            with tempfile.TemporaryFile(mode="w+") as stderr:
+                process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=stderr, text=True)
+                while process.poll() is None:
+                    publish(_finished_segments(out_dir))
+                    time.sleep(settings.MEDIA_STORE_POLL_INTERVAL)
+                if process.returncode != 0:
+                    stderr.seek(0)
+                    raise subprocess.CalledProcessError(process.returncode, cmd, stderr=stderr.read())
+
+            publish(sorted(out_dir.glob("*/*.ts")))
+            for future in futures:
+                future.result()
+            futures.clear()
+            publish([*out_dir.glob("*/index.m3u8"), *out_dir.glob("index.m3u8")])
+            for future in futures:
+                future.result()
+        logger.info("Uploaded %s HLS files for video %s", len(uploaded), video_id)
+        return _rendition_sizes(uploaded, out_dir)
+    finally:
+        store.finish_upload(video_id)
+
+
+def _compress_original(path):
+    """
+        Re-encode an original upload as an H.264/AAC mezzanine at ORIGINAL_COMPRESS_CRF.
+
+        The result only replaces the original if it is smaller.
+
+        Returns:
+            Path: The path of the file that is kept.
+    """
+    target = path.with_suffix(".mp4")
+    fd, tmp_name = tempfile.mkstemp(suffix=".mp4", dir=path.parent)
+    os.close(fd)
+    tmp_path = Path(tmp_name)
+    cmd = [
+        "ffmpeg", "-y", "-i", str(path),
+        "-c:v", "libx264", "-preset", "slow", "-crf", str(settings.ORIGINAL_COMPRESS_CRF),
+        "-c:a", "aac", "-b:a", AUDIO_BITRATE,
+        "-movflags", "+faststart",
+        str(tmp_path),
+    ]
+    try:
+        subprocess.run(cmd, check=True, capture_output=True, text=True)
+        if tmp_path.stat().st_size >= path.stat().st_size:
+            return path
+        if target != path and target.exists():
+            target = path.with_name(f"{path.stem}_mezzanine.mp4")
+        os.replace(tmp_path, target)
+        if target != path:
+            path.unlink()
+        return target
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def is_hls_published(video_id):
+    """
+        Check that the master playlist and every rendition playlist it lists
+        are in the media store and complete (end with ``#EXT-X-ENDLIST``).
+    """
+    store = get_media_store()
+    master = store.read_bytes(hls_key(video_id, "index.m3u8"))
+    if master is None:
+        return False
+    variants = [line.strip() for line in master.decode().splitlines() if line.strip() and not line.startswith("#")]
+    if not variants:
+        return False
+    for uri in variants:
+        try:
+            playlist = store.read_bytes(hls_key(video_id, *uri.split("/")))
+        except ValueError:
+            return False
+        if playlist is None or b"#EXT-X-ENDLIST" not in playlist:
+            return False
+    return True
+
+
+def apply_original_lifecycle(video):
+    """
+        Apply ORIGINAL_LIFECYCLE_POLICY to the original upload of a converted video.
+
+        Policies:
+            keep: leave the original in MEDIA_ROOT/video (default).
+            compress: replace it with a smaller CRF mezzanine.
+            move: move it to ORIGINAL_ARCHIVE_ROOT/<video id>/.
+            delete: remove it; only the HLS renditions remain.
+
+        Nothing is touched unless is_hls_published() confirms a complete HLS
+        tree. After move and delete ``video_file`` is cleared. Errors are
+        logged and never fail the conversion.
+
+        Args:
+            video (Video): A video whose conversion has completed.
+    """
+    policy = settings.ORIGINAL_LIFECYCLE_POLICY
+    if policy == "keep" or not video.video_file:
+        return
+
+    if not is_hls_published(video.pk):
+        logger.warning("Keeping original of video %s: the HLS output is incomplete", video.pk)
+        return
+
+    path = Path(video.video_file.path)
+    try:
+        size = path.stat().st_size
+        if policy == "delete":
+            path.unlink()
+        elif policy == "move":
+            target = original_archive_dir(video.pk) / path.name
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(path, target)
+        elif policy == "compress":
+            kept = _compress_original(path)
+            if kept != path:
+                video.video_file.name = kept.relative_to(settings.MEDIA_ROOT).as_posix()
+                Video.objects.filter(pk=video.pk).update(video_file=video.video_file.name)
+            logger.info("Compressed original of video %s from %s to %s bytes", video.pk, size, kept.stat().st_size)
+            return
+        else:
+            logger.error("Unknown ORIGINAL_LIFECYCLE_POLICY %r", policy)
+            return
+        video.video_file.name = ""
+        Video.objects.filter(pk=video.pk).update(video_file="")
+        logger.info("Applied lifecycle policy %r to original of video %s (%s bytes)", policy, video.pk, size)
+    except (OSError, subprocess.CalledProcessError):
+        logger.exception("Lifecycle policy %r failed for original of video %s", policy, video.pk)
 
 
 def convert_and_save(video_id):
@@ -154,23 +555,33 @@ def convert_and_save(video_id):
         logger.warning("convert_and_save called with non-existent video %s", video_id)
         return
 
-    try:
-        logger.info("Starting processing pipeline for video %s", video_id)
-
-        create_video_thumbnail(video_id)
-        convert_video_to_hls(video_id)
-        video.conversion_status = "completed"
-        video.error_message = ""
-
-        logger.info("Processing completed for video %s", video_id)
-
-    except Exception as e:
-        video.conversion_status = "failed"
-        video.error_message = str(e)
-        video.refresh_from_db()
-        video.delete()
-        logger.exception("Processing failed for video %s", video_id)
-
-    finally:
-        video.save()
+    with telemetry.record_conversion(video) as run:
+        try:
+            logger.info("Starting processing pipeline for video %s", video_id)
+
+            with telemetry.stage("thumbnail"):
+                create_video_thumbnail(video_id)
+            convert_video_to_hls(video_id)
+            video.conversion_status = "completed"
+            video.error_message = ""
+            with telemetry.stage("finalize"):
+                warm_manifests(video_id)
+                apply_original_lifecycle(video)
+
+            logger.info("Processing completed for video %s", video_id)
+
+        except Exception as e:
+            video.conversion_status = "failed"
+            video.error_message = str(e)
+            run.errors.append(repr(e))
+            video.refresh_from_db()
+            video.delete()
+            logger.exception("Processing failed for video %s", video_id)
+
+        finally:
+            release_disk_reservation(video_id)
+            # A failed video was deleted above; saving it again would recreate the row.
+            if video.pk is not None:
+                video.save()
+            run.save("failed" if run.errors else video.conversion_status)
 
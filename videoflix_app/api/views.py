@@ -1,6 +1,9 @@
 
+import hashlib
+
 from click import Path
-from django.http import FileResponse, Http404
+from django.core.cache import cache
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, HttpResponseRedirect
 from rest_framework import status
 from rest_framework.generics import ListAPIView
 from rest_framework.views import APIView
@@ -9,23 +12,218 @@ from rest_framework.permissions import IsAuthenticated
 from auth_app.api.authentication import CookieJWTAuthentication
 
 from core import settings
+from core.metrics import stage
 from videoflix_app.models import Video
-from .serializers import VideoSerializer
+from .catalog import catalog_cache_key, get_catalog_version, get_grouped_catalog, serialize_grouped_catalog
+from .manifest_cache import get_manifest
+from .pagination import CreatedAtCursorPagination
+from .popularity import MANIFEST, SEGMENT, count_request, get_most_watched, get_trending
+from .progress import get_continue_watching, get_video_progress, record_progress
+from .readahead import schedule_readahead
+from .search import search_videos
+from .segment_cache import segment_cache
+from .storage import get_media_store, hls_key
+from .serializers import VIDEO_VALUE_FIELDS, VideoSerializer, WatchProgressSerializer, serialize_video_rows
 
 HLS_CONTENT_TYPE = 'application/vnd.apple.mpegurl'
 TS_CONTENT_TYPE = "video/MP2T"  
+
+
+def resolve_segment_path(video_id, resolution, segment):
+    """
+        Resolve a segment file below VIDEO_ROOT.
+
+        Raises:
+            Http404: If the path escapes VIDEO_ROOT or the segment does not exist.
+        Returns:
+            Path: The resolved segment path.
+    """
+    base_dir = settings.VIDEO_ROOT.resolve()
+    candidate = (base_dir / str(video_id) / resolution / segment).resolve()
+    if not str(candidate).startswith(str(base_dir)):
+        raise Http404("Invalid segment path")
+    if not candidate.is_file():
+        raise Http404("Segment not found")
+    return candidate
+
+
+def presigned_segment_url(store, video_id, resolution, segment):
+    """
+        Build a presigned URL for a segment in a remote media store.
+
+        Raises:
+            Http404: If the segment path is invalid.
+        Returns:
+            str: A short-lived URL the player is redirected to.
+    """
+    try:
+        key = hls_key(video_id, resolution, segment)
+    except ValueError:
+        raise Http404("Invalid segment path")
+    return store.presigned_url(key)
+
+
 class VideoListView(ListAPIView):
+    """
+    Cursor-paginated video catalog, newest first.
+    Pages are cached in Redis per catalog version and carry an ETag.
+    """
     permission_classes = [IsAuthenticated]
     authentication_classes = [CookieJWTAuthentication]
 
-    queryset = Video.objects.all().order_by('-created_at')
+    queryset = Video.objects.all().order_by('-created_at', '-id')
     serializer_class = VideoSerializer
+    pagination_class = CreatedAtCursorPagination
+
+    def list(self, request, *args, **kwargs):
+        """ Return one catalog page from the cache, or build and cache it.
+            Args:
+                request (request): The HTTP request, optionally with `cursor` and `limit` query params.
+            Returns:
+                Response: The page, or 304 if the client's ETag is still current.
+        """
+        key = catalog_cache_key("list", get_catalog_version(), request)
+        etag = f'"{hashlib.sha1(key.encode()).hexdigest()}"'
+        if request.headers.get('If-None-Match') == etag:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            data = cache.get(key)
+            if data is None:
+                page = self.paginate_queryset(self.get_queryset().values(*VIDEO_VALUE_FIELDS))
+                data = self.paginator.get_paginated_data(serialize_video_rows(page, request))
+                cache.set(key, data, timeout=settings.CATALOG_CACHE_TIMEOUT)
+            response = Response(data)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
     
 
+class VideoCategoryListView(APIView):
+    """
+    Newest videos grouped by category, served from the prebuilt snapshot.
+    """
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CookieJWTAuthentication]
+
+    def get(self, request, *args, **kwargs):
+        """ Return the grouped catalog snapshot with absolute thumbnail URLs.
+            Args:
+                request (request): The HTTP request.
+            Returns:
+                Response: `[{"category": str, "videos": [...]}, ...]`, or 304 if the client's ETag is current.
+        """
+        groups, etag = get_grouped_catalog()
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponseNotModified()
+        else:
+            response = Response(serialize_grouped_catalog(groups, request))
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class VideoSearchView(APIView):
+    """
+    Ranked full-text search over video titles and descriptions.
+    """
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CookieJWTAuthentication]
+
+    def get(self, request, *args, **kwargs):
+        """ Search videos by the `q` query parameter.
+            Args:
+                request (request): The HTTP request with the search term in `q`.
+            Returns:
+                Response: `{"results": [...]}` ordered by relevance, or 400 without a search term.
+        """
+        term = request.query_params.get('q', '').strip()
+        if not term:
+            return Response({"error": "Please provide a search term."}, status=status.HTTP_400_BAD_REQUEST)
+        rows = search_videos(term).values(*VIDEO_VALUE_FIELDS)[:settings.SEARCH_RESULT_LIMIT]
+        return Response({"results": serialize_video_rows(rows, request)})
+
+
+class VideoProgressView(APIView):
+    """
+    Resume position of the current user in one video.
+    Heartbeats are written to Redis only; see progress.flush_watch_progress.
+    """
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CookieJWTAuthentication]
+
+    def get(self, request, video_id, *args, **kwargs):
+        """ Return the stored playback position of the video.
+            Returns:
+                Response: The progress entry, or 404 if the user never played the video.
+        """
+        entry = get_video_progress(request.user.pk, video_id)
+        if entry is None:
+            raise Http404("No progress for this video")
+        return Response(entry)
+
+    def put(self, request, video_id, *args, **kwargs):
+        """ Record a player heartbeat.
+            Args:
+                request (request): The HTTP request with `position` and optional `duration` in seconds.
+            Returns:
+                Response: 204 on success, 400 for invalid data.
+        """
+        serializer = WatchProgressSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        record_progress(request.user.pk, video_id, **serializer.validated_data)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ContinueWatchingView(APIView):
+    """
+    Videos the current user started but did not finish, most recent first.
+    """
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CookieJWTAuthentication]
+
+    def get(self, request, *args, **kwargs):
+        """ Return the "continue watching" row from Redis.
+            Returns:
+                Response: `{"results": [{"video_id", "position", "duration", "updated_at"}, ...]}`.
+        """
+        return Response({"results": get_continue_watching(request.user.pk)})
+
+
+class VideoTrendingView(APIView):
+    """
+    Trending (recent window) and most-watched (all time) videos by segment requests.
+    """
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CookieJWTAuthentication]
+
+    def get(self, request, *args, **kwargs):
+        """ Return both rankings.
+            Args:
+                request (request): The HTTP request, optionally with `hours` for the trending window.
+            Returns:
+                Response: `{"trending": [...], "most_watched": [...]}`; each video carries `segment_requests`.
+        """
+        try:
+            hours = max(1, min(int(request.query_params.get('hours', settings.POPULARITY_TRENDING_HOURS)), 24 * 30))
+        except ValueError:
+            return Response({"error": "hours must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        trending = get_trending(hours)
+        most_watched = get_most_watched()
+        rows = Video.objects.filter(pk__in={pk for pk, _ in trending + most_watched}).values(*VIDEO_VALUE_FIELDS)
+        videos = {video['id']: video for video in serialize_video_rows(rows, request)}
+
+        def ranked(pairs):
+            return [{**videos[pk], 'segment_requests': total} for pk, total in pairs if pk in videos]
+
+        return Response({"trending": ranked(trending), "most_watched": ranked(most_watched)})
+
+
 class VideoHlsStreamManifestView(APIView):
+    """
+    Serve HLS rendition playlists from the manifest cache (process LRU, Redis, then disk).
+    """
     permission_classes = [IsAuthenticated]
     authentication_classes = [CookieJWTAuthentication]
-    BASE_DIR = settings.VIDEO_ROOT
     
     def get(self, request, *args, **kwargs):
         movie_id = kwargs.get('video_id')
@@ -33,14 +231,18 @@ class VideoHlsStreamManifestView(APIView):
         if not (movie_id and resolution):
             raise Http404("Video or resolution not specified")
         
-        candidate = (self.BASE_DIR / str(movie_id) / resolution / 'index.m3u8').resolve()
-        if not str(candidate).startswith(str(self.BASE_DIR.resolve())):
-            raise Http404('Invalid HLS manifest path')
-
-        if not candidate.is_file():
+        with stage("cache"):
+            entry = get_manifest(movie_id, resolution)
+        if entry is None:
             raise Http404('HLS manifest not found')
-        
-        response = FileResponse(open(candidate, 'rb'), content_type=HLS_CONTENT_TYPE.lower())
+        count_request(movie_id, resolution, MANIFEST)
+
+        body, etag = entry
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(body, content_type=HLS_CONTENT_TYPE.lower())
+        response['ETag'] = etag
         return response
 
 
@@ -51,17 +253,28 @@ class VideoHlsSegmentView(APIView):
     permission_classes = [IsAuthenticated]
     authentication_classes = [CookieJWTAuthentication]
 
-    BASE_DIR = settings.VIDEO_ROOT
-
     def get(self, request, video_id=None, resolution=None, segment=None, *args, **kwargs):
 
         if not (video_id and resolution and segment):
             raise Http404(f"Segment not specified with {video_id}, {resolution}, {segment}")
         
-        candidate = (self.BASE_DIR / str(video_id) / resolution / segment).resolve()
-        if not str(candidate).startswith(str(self.BASE_DIR.resolve())):
-            raise Http404("Invalid segment path")
-        if not candidate.is_file():
-            raise Http404("Segment not found")
-        response = FileResponse(open(candidate, "rb"), content_type=TS_CONTENT_TYPE.lower())
+        store = get_media_store()
+        if store.is_remote:
+            with stage("presign"):
+                url = presigned_segment_url(store, video_id, resolution, segment)
+            count_request(video_id, resolution, SEGMENT)
+            return HttpResponseRedirect(url)
+
+        key = (video_id, resolution, segment)
+        with stage("cache"):
+            hit = segment_cache.touch(key)
+
+        with stage("fs"):
+            candidate = resolve_segment_path(video_id, resolution, segment)
+            if not hit:
+                segment_cache.admit(key, candidate)
+            response = FileResponse(open(candidate, "rb"), content_type=TS_CONTENT_TYPE.lower())
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        count_request(video_id, resolution, SEGMENT)
+        schedule_readahead(request.user.pk, video_id, resolution, segment)
         return response
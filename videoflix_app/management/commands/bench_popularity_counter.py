@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from videoflix_app.api import popularity
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the per-request cost of count_request() on the segment hot path and fail "
+        "if it exceeds the budget. Uses video id 0, which the rollup discards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--calls", type=int, default=1_000_000)
+        parser.add_argument("--budget-ns", type=int, default=1_000)
+
+    def handle(self, *args, **options):
+        calls = options["calls"]
+        count_request = popularity.count_request
+        count_request(0, "bench")
+
+        started = time.perf_counter_ns()
+        for _ in range(calls):
+            count_request(0, "bench")
+        elapsed = time.perf_counter_ns() - started
+
+        started = time.perf_counter_ns()
+        for _ in range(calls):
+            pass
+        loop = time.perf_counter_ns() - started
+        popularity._events.clear()
+
+        per_call = (elapsed - loop) / calls
+        self.stdout.write(f"count_request: {per_call:.0f} ns/call over {calls} calls (budget {options['budget_ns']} ns)")
+        if per_call > options["budget_ns"]:
+            raise CommandError("count_request exceeds the hot-path budget")
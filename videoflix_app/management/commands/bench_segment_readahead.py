@@ -0,0 +1,74 @@
+import os
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarks import percentile
+from videoflix_app.api.readahead import schedule_readahead
+
+
+def drop_page_cache(paths):
+    """
+        Evict the given files from the kernel page cache.
+    """
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fdatasync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure segment read latency on a cold page cache with and without read-ahead. "
+        "Segments are read sequentially at playback pace, as the segment view would serve them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("video_id", type=int)
+        parser.add_argument("--resolution", action="append", help="Rendition to read (default: all).")
+        parser.add_argument("--interval-ms", type=int, default=100, help="Pause between two segment requests.")
+        parser.add_argument("--runs", type=int, default=3)
+
+    def handle(self, *args, **options):
+        if not hasattr(os, "posix_fadvise"):
+            raise CommandError("posix_fadvise is required to drop the page cache on this platform.")
+
+        video_dir = Path(settings.VIDEO_ROOT) / str(options["video_id"])
+        resolutions = options["resolution"] or sorted(p.name for p in video_dir.iterdir() if p.is_dir())
+        renditions = {
+            resolution: sorted((video_dir / resolution).glob("*.ts"))
+            for resolution in resolutions
+        }
+        if not any(renditions.values()):
+            raise CommandError(f"No HLS segments found under {video_dir}")
+
+        interval = options["interval_ms"] / 1000
+        for readahead in (False, True):
+            latencies = []
+            for run in range(options["runs"]):
+                client_id = f"bench-{readahead}-{run}-{time.monotonic_ns()}"
+                for resolution, segments in renditions.items():
+                    drop_page_cache(segments)
+                    for segment in segments:
+                        started = time.perf_counter()
+                        with open(segment, "rb") as f:
+                            while f.read(1024 * 1024):
+                                pass
+                        latencies.append((time.perf_counter() - started) * 1000)
+                        if readahead:
+                            schedule_readahead(client_id, options["video_id"], resolution, segment.name)
+                        time.sleep(interval)
+
+            label = "read-ahead" if readahead else "baseline"
+            self.stdout.write(
+                f"{label:<11} n={len(latencies)} "
+                f"p50={percentile(latencies, 50):.2f}ms "
+                f"p95={percentile(latencies, 95):.2f}ms "
+                f"p99={percentile(latencies, 99):.2f}ms "
+                f"max={max(latencies):.2f}ms"
+            )
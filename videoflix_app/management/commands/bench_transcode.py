@@ -0,0 +1,271 @@
+import itertools
+import json
+import math
+import multiprocessing
+import re
+import resource
+import socket
+import subprocess
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from videoflix_app.api import telemetry
+from videoflix_app.api.storage import get_media_store, hls_key
+from videoflix_app.api.utils import convert_video_to_hls, create_video_thumbnail
+from videoflix_app.models import Video
+
+SOURCE_DIR = "video/bench"
+PSNR_RE = re.compile(r"PSNR .*?average:(\S+)")
+SSIM_RE = re.compile(r"SSIM .*?All:(\S+)")
+
+
+def _git_revision():
+    """
+        Return ``(commit, dirty)`` of the working tree, or ``(None, None)`` outside git.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, bool(status.strip())
+
+
+def _ffmpeg_version():
+    output = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True).stdout
+    return output.splitlines()[0] if output else None
+
+
+def make_source(size, duration, audio):
+    """
+        Generate a fixed synthetic source (``testsrc2`` pattern, 25 fps, optional sine tone) once.
+
+        Sources are encoded near-losslessly so quality is measured against
+        the pattern rather than a first lossy generation.
+
+        Returns:
+            str: The file name relative to MEDIA_ROOT.
+    """
+    name = f"{SOURCE_DIR}/testsrc2_{size}_{duration}s_{'audio' if audio else 'silent'}.mp4"
+    path = Path(settings.MEDIA_ROOT) / name
+    if path.exists():
+        return name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    cmd = ["ffmpeg", "-y", "-v", "error", "-f", "lavfi", "-i", f"testsrc2=size={size}:rate=25:duration={duration}"]
+    if audio:
+        cmd += ["-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}", "-c:a", "aac", "-b:a", "192k"]
+    cmd += ["-c:v", "libx264", "-preset", "medium", "-crf", "10", "-pix_fmt", "yuv420p", str(path)]
+    subprocess.run(cmd, check=True)
+    return name
+
+
+def measure_quality(rendition, source):
+    """
+        Compare a rendition with its source (scaled to the rendition size) using ffmpeg's psnr and ssim filters.
+
+        Returns:
+            dict: ``psnr`` (average dB) and ``ssim`` (All); None where ffmpeg reported nothing or infinity.
+    """
+    graph = (
+        "[0:v]setpts=PTS-STARTPTS[d0];[1:v]setpts=PTS-STARTPTS[r0];"
+        "[r0][d0]scale2ref=flags=bicubic[ref][dist];"
+        "[dist]split[d1][d2];[ref]split[r1][r2];"
+        "[d1][r1]psnr;[d2][r2]ssim"
+    )
+    cmd = ["ffmpeg", "-nostats", "-i", str(rendition), "-i", str(source), "-lavfi", graph, "-f", "null", "-"]
+    stderr = subprocess.run(cmd, capture_output=True, text=True).stderr
+
+    def parse(pattern):
+        match = pattern.search(stderr)
+        value = float(match.group(1)) if match else None
+        return value if value is not None and math.isfinite(value) else None
+
+    return {"psnr": parse(PSNR_RE), "ssim": parse(SSIM_RE)}
+
+
+def run_pipeline(source_name):
+    """
+        Run thumbnail + HLS conversion for ``source_name`` and measure it.
+
+        Runs in a forked child per case, so RUSAGE_CHILDREN covers exactly the
+        ffmpeg processes of this case. The Video row is rolled back and the
+        output deleted afterwards.
+
+        Returns:
+            dict: Wall/CPU seconds, peak RSS, stage timings and per-rendition bytes, segments and quality.
+    """
+    store = get_media_store()
+    with transaction.atomic():
+        video, = Video.objects.bulk_create([Video(
+            title=f"bench {source_name}",
+            description="bench_transcode",
+            category="bench",
+            video_file=source_name,
+            conversion_status="processing",
+        )])
+        try:
+            started = time.perf_counter()
+            with telemetry.record_conversion(video) as run:
+                with telemetry.stage("thumbnail"):
+                    create_video_thumbnail(video.pk)
+                convert_video_to_hls(video.pk)
+            wall = time.perf_counter() - started
+            own, children = resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+
+            renditions = {name: dict(values) for name, values in run.values.get("renditions", {}).items() if name != "master"}
+            source = Path(settings.MEDIA_ROOT) / source_name
+            for name, values in renditions.items():
+                values["quality"] = (
+                    None if store.is_remote
+                    else measure_quality(store.path(hls_key(video.pk, name, "index.m3u8")), source)
+                )
+        finally:
+            store.delete_prefix(video.pk)
+            (Path(settings.MEDIA_ROOT) / "thumbnail" / f"{video.pk}.jpg").unlink(missing_ok=True)
+            transaction.set_rollback(True)
+
+    return {
+        "ok": bool(renditions),
+        "wall_seconds": wall,
+        "cpu_seconds": own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime,
+        "peak_rss_bytes": max(own.ru_maxrss, children.ru_maxrss) * 1024,
+        "stages": run.stages,
+        "source_duration": run.values.get("source_duration"),
+        "output_bytes": sum(values["bytes"] for values in renditions.values()),
+        "renditions": renditions,
+        "errors": run.errors,
+    }
+
+
+def _child(source_name, pipe):
+    try:
+        pipe.send(run_pipeline(source_name))
+    except Exception as e:
+        pipe.send({"ok": False, "errors": [repr(e)]})
+    finally:
+        pipe.close()
+
+
+def run_case(source_name):
+    """
+        Run ``run_pipeline`` in a forked process and return its result.
+    """
+    connections.close_all()
+    context = multiprocessing.get_context("fork")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_child, args=(source_name, sender))
+    process.start()
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        result = {"ok": False, "errors": [f"benchmark process exited with code {process.exitcode}"]}
+    process.join()
+    return result
+
+
+def _change(new, old):
+    if new is None or not old:
+        return None
+    return (new - old) / old * 100
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the transcoding pipeline (create_video_thumbnail + convert_video_to_hls) on fixed "
+        "synthetic sources and append wall/CPU time, peak RSS, output bytes and PSNR/SSIM per rendition "
+        "to a JSON history, comparing with the previous run on this host."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", default=["854x480", "1280x720", "1920x1080"])
+        parser.add_argument("--durations", nargs="+", type=int, default=[10, 30], help="Source lengths in seconds.")
+        parser.add_argument("--audio", choices=["both", "yes", "no"], default="both")
+        parser.add_argument("--history", default=str(Path(settings.BASE_DIR) / "bench_transcode_history.json"))
+        parser.add_argument("--threshold", type=float, default=10.0, help="Percent increase of time or size reported as a regression.")
+        parser.add_argument("--no-save", action="store_true", help="Compare with the history without appending to it.")
+
+    def handle(self, *args, **options):
+        audio = {"both": [True, False], "yes": [True], "no": [False]}[options["audio"]]
+        history_path = Path(options["history"])
+        history = json.loads(history_path.read_text()) if history_path.exists() else []
+        host = socket.gethostname()
+        previous = next((entry for entry in reversed(history) if entry["host"] == host), None)
+        previous_cases = {case["case"]: case for case in previous["cases"]} if previous else {}
+
+        commit, dirty = _git_revision()
+        entry = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": commit,
+            "dirty": dirty,
+            "host": host,
+            "ffmpeg": _ffmpeg_version(),
+            "cases": [],
+        }
+        if previous:
+            self.stdout.write(f"Comparing with {previous['commit']} ({previous['timestamp']})")
+
+        regressions = 0
+        for size, duration, with_audio in itertools.product(options["sizes"], options["durations"], audio):
+            case = f"{size}/{duration}s/{'audio' if with_audio else 'silent'}"
+            try:
+                source = make_source(size, duration, with_audio)
+            except subprocess.CalledProcessError as e:
+                raise CommandError(f"Generating the source for {case} failed: {e}")
+            result = {"case": case, **run_case(source)}
+            entry["cases"].append(result)
+            regressions += self.print_case(result, previous_cases.get(case), options["threshold"])
+
+        if not options["no_save"]:
+            history.append(entry)
+            history_path.write_text(json.dumps(history, indent=2))
+            self.stdout.write(f"Appended results to {history_path}")
+        if regressions:
+            self.stdout.write(self.style.WARNING(f"{regressions} regression(s) above {options['threshold']:.0f}%"))
+
+    def print_case(self, result, previous, threshold):
+        """
+            Print one case and its change against the previous run.
+
+            Returns:
+                int: The number of regressions (time or size above ``threshold`` percent).
+        """
+        if not result["ok"]:
+            self.stdout.write(self.style.ERROR(f"{result['case']:<24} FAILED {'; '.join(result['errors']) or 'no renditions produced, see the log'}"))
+            return 1
+
+        speed = result["source_duration"] / result["wall_seconds"] if result["source_duration"] else 0
+        self.stdout.write(
+            f"{result['case']:<24} wall={result['wall_seconds']:.2f}s cpu={result['cpu_seconds']:.2f}s "
+            f"speed={speed:.2f}x rss={result['peak_rss_bytes'] / 1024 ** 2:.0f}MB "
+            f"bytes={result['output_bytes']}"
+        )
+        for name, values in sorted(result["renditions"].items()):
+            quality = values["quality"] or {}
+            psnr = f"{quality['psnr']:.2f}dB" if quality.get("psnr") is not None else "-"
+            ssim = f"{quality['ssim']:.4f}" if quality.get("ssim") is not None else "-"
+            self.stdout.write(f"{'':<24} {name:<6} bytes={values['bytes']} segments={values['segments']} psnr={psnr} ssim={ssim}")
+
+        if not previous or not previous.get("ok"):
+            return 0
+        regressions = 0
+        for metric in ("wall_seconds", "cpu_seconds", "output_bytes"):
+            change = _change(result[metric], previous[metric])
+            if change is not None and change > threshold:
+                regressions += 1
+                self.stdout.write(self.style.WARNING(f"{'':<24} {metric} +{change:.1f}% vs {previous[metric]}"))
+        for name, values in result["renditions"].items():
+            before = (previous["renditions"].get(name) or {}).get("quality") or {}
+            after = values["quality"] or {}
+            if after.get("psnr") is not None and before.get("psnr") is not None and after["psnr"] < before["psnr"]:
+                self.stdout.write(f"{'':<24} {name} psnr {after['psnr'] - before['psnr']:+.2f}dB")
+        return regressions
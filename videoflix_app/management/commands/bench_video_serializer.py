@@ -0,0 +1,88 @@
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from videoflix_app.api.serializers import VIDEO_VALUE_FIELDS, VideoSerializer, serialize_video_rows
+from videoflix_app.models import Video
+
+
+def _drf_path(queryset, request):
+    return VideoSerializer(queryset, many=True, context={'request': request}).data
+
+
+def _fast_path(queryset, request):
+    return serialize_video_rows(queryset.values(*VIDEO_VALUE_FIELDS), request)
+
+
+def _measure(func, queryset, request, repeat):
+    """
+        Run ``func`` ``repeat`` times for timing, then once more under tracemalloc.
+
+        Every run gets a fresh clone of ``queryset``, so each one pays for its
+        own query instead of reusing a result cache filled by an earlier run.
+
+        Returns:
+            tuple[float, int, list]: Best wall time in ms, peak traced memory in bytes, and the output.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        output = func(queryset.all(), request)
+        best = min(best, time.perf_counter() - started)
+
+    tracemalloc.start()
+    func(queryset.all(), request)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best * 1000, peak, output
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare VideoSerializer with the serialize_video_rows fast path for time and peak memory. "
+        "Synthetic rows are inserted in a transaction that is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        sizes = sorted(options["sizes"])
+        host = next((h for h in settings.ALLOWED_HOSTS if h and h != "*"), "localhost").lstrip(".")
+        request = RequestFactory().get("/api/video/", HTTP_HOST=host)
+
+        with transaction.atomic():
+            Video.objects.bulk_create(
+                (
+                    Video(
+                        title=f"Benchmark video {i}",
+                        description="Synthetic row created by bench_video_serializer. " * 4,
+                        category=f"Category {i % 12}",
+                        video_file=f"video/bench_{i}.mp4",
+                        conversion_status="completed",
+                    )
+                    for i in range(sizes[-1])
+                ),
+                batch_size=5_000,
+            )
+            ordered = Video.objects.order_by('-created_at', '-id')
+
+            self.stdout.write(f"{'rows':>8} {'path':<6} {'time ms':>10} {'peak MiB':>10}")
+            for size in sizes:
+                queryset = ordered[:size]
+                drf_ms, drf_peak, drf_data = _measure(_drf_path, queryset, request, options["repeat"])
+                fast_ms, fast_peak, fast_data = _measure(_fast_path, queryset, request, options["repeat"])
+                if JSONRenderer().render(drf_data) != JSONRenderer().render(fast_data):
+                    raise CommandError(f"Fast path output differs from VideoSerializer at {size} rows")
+
+                self.stdout.write(f"{size:>8} {'drf':<6} {drf_ms:>10.1f} {drf_peak / 2**20:>10.1f}")
+                self.stdout.write(f"{size:>8} {'fast':<6} {fast_ms:>10.1f} {fast_peak / 2**20:>10.1f}")
+                self.stdout.write(f"{'':>8} speedup x{drf_ms / fast_ms:.1f}, memory x{drf_peak / max(fast_peak, 1):.1f}")
+
+            transaction.set_rollback(True)
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from videoflix_app.api.media_gc import collect_orphan_media
+
+
+class Command(BaseCommand):
+    help = "Delete HLS trees, originals, archived originals and thumbnails that no Video row refers to."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be deleted.")
+
+    def handle(self, *args, **options):
+        report = collect_orphan_media(dry_run=options["dry_run"])
+        for kind, stats in report.items():
+            self.stdout.write(f"{kind:<11} {stats['count']:>6} orphans {stats['bytes'] / 2**20:>10.1f} MiB")
+        total = sum(stats["bytes"] for stats in report.values())
+        verb = "would be reclaimed" if options["dry_run"] else "reclaimed"
+        self.stdout.write(self.style.SUCCESS(f"{total / 2**20:.1f} MiB {verb}."))
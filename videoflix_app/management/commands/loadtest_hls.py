@@ -0,0 +1,386 @@
+import http.client
+import json
+import random
+import subprocess
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from http.cookies import SimpleCookie
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarks import percentile
+from videoflix_app.api.storage import get_media_store, hls_key
+from videoflix_app.api.utils import convert_and_save
+from videoflix_app.models import Video
+
+CATALOG_CATEGORY = "loadtest"
+USER_EMAIL = "loadtest-{}@loadtest.invalid"
+USER_PASSWORD = "loadtest-password"
+ENDPOINTS = ("login", "manifest", "segment")
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+
+
+def parse_playlist(body):
+    """
+        Return the ``(uri, duration)`` entries of a media playlist.
+    """
+    entries = []
+    duration = 0.0
+    for line in body.decode().splitlines():
+        line = line.strip()
+        if line.startswith("#EXTINF:"):
+            duration = float(line[len("#EXTINF:"):].split(",", 1)[0])
+        elif line and not line.startswith("#"):
+            entries.append((line, duration))
+    return entries
+
+
+class Stats:
+    """
+    Thread-safe latencies, status codes and bytes per endpoint.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.bytes = Counter()
+        self.redirects = Counter()
+
+    def record(self, endpoint, seconds, status, size, redirected=False):
+        with self.lock:
+            self.latencies[endpoint].append(seconds * 1000)
+            self.statuses[endpoint][status] += 1
+            self.bytes[endpoint] += size
+            self.redirects[endpoint] += redirected
+
+    def report(self, elapsed):
+        """
+            Returns:
+                dict: Per endpoint request count, throughput, latency percentiles (ms) and error rate.
+        """
+        report = {}
+        for endpoint in ENDPOINTS:
+            latencies = self.latencies.get(endpoint)
+            if not latencies:
+                continue
+            statuses = self.statuses[endpoint]
+            errors = sum(n for status, n in statuses.items() if not isinstance(status, int) or status >= 400)
+            report[endpoint] = {
+                "requests": len(latencies),
+                "requests_per_second": len(latencies) / elapsed,
+                "megabits_per_second": self.bytes[endpoint] * 8 / elapsed / 1e6,
+                "p50_ms": percentile(latencies, 50),
+                "p95_ms": percentile(latencies, 95),
+                "p99_ms": percentile(latencies, 99),
+                "max_ms": max(latencies),
+                "error_rate": errors / len(latencies),
+                "redirected": self.redirects[endpoint],
+                "statuses": {str(status): n for status, n in sorted(statuses.items(), key=str)},
+            }
+        return report
+
+
+class Player(threading.Thread):
+    """
+    One simulated viewer: logs in, then watches catalog videos at playback pace.
+
+    The player keeps up to ``buffer`` seconds of media ahead of its playhead,
+    like hls.js does, and seeks to a random segment (dropping the buffer)
+    ``seeks_per_minute`` times per minute of watched media on average.
+    """
+
+    def __init__(self, index, base_url, catalog, stats, deadline, options):
+        super().__init__(name=f"player-{index}", daemon=True)
+        self.email = USER_EMAIL.format(index)
+        self.base = urlsplit(base_url)
+        self.catalog = catalog
+        self.stats = stats
+        self.deadline = deadline
+        self.buffer = options["buffer"]
+        self.pace = options["pace"]
+        self.seeks_per_minute = options["seeks_per_minute"]
+        self.random = random.Random(index)
+        self.access_token = None
+        self.connection = None
+        self.redirect_connections = {}
+
+    def _connect(self, url):
+        cls = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+        return cls(url.hostname, url.port, timeout=30)
+
+    def _close_connections(self):
+        for connection in [self.connection, *self.redirect_connections.values()]:
+            if connection is not None:
+                connection.close()
+        self.connection = None
+        self.redirect_connections = {}
+
+    def _follow(self, location):
+        """
+            GET a redirect target (e.g. a presigned S3 URL) without the session cookie.
+
+            Keeps one keep-alive connection per target origin, like a browser would.
+        """
+        target = urlsplit(urljoin(self.base.geturl(), location))
+        origin = (target.scheme, target.netloc)
+        if origin not in self.redirect_connections:
+            self.redirect_connections[origin] = self._connect(target)
+        connection = self.redirect_connections[origin]
+        connection.request("GET", f"{target.path}?{target.query}" if target.query else target.path)
+        response = connection.getresponse()
+        return response, response.read()
+
+    def request(self, endpoint, method, path, body=None, follow=False):
+        """
+            Send one request over the player's keep-alive connection and record it.
+
+            With ``follow`` a redirect (remote media store) is followed and
+            recorded as one request: total latency, final status and the bytes
+            of the final body.
+
+            Returns:
+                tuple[http.client.HTTPResponse | None, bytes]: The response and its body; None on a connection error.
+        """
+        headers = {}
+        if self.access_token:
+            headers["Cookie"] = f"access_token={self.access_token}"
+        if body is not None:
+            body = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        if self.connection is None:
+            self.connection = self._connect(self.base)
+        started = time.perf_counter()
+        redirected = False
+        try:
+            self.connection.request(method, self.base.path.rstrip("/") + path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            data = response.read()
+            if follow and response.status in REDIRECT_STATUSES:
+                redirected = True
+                response, data = self._follow(response.headers["Location"])
+        except (OSError, http.client.HTTPException) as e:
+            self.stats.record(endpoint, time.perf_counter() - started, type(e).__name__, 0, redirected)
+            self._close_connections()
+            return None, b""
+        self.stats.record(endpoint, time.perf_counter() - started, response.status, len(data), redirected)
+        return response, data
+
+    def _sleep(self, seconds):
+        time.sleep(max(0.0, min(seconds, self.deadline - time.monotonic())))
+
+    def login(self):
+        """
+            Log in through CookieTokenObtainPairView, waiting out 429 responses.
+
+            Returns:
+                bool: Whether an access token cookie was received.
+        """
+        self.access_token = None
+        while time.monotonic() < self.deadline:
+            response, _ = self.request("login", "POST", "/api/login/", {"email": self.email, "password": USER_PASSWORD})
+            if response is None:
+                self._sleep(1)
+                continue
+            if response.status == 429:
+                self._sleep(float(response.headers.get("Retry-After", 1)))
+                continue
+            cookies = SimpleCookie()
+            for header in response.headers.get_all("Set-Cookie") or []:
+                cookies.load(header)
+            if response.status == 200 and "access_token" in cookies:
+                self.access_token = cookies["access_token"].value
+                return True
+            return False
+        return False
+
+    def run(self):
+        if not self.login():
+            return
+        while time.monotonic() < self.deadline:
+            video_id, resolutions = self.random.choice(self.catalog)
+            resolution = self.random.choice(resolutions)
+            response, body = self.request("manifest", "GET", f"/api/video/{video_id}/{resolution}/index.m3u8")
+            if response is not None and response.status == 401:
+                if not self.login():
+                    return
+                continue
+            if response is None or response.status != 200:
+                self._sleep(1)
+                continue
+            self.watch(video_id, resolution, parse_playlist(body))
+
+    def watch(self, video_id, resolution, segments):
+        """
+            Fetch the segments of one rendition in order, paced by a simulated playhead.
+        """
+        index = 0
+        ahead = 0.0
+        clock = time.monotonic()
+        while index < len(segments) and time.monotonic() < self.deadline:
+            uri, duration = segments[index]
+            if self.random.random() < self.seeks_per_minute * duration / 60:
+                index = self.random.randrange(len(segments))
+                ahead = 0.0
+                uri, duration = segments[index]
+
+            response, _ = self.request("segment", "GET", f"/api/video/{video_id}/{resolution}/{uri}/", follow=True)
+            if response is not None and response.status == 401:
+                if not self.login():
+                    return
+                continue
+            index += 1
+            if response is not None and response.status < 400:
+                ahead += duration / self.pace
+
+            now = time.monotonic()
+            ahead = max(0.0, ahead - (now - clock))
+            clock = now
+            if ahead > self.buffer:
+                self._sleep(ahead - self.buffer)
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the HLS endpoints of a running server with simulated concurrent players. "
+        "Builds a synthetic catalog from ffmpeg testsrc and test users in this database, "
+        "then reports throughput, p50/p95/p99 latency and error rates per endpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="Server to test; must use this database and media root.")
+        parser.add_argument(
+            "--players", type=int, default=25,
+            help="Concurrent players. All log in from this host, so more than the server's THROTTLE_LOGIN_IP (30/min) get 429s.",
+        )
+        parser.add_argument("--duration", type=int, default=120, help="Seconds to run.")
+        parser.add_argument("--ramp-up", type=int, default=10, help="Seconds over which players start.")
+        parser.add_argument("--videos", type=int, default=3, help="Catalog size; existing load-test videos are reused.")
+        parser.add_argument("--video-seconds", type=int, default=60, help="Length of newly generated videos.")
+        parser.add_argument("--video-size", default="1920x1080", help="Resolution of newly generated videos.")
+        parser.add_argument("--buffer", type=float, default=30.0, help="Seconds of media a player keeps buffered.")
+        parser.add_argument("--pace", type=float, default=1.0, help="Playback speed; 2 watches twice as fast.")
+        parser.add_argument("--seeks-per-minute", type=float, default=0.5)
+        parser.add_argument("--json", help="Also write the report to this file.")
+        parser.add_argument("--cleanup", action="store_true", help="Delete the load-test catalog and users, then exit.")
+
+    def handle(self, *args, **options):
+        if options["cleanup"]:
+            self.cleanup()
+            return
+
+        catalog = self.build_catalog(options["videos"], options["video_seconds"], options["video_size"])
+        self.create_users(options["players"])
+
+        stats = Stats()
+        started = time.monotonic()
+        deadline = started + options["duration"]
+        players = [
+            Player(index, options["base_url"], catalog, stats, deadline, options)
+            for index in range(options["players"])
+        ]
+        self.stdout.write(f"Starting {len(players)} players against {options['base_url']} for {options['duration']}s")
+        for index, player in enumerate(players):
+            time.sleep(max(0.0, started + options["ramp_up"] * index / len(players) - time.monotonic()))
+            player.start()
+        for player in players:
+            player.join(timeout=max(0.0, deadline - time.monotonic()) + 35)
+
+        report = stats.report(time.monotonic() - started)
+        self.print_report(report)
+        if "429" in report.get("login", {}).get("statuses", {}):
+            self.stdout.write(self.style.WARNING(
+                "Logins were throttled; raise THROTTLE_LOGIN_IP on the server for large player counts."
+            ))
+        if options["json"]:
+            Path(options["json"]).write_text(json.dumps(report, indent=2))
+
+    def build_catalog(self, count, seconds, size):
+        """
+            Make sure ``count`` converted load-test videos exist, generating the missing ones.
+
+            Sources are ffmpeg ``testsrc`` video with a sine tone and go through
+            ``convert_and_save``, so the HLS output is what real uploads produce.
+
+            Returns:
+                list[tuple[int, list[str]]]: Video ids with the renditions listed in their master playlist.
+        """
+        videos = list(Video.objects.filter(category=CATALOG_CATEGORY, conversion_status="completed").order_by("pk")[:count])
+        source_dir = Path(settings.MEDIA_ROOT) / "video"
+        source_dir.mkdir(parents=True, exist_ok=True)
+        for number in range(len(videos), count):
+            name = f"video/loadtest_{uuid.uuid4().hex}.mp4"
+            self.stdout.write(f"Generating {name} ({size}, {seconds}s)")
+            subprocess.run([
+                "ffmpeg", "-y", "-v", "error",
+                "-f", "lavfi", "-i", f"testsrc=size={size}:rate=25:duration={seconds}",
+                "-f", "lavfi", "-i", f"sine=frequency={440 + 110 * number}:duration={seconds}",
+                "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+                "-c:a", "aac", "-shortest",
+                str(Path(settings.MEDIA_ROOT) / name),
+            ], check=True)
+            # bulk_create skips post_save, so the conversion runs here instead of on the worker.
+            video, = Video.objects.bulk_create([Video(
+                title=f"Load test {number + 1}",
+                description="Synthetic testsrc video generated by loadtest_hls.",
+                category=CATALOG_CATEGORY,
+                video_file=name,
+                conversion_status="processing",
+            )])
+            convert_and_save(video.pk)
+            video = Video.objects.filter(pk=video.pk, conversion_status="completed").first()
+            if video is None:
+                raise CommandError(f"Converting {name} failed; see the log.")
+            videos.append(video)
+
+        store = get_media_store()
+        catalog = []
+        for video in videos:
+            master = store.read_bytes(hls_key(video.pk, "index.m3u8"))
+            if master is None:
+                raise CommandError(f"Video {video.pk} has no HLS master playlist.")
+            resolutions = [uri.split("/", 1)[0] for uri, _ in parse_playlist(master)]
+            catalog.append((video.pk, resolutions))
+        return catalog
+
+    def create_users(self, count):
+        """
+            Create the active users ``loadtest-<n>@loadtest.invalid`` that are still missing.
+        """
+        User = get_user_model()
+        emails = [USER_EMAIL.format(index) for index in range(count)]
+        existing = set(User.objects.filter(email__in=emails).values_list("email", flat=True))
+        password = make_password(USER_PASSWORD)
+        User.objects.bulk_create([
+            User(username=email.partition("@")[0], email=email, password=password, is_active=True)
+            for email in emails
+            if email not in existing
+        ])
+
+    def cleanup(self):
+        videos = Video.objects.filter(category=CATALOG_CATEGORY)
+        for video in videos:
+            video.delete()
+        users, _ = get_user_model().objects.filter(email__endswith="@loadtest.invalid").delete()
+        self.stdout.write(f"Deleted {len(videos)} videos and {users} users")
+
+    def print_report(self, report):
+        self.stdout.write(
+            f"{'endpoint':<9} {'requests':>9} {'req/s':>8} {'Mbit/s':>8} "
+            f"{'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'errors':>7}"
+        )
+        for endpoint, row in report.items():
+            self.stdout.write(
+                f"{endpoint:<9} {row['requests']:>9} {row['requests_per_second']:>8.1f} {row['megabits_per_second']:>8.1f} "
+                f"{row['p50_ms']:>6.1f}ms {row['p95_ms']:>6.1f}ms {row['p99_ms']:>6.1f}ms {row['max_ms']:>6.1f}ms "
+                f"{row['error_rate']:>6.1%}"
+            )
+            redirected = f", {row['redirected']} via redirect" if row["redirected"] else ""
+            self.stdout.write(f"{'':<9} statuses: {row['statuses']}{redirected}")
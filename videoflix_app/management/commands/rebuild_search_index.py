@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from videoflix_app.api.search import update_search_vector
+
+
+class Command(BaseCommand):
+    help = "Recompute Video.search_vector for every video, e.g. after changing SEARCH_CONFIG."
+
+    def handle(self, *args, **options):
+        updated = update_search_vector()
+        self.stdout.write(self.style.SUCCESS(f"Search vectors rebuilt for {updated} videos."))
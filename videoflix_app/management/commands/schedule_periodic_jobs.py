@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from core.jobs import ensure_periodic_jobs
+
+
+class Command(BaseCommand):
+    help = "Start the RQ jobs listed in PERIODIC_JOBS that are not already scheduled."
+
+    def handle(self, *args, **options):
+        started = ensure_periodic_jobs()
+        for path in started:
+            self.stdout.write(f"Scheduled {path}")
+        self.stdout.write(self.style.SUCCESS(f"{len(started)} periodic jobs started."))
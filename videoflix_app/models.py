@@ -1,3 +1,6 @@
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 
 class Video(models.Model):
@@ -7,6 +10,7 @@ class Video(models.Model):
     video_file = models.FileField(upload_to='video/')
     thumbnail_url = models.ImageField(upload_to="thumbnail/", blank=True, null=True)
     category = models.CharField(max_length=100, null=False, blank=False, default="Learning")
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
     conversion_status = models.CharField(
         max_length=20, 
         default='pending', 
@@ -14,5 +18,88 @@ class Video(models.Model):
         null=True 
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='video_created_at_id_idx'),
+            models.Index(fields=['category', '-created_at'], name='video_category_created_idx'),
+            GinIndex(fields=['search_vector'], name='video_search_vector_idx'),
+            GinIndex(fields=['title'], name='video_title_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
+
+    def __str__(self):
+        return self.title
+
+
+class WatchProgress(models.Model):
+    """
+    Last playback position of a user in a video.
+    Written in bulk from Redis by ``flush_watch_progress``, never per heartbeat.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='watch_progress')
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='watch_progress')
+    position = models.FloatField()
+    duration = models.FloatField(null=True, blank=True)
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'video'], name='watch_progress_user_video_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-updated_at'], name='watch_progress_user_recent_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} @ {self.video_id}: {self.position:.0f}s"
+
+
+class VideoHourlyStats(models.Model):
+    """
+    Requests per video rendition and hour, rolled up from the Redis counters
+    by ``rollup_popularity``.
+    """
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='hourly_stats')
+    hour = models.DateTimeField()
+    resolution = models.CharField(max_length=20)
+    segment_requests = models.PositiveBigIntegerField(default=0)
+    manifest_requests = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['video', 'hour', 'resolution'], name='video_hourly_stats_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['hour'], name='video_hourly_stats_hour_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.video_id} {self.resolution} {self.hour:%Y-%m-%d %H}:00"
+
+
+class ConversionTelemetry(models.Model):
+    """
+    Timings and output of one run of the conversion pipeline (``convert_and_save``).
+    Kept when a failed conversion deletes its video.
+    """
+    video = models.ForeignKey(Video, null=True, blank=True, on_delete=models.SET_NULL, related_name='conversion_telemetry')
+    source_video_id = models.BigIntegerField()
+    video_title = models.CharField(max_length=255)
+    status = models.CharField(max_length=20)
+    worker_host = models.CharField(max_length=255)
+    started_at = models.DateTimeField()
+    queued_seconds = models.FloatField(null=True, blank=True)
+    total_seconds = models.FloatField()
+    stages = models.JSONField(default=dict)
+    renditions = models.JSONField(default=dict)
+    source_duration = models.FloatField(null=True, blank=True)
+    encode_speed = models.FloatField(null=True, blank=True)
+    output_bytes = models.PositiveBigIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-started_at'], name='conversion_telemetry_recent'),
+        ]
+
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return f"{self.source_video_id} {self.status} {self.total_seconds:.1f}s"
@@ -1,3 +1,858 @@
-from django.test import TestCase
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock, skipIf
 
-# Create your tests here.
+import boto3
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+from redis.lock import Lock
+from prometheus_client import REGISTRY
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core import metrics
+
+from videoflix_app.api import manifest_cache, media_gc, popularity, progress, telemetry, utils
+from videoflix_app.api.catalog import (
+    CATALOG_VERSION_KEY, GROUPED_SNAPSHOT_KEY, bump_catalog_version, build_grouped_catalog, get_catalog_version,
+    serialize_grouped_catalog,
+)
+from videoflix_app.api.search import search_videos
+from videoflix_app.api.segment_cache import SegmentCache
+from videoflix_app.api.storage import LocalMediaStore, S3MediaStore, get_media_store
+from videoflix_app.api.views import VideoSearchView
+from videoflix_app.models import ConversionTelemetry, Video, VideoHourlyStats, WatchProgress
+
+try:
+    from moto import mock_aws
+except ImportError:  # moto is only in requirements-dev.txt
+    mock_aws = None
+
+
+class MediaRootTestCase(TestCase):
+    """
+    Points MEDIA_ROOT, VIDEO_ROOT and ORIGINAL_ARCHIVE_ROOT at a temporary
+    directory and uses the local media store.
+    """
+
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        override = override_settings(
+            MEDIA_ROOT=str(self.root / "media"),
+            VIDEO_ROOT=str(self.root / "hls"),
+            ORIGINAL_ARCHIVE_ROOT=str(self.root / "archive"),
+            MEDIA_STORE_BACKEND="local",
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        get_media_store.cache_clear()
+        self.addCleanup(get_media_store.cache_clear)
+
+    def create_video(self, name="clip.mp4"):
+        original = self.root / "media" / "video" / name
+        original.parent.mkdir(parents=True, exist_ok=True)
+        original.write_bytes(b"original upload")
+        return Video.objects.create(title="Clip", description="Test clip", video_file=f"video/{name}")
+
+    def publish_hls(self, video, complete=True):
+        tree = self.root / "hls" / str(video.pk)
+        (tree / "480p").mkdir(parents=True)
+        (tree / "index.m3u8").write_text("#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=800000\n480p/index.m3u8\n")
+        playlist = "#EXTM3U\n#EXTINF:6.0,\n000.ts\n"
+        (tree / "480p" / "index.m3u8").write_text(playlist + ("#EXT-X-ENDLIST\n" if complete else ""))
+
+
+class ManifestCacheTests(MediaRootTestCase):
+    """
+    Uses a fresh process LRU; the Redis entries of the test video are purged around each test.
+    """
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(manifest_cache, "_local", manifest_cache._LocalManifestCache(max_entries=8, ttl=60))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.video = self.create_video()
+        manifest_cache.purge_manifests(self.video.pk)
+        self.addCleanup(manifest_cache.purge_manifests, self.video.pk)
+        self.publish_hls(self.video)
+        self.playlist = self.root / "hls" / str(self.video.pk) / "480p" / "index.m3u8"
+
+    def test_lookup_fills_both_levels(self):
+        body, etag = manifest_cache.get_manifest(self.video.pk, "480p")
+        self.assertEqual(body, self.playlist.read_bytes())
+        self.assertEqual(etag, f'"{hashlib.sha1(body).hexdigest()}"')
+
+        self.playlist.write_text("#EXTM3U\n")
+        self.assertEqual(manifest_cache.get_manifest(self.video.pk, "480p")[0], body)
+        with mock.patch("videoflix_app.api.manifest_cache.time.monotonic", return_value=time.monotonic() + 61):
+            self.assertEqual(manifest_cache.get_manifest(self.video.pk, "480p")[0], body)
+
+    def test_purge_drops_both_levels(self):
+        manifest_cache.get_manifest(self.video.pk, "480p")
+        self.playlist.write_text("#EXTM3U\n")
+
+        manifest_cache.purge_manifests(self.video.pk)
+
+        self.assertEqual(manifest_cache.get_manifest(self.video.pk, "480p")[0], b"#EXTM3U\n")
+
+    def test_missing_or_invalid_rendition(self):
+        self.assertIsNone(manifest_cache.get_manifest(self.video.pk, "1080p"))
+        self.assertIsNone(manifest_cache.get_manifest(self.video.pk, "../480p"))
+        self.assertIsNone(cache.get(manifest_cache._redis_key(self.video.pk, "1080p")))
+
+    def test_warm_loads_every_rendition(self):
+        manifest_cache.warm_manifests(self.video.pk)
+        shutil.rmtree(self.root / "hls" / str(self.video.pk))
+
+        self.assertIsNotNone(manifest_cache.get_manifest(self.video.pk, "480p"))
+
+    def test_local_lru_evicts_least_recently_used(self):
+        local = manifest_cache._LocalManifestCache(max_entries=2, ttl=60)
+        local.set((1, "480p"), "a")
+        local.set((1, "720p"), "b")
+        local.get((1, "480p"))
+        local.set((2, "480p"), "c")
+
+        self.assertIsNone(local.get((1, "720p")))
+        self.assertEqual(local.get((1, "480p")), "a")
+
+
+class OriginalLifecycleTests(MediaRootTestCase):
+
+    @override_settings(ORIGINAL_LIFECYCLE_POLICY="delete")
+    def test_incomplete_hls_keeps_original(self):
+        video = self.create_video()
+        self.publish_hls(video, complete=False)
+
+        utils.apply_original_lifecycle(video)
+
+        self.assertTrue((self.root / "media" / "video" / "clip.mp4").exists())
+        self.assertEqual(Video.objects.get(pk=video.pk).video_file.name, "video/clip.mp4")
+
+    @override_settings(ORIGINAL_LIFECYCLE_POLICY="delete")
+    def test_missing_master_playlist_keeps_original(self):
+        video = self.create_video()
+
+        utils.apply_original_lifecycle(video)
+
+        self.assertTrue((self.root / "media" / "video" / "clip.mp4").exists())
+
+    @override_settings(ORIGINAL_LIFECYCLE_POLICY="delete")
+    def test_delete_removes_original_and_clears_field(self):
+        video = self.create_video()
+        self.publish_hls(video)
+
+        utils.apply_original_lifecycle(video)
+
+        self.assertFalse((self.root / "media" / "video" / "clip.mp4").exists())
+        self.assertEqual(video.video_file.name, "")
+        self.assertEqual(Video.objects.get(pk=video.pk).video_file.name, "")
+
+    @override_settings(ORIGINAL_LIFECYCLE_POLICY="move")
+    def test_move_archives_original_per_video(self):
+        video = self.create_video()
+        self.publish_hls(video)
+
+        utils.apply_original_lifecycle(video)
+
+        self.assertFalse((self.root / "media" / "video" / "clip.mp4").exists())
+        self.assertEqual((self.root / "archive" / str(video.pk) / "clip.mp4").read_bytes(), b"original upload")
+        self.assertEqual(Video.objects.get(pk=video.pk).video_file.name, "")
+
+
+class ConvertAndSaveTests(MediaRootTestCase):
+
+    @override_settings(ORIGINAL_LIFECYCLE_POLICY="delete")
+    def test_failed_encode_is_not_completed_and_skips_lifecycle(self):
+        video = self.create_video()
+        failure = subprocess.CalledProcessError(1, ["ffmpeg"], stderr="boom")
+        with mock.patch.object(utils, "create_video_thumbnail"), \
+                mock.patch.object(utils, "_get_resolution", return_value=(1280, 720)), \
+                mock.patch.object(utils, "_get_duration", return_value=10.0), \
+                mock.patch.object(utils, "_has_audio", return_value=False), \
+                mock.patch.object(utils, "_run_hls_encode", side_effect=failure), \
+                mock.patch.object(utils, "release_disk_reservation"), \
+                mock.patch.object(utils, "apply_original_lifecycle") as lifecycle:
+            utils.convert_and_save(video.pk)
+
+        lifecycle.assert_not_called()
+        self.assertFalse(Video.objects.filter(title="Clip").exists())
+
+
+class DiskAdmissionTests(MediaRootTestCase):
+
+    def disk_usage(self, free):
+        return mock.patch.object(utils.shutil, "disk_usage", return_value=SimpleNamespace(free=free))
+
+    @override_settings(HLS_DISK_RESERVE_BYTES=1000, HLS_DISK_BUDGET_BYTES=0)
+    def test_budget_keeps_reserve_free(self):
+        with self.disk_usage(1500), mock.patch.object(utils, "_reserved_bytes", return_value=0):
+            self.assertTrue(utils._has_disk_budget(500))
+            self.assertFalse(utils._has_disk_budget(501))
+
+    @override_settings(HLS_DISK_RESERVE_BYTES=1000, HLS_DISK_BUDGET_BYTES=0)
+    def test_budget_counts_running_reservations(self):
+        with self.disk_usage(1500), mock.patch.object(utils, "_reserved_bytes", return_value=400):
+            self.assertFalse(utils._has_disk_budget(200))
+
+    @override_settings(HLS_DISK_RESERVE_BYTES=0, HLS_DISK_BUDGET_BYTES=1000)
+    def test_budget_uses_running_hls_total(self):
+        with self.disk_usage(10 ** 9), mock.patch.object(utils, "_reserved_bytes", return_value=0), \
+                mock.patch.object(utils, "hls_bytes_used", return_value=900) as used:
+            self.assertTrue(utils._has_disk_budget(100))
+            self.assertFalse(utils._has_disk_budget(101))
+        used.assert_called()
+
+    def test_work_root_is_the_local_hls_root(self):
+        self.assertEqual(get_media_store().work_root, self.root / "hls")
+
+
+class AdmitConversionTests(MediaRootTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.redis = get_redis_connection("default")
+        self.video = self.create_video()
+        Video.objects.filter(pk=self.video.pk).update(conversion_status="deferred")
+        reservations_key = f"videoflix:test:reservations:{uuid.uuid4().hex}"
+        self.addCleanup(self.redis.delete, reservations_key)
+        for patcher in (
+            mock.patch.object(utils, "DISK_RESERVATIONS_KEY", reservations_key),
+            mock.patch.object(utils, "estimate_output_bytes", return_value=500),
+            mock.patch.object(utils, "django_rq"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def status(self):
+        return Video.objects.get(pk=self.video.pk).conversion_status
+
+    def test_deferred_video_is_processing_before_the_lock_is_released(self):
+        seen = []
+        release = Lock.release
+
+        def record_release(lock):
+            seen.append((self.status(), utils._reserved_bytes()))
+            release(lock)
+
+        with mock.patch.object(utils, "_has_disk_budget", return_value=True), \
+                mock.patch.object(Lock, "release", autospec=True, side_effect=record_release):
+            utils.admit_conversion(self.video.pk)
+
+        self.assertEqual(seen, [("processing", 500)])
+        self.assertEqual(int(self.redis.hget(utils.DISK_RESERVATIONS_KEY, self.video.pk)), 500)
+        utils.django_rq.enqueue.assert_called_once_with(utils.convert_and_save, self.video.pk)
+
+    def test_video_without_budget_stays_deferred(self):
+        with mock.patch.object(utils, "_has_disk_budget", return_value=False):
+            utils.admit_conversion(self.video.pk)
+
+        self.assertEqual(self.status(), "deferred")
+        self.assertIsNone(self.redis.hget(utils.DISK_RESERVATIONS_KEY, self.video.pk))
+        utils.django_rq.get_queue.return_value.enqueue_in.assert_called_once()
+
+    def test_busy_lock_retries_admission(self):
+        with mock.patch.object(Lock, "acquire", return_value=False):
+            utils.admit_conversion(self.video.pk)
+
+        enqueue_in = utils.django_rq.get_queue.return_value.enqueue_in
+        self.assertEqual(enqueue_in.call_args.args[1:], (utils.admit_conversion, self.video.pk))
+        utils.django_rq.enqueue.assert_not_called()
+        self.assertIsNone(self.redis.hget(utils.DISK_RESERVATIONS_KEY, self.video.pk))
+
+
+class HlsUsageTests(MediaRootTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.redis = get_redis_connection("default")
+        usage_key = f"videoflix:test:hls_bytes:{uuid.uuid4().hex}"
+        self.addCleanup(self.redis.delete, usage_key)
+        patcher = mock.patch.object(media_gc, "HLS_USAGE_KEY", usage_key)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_total_is_seeded_from_disk_and_adjusted(self):
+        video = self.create_video()
+        self.publish_hls(video)
+        on_disk = media_gc.tree_bytes(self.root / "hls")
+        self.assertEqual(media_gc.hls_bytes_used(), on_disk)
+
+        media_gc.adjust_hls_usage(100)
+        self.assertEqual(media_gc.hls_bytes_used(), on_disk + 100)
+        media_gc.delete_video_media(video.pk, "")
+        self.assertEqual(media_gc.hls_bytes_used(), 100)
+
+    def test_adjust_waits_for_seed(self):
+        media_gc.adjust_hls_usage(100)
+        self.assertIsNone(self.redis.get(media_gc.HLS_USAGE_KEY))
+
+
+class MediaDeletionTests(MediaRootTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.redis = get_redis_connection("default")
+        queue_key = f"videoflix:test:deletions:{uuid.uuid4().hex}"
+        self.addCleanup(self.redis.delete, queue_key)
+        for patcher in (
+            mock.patch.object(media_gc, "DELETION_QUEUE_KEY", queue_key),
+            mock.patch.object(media_gc, "django_rq"),
+            mock.patch.object(media_gc, "adjust_hls_usage"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def queue(self, video_id, video_file=""):
+        self.redis.rpush(media_gc.DELETION_QUEUE_KEY, json.dumps({"video_id": video_id, "video_file": video_file}))
+
+    def queued(self):
+        return [json.loads(raw) for raw in self.redis.lrange(media_gc.DELETION_QUEUE_KEY, 0, -1)]
+
+    def test_failed_deletion_is_requeued(self):
+        self.queue(1)
+        self.queue(2)
+        delete = media_gc.delete_video_media
+
+        def fail_first(video_id, video_file, store=None):
+            if video_id == 1:
+                raise OSError("disk busy")
+            return delete(video_id, video_file, store)
+
+        with mock.patch.object(media_gc, "delete_video_media", side_effect=fail_first):
+            media_gc.drain_media_deletions()
+
+        self.assertEqual(self.queued(), [{"video_id": 1, "video_file": "", "attempts": 1}])
+        enqueue_in = media_gc.django_rq.get_queue.return_value.enqueue_in
+        self.assertEqual(enqueue_in.call_args.args[1:], (media_gc.drain_media_deletions,))
+
+    @override_settings(MEDIA_DELETE_MAX_ATTEMPTS=2)
+    def test_deletion_is_dropped_after_max_attempts(self):
+        self.redis.rpush(
+            media_gc.DELETION_QUEUE_KEY, json.dumps({"video_id": 1, "video_file": "", "attempts": 1}),
+        )
+        with mock.patch.object(media_gc, "delete_video_media", side_effect=OSError("disk busy")):
+            media_gc.drain_media_deletions()
+
+        self.assertEqual(self.queued(), [])
+        media_gc.django_rq.get_queue.assert_not_called()
+
+
+@override_settings(MEDIA_GC_GRACE_SECONDS=60)
+class OrphanArchiveTests(MediaRootTestCase):
+
+    def archive(self, video_id, age):
+        archive_dir = self.root / "archive" / str(video_id)
+        archive_dir.mkdir(parents=True)
+        (archive_dir / "clip.mp4").write_bytes(b"archived original")
+        mtime = time.time() - age
+        os.utime(archive_dir, (mtime, mtime))
+        return archive_dir
+
+    def test_archives_without_video_are_collected(self):
+        video = self.create_video()
+        kept = self.archive(video.pk, age=3600)
+        orphan = self.archive(video.pk + 1000, age=3600)
+        recent = self.archive(video.pk + 1001, age=0)
+
+        with mock.patch.object(media_gc, "get_redis_connection"):
+            report = media_gc.collect_orphan_media()
+
+        self.assertEqual(report["archived"], {"count": 1, "bytes": len(b"archived original")})
+        self.assertTrue(kept.is_dir())
+        self.assertFalse(orphan.exists())
+        self.assertTrue(recent.is_dir())
+
+    def test_dry_run_keeps_archives(self):
+        orphan = self.archive(999999, age=3600)
+
+        report = media_gc.collect_orphan_media(dry_run=True)
+
+        self.assertEqual(report["archived"]["count"], 1)
+        self.assertTrue(orphan.is_dir())
+
+
+class WatchProgressTests(TestCase):
+    """
+    Uses a per-test dirty set in the Redis of the development stack.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="viewer", email="viewer@example.com", password="pw")
+        cls.first = Video.objects.create(title="First", description="First clip")
+        cls.second = Video.objects.create(title="Second", description="Second clip")
+
+    def setUp(self):
+        self.redis = get_redis_connection("default")
+        self.addCleanup(self.redis.delete, progress._user_key(self.user.pk))
+        dirty_key = f"videoflix:test:progress:dirty:{uuid.uuid4().hex}"
+        self.addCleanup(self.redis.delete, dirty_key)
+        patcher = mock.patch.object(progress, "DIRTY_ENTRIES_KEY", dirty_key)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def stored(self, video, position, age):
+        updated_at = timezone.now() - timedelta(seconds=age)
+        WatchProgress.objects.create(user=self.user, video=video, position=position, duration=100, updated_at=updated_at)
+
+    def test_redis_entries_take_precedence_over_postgres(self):
+        self.stored(self.first, 10, age=3600)
+        self.stored(self.second, 20, age=7200)
+        progress.record_progress(self.user.pk, self.first.pk, 50, 100)
+
+        entries = progress.get_user_progress(self.user.pk)
+
+        self.assertEqual([(e["video_id"], e["position"]) for e in entries], [(self.first.pk, 50), (self.second.pk, 20)])
+        with self.assertNumQueries(0):
+            self.assertEqual(progress.get_video_progress(self.user.pk, self.second.pk)["position"], 20)
+
+    def test_cold_video_lookup_loads_postgres(self):
+        self.stored(self.second, 20, age=60)
+
+        self.assertEqual(progress.get_video_progress(self.user.pk, self.second.pk)["position"], 20)
+        self.assertIsNone(progress.get_video_progress(self.user.pk, self.first.pk))
+
+    def test_failed_flush_keeps_entries_dirty(self):
+        progress.record_progress(self.user.pk, self.first.pk, 30, 100)
+
+        with mock.patch.object(progress, "_flush_entries", side_effect=RuntimeError("database down")):
+            with self.assertRaises(RuntimeError):
+                progress.flush_watch_progress()
+
+        self.assertEqual(self.redis.smembers(progress.DIRTY_ENTRIES_KEY), {f"{self.user.pk}:{self.first.pk}".encode()})
+        self.assertEqual(progress.flush_watch_progress(), 1)
+        self.assertEqual(WatchProgress.objects.get(user=self.user, video=self.first).position, 30)
+
+    def test_flush_drops_entries_of_deleted_videos(self):
+        deleted_id = self.second.pk
+        progress.record_progress(self.user.pk, self.first.pk, 30, 100)
+        progress.record_progress(self.user.pk, deleted_id, 40, 100)
+        self.second.delete()
+
+        self.assertEqual(progress.flush_watch_progress(), 1)
+
+        self.assertFalse(WatchProgress.objects.filter(video_id=deleted_id).exists())
+        self.assertIsNone(self.redis.hget(progress._user_key(self.user.pk), str(deleted_id)))
+        self.assertEqual(self.redis.scard(progress.DIRTY_ENTRIES_KEY), 0)
+
+
+class PopularityTests(TestCase):
+    """
+    Uses per-test Redis keys, a fresh request buffer and a fixed current hour; no flush thread is started.
+    """
+    HOUR = 500000
+
+    def setUp(self):
+        self.redis = get_redis_connection("default")
+        prefix = f"videoflix:test:popularity:{uuid.uuid4().hex}"
+        hour_keys = [f"{prefix}:{hour}" for hour in range(self.HOUR - 3, self.HOUR + 1)]
+        self.addCleanup(self.redis.delete, f"{prefix}:hours", *hour_keys)
+        for patcher in (
+            mock.patch.object(popularity, "HOURS_KEY", f"{prefix}:hours"),
+            mock.patch.object(popularity, "_hour_key", lambda hour: f"{prefix}:{hour}"),
+            mock.patch.object(popularity, "_current_hour", return_value=self.HOUR),
+            mock.patch.object(popularity, "_events", deque()),
+            mock.patch.object(popularity, "_flusher", object()),
+            mock.patch.object(popularity, "cache", LocMemCache("popularity-tests", {})),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.video = Video.objects.create(title="Popular", description="Popular clip")
+
+    def record(self, hour, video_id, segments):
+        self.redis.hset(popularity._hour_key(hour), f"{video_id}:480p:{popularity.SEGMENT}", segments)
+        self.redis.sadd(popularity.HOURS_KEY, hour)
+
+    def test_flush_aggregates_requests_per_rendition(self):
+        for _ in range(3):
+            popularity.count_request(self.video.pk, "480p")
+        popularity.count_request(self.video.pk, "480p", popularity.MANIFEST)
+
+        popularity.flush_counters()
+
+        self.assertEqual(self.redis.hgetall(popularity._hour_key(self.HOUR)), {
+            f"{self.video.pk}:480p:s".encode(): b"3",
+            f"{self.video.pk}:480p:m".encode(): b"1",
+        })
+        self.assertEqual(self.redis.smembers(popularity.HOURS_KEY), {str(self.HOUR).encode()})
+
+    def test_rollup_skips_open_hours_and_deleted_videos(self):
+        self.record(self.HOUR - 3, self.video.pk, 4)
+        self.record(self.HOUR - 3, 999999, 7)
+        self.record(self.HOUR - 1, self.video.pk, 2)
+
+        self.assertEqual(popularity.rollup_popularity(), 1)
+
+        stats = VideoHourlyStats.objects.get()
+        self.assertEqual((stats.video_id, stats.resolution, stats.segment_requests), (self.video.pk, "480p", 4))
+        self.assertEqual(stats.hour.timestamp(), (self.HOUR - 3) * 3600)
+        self.assertEqual(self.redis.smembers(popularity.HOURS_KEY), {str(self.HOUR - 1).encode()})
+        self.assertFalse(self.redis.exists(popularity._hour_key(self.HOUR - 3)))
+
+    def test_trending_adds_hours_not_rolled_up(self):
+        other = Video.objects.create(title="Other", description="Other clip")
+        self.record(self.HOUR - 3, self.video.pk, 4)
+        self.record(self.HOUR - 3, other.pk, 5)
+        popularity.rollup_popularity()
+        self.record(self.HOUR - 1, self.video.pk, 2)
+
+        self.assertEqual(popularity.get_trending(hours=24), [(self.video.pk, 6), (other.pk, 5)])
+        self.assertEqual(popularity.get_most_watched(), [(other.pk, 5), (self.video.pk, 4)])
+
+
+class SegmentCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.segment = self.root / "000.ts"
+        self.segment.write_bytes(b"x" * 1000)
+        self.cache = SegmentCache(max_bytes=4096, max_item_bytes=2048, sketch_width=64, ttl=60)
+        self.key = (1, "480p", "000.ts")
+
+    def test_admitted_segment_is_a_hit(self):
+        self.assertFalse(self.cache.touch(self.key))
+        self.assertTrue(self.cache.admit(self.key, self.segment))
+        self.assertTrue(self.cache.touch(self.key))
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["bytes"]), (1, 1, 1000))
+
+    def test_oversized_segment_is_not_admitted(self):
+        self.segment.write_bytes(b"x" * 3000)
+        self.assertFalse(self.cache.admit(self.key, self.segment))
+        self.assertFalse(self.cache.touch(self.key))
+
+    def test_popular_segments_are_not_displaced(self):
+        popular = [(1, "480p", f"{i:03}.ts") for i in range(4)]
+        for key in popular:
+            self.cache.touch(key)
+            self.cache.touch(key)
+            self.cache.admit(key, self.segment)
+        newcomer = (2, "480p", "000.ts")
+        self.cache.touch(newcomer)
+        self.assertFalse(self.cache.admit(newcomer, self.segment))
+        self.assertEqual(self.cache.stats()["rejections"], 1)
+
+    def test_purge_drops_the_video(self):
+        self.cache.admit(self.key, self.segment)
+        self.cache.purge(1)
+        self.assertFalse(self.cache.touch(self.key))
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    def test_entries_expire(self):
+        self.cache.admit(self.key, self.segment)
+        now = time.monotonic()
+        with mock.patch("videoflix_app.api.segment_cache.time.monotonic", return_value=now + 61):
+            self.assertFalse(self.cache.touch(self.key))
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    def test_expired_entries_of_other_videos_are_swept(self):
+        other = (2, "480p", "000.ts")
+        self.cache.admit(self.key, self.segment)
+        self.cache.admit(other, self.segment)
+        now = time.monotonic()
+        with mock.patch("videoflix_app.api.segment_cache.time.monotonic", return_value=now + 61):
+            self.cache.touch(self.key)
+        self.assertEqual(self.cache.stats()["bytes"], 0)
+
+
+class LocalMediaStoreTests(SimpleTestCase):
+
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.store = LocalMediaStore(self.root / "hls")
+
+    def test_upload_and_delete_prefix(self):
+        source = self.root / "000.ts"
+        source.write_bytes(b"x" * 100)
+        self.store.upload_file(source, "7/480p/000.ts")
+        self.store.upload_file(source, "8/480p/000.ts")
+
+        self.assertEqual(self.store.read_bytes("7/480p/000.ts"), b"x" * 100)
+        self.assertEqual(self.store.delete_prefix(7), 100)
+        self.assertIsNone(self.store.read_bytes("7/480p/000.ts"))
+        self.assertEqual([video_id for video_id, _ in self.store.iter_video_ids()], [8])
+
+    def test_presigned_url_is_the_video_url(self):
+        self.assertEqual(self.store.presigned_url("7/480p/000.ts"), "/video/7/480p/000.ts")
+
+
+@skipIf(mock_aws is None, "moto is not installed (pip install -r requirements-dev.txt)")
+class S3MediaStoreTests(SimpleTestCase):
+    """
+    Runs the S3 backend against moto's in-process S3.
+    """
+
+    def setUp(self):
+        aws = mock_aws()
+        aws.start()
+        self.addCleanup(aws.stop)
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket="videoflix")
+        scratch = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, scratch, ignore_errors=True)
+        self.store = S3MediaStore(
+            bucket="videoflix", prefix="hls", endpoint_url=None, public_endpoint_url="https://media.example.com",
+            region="us-east-1", access_key="test", secret_key="test", presign_ttl=60, scratch_root=scratch,
+        )
+        self.source = Path(scratch) / "000.ts"
+        self.source.write_bytes(b"x" * 100)
+
+    def head(self, key):
+        return self.store.client.head_object(Bucket="videoflix", Key=f"hls/{key}")
+
+    def test_upload_sets_prefix_and_content_type(self):
+        self.store.upload_file(self.source, "7/480p/000.ts")
+
+        self.assertEqual(self.head("7/480p/000.ts")["ContentType"], "video/mp2t")
+        self.assertEqual(self.store.read_bytes("7/480p/000.ts"), b"x" * 100)
+        self.assertIsNone(self.store.read_bytes("7/480p/001.ts"))
+
+    def test_iter_playlists(self):
+        playlist = self.source.with_name("index.m3u8")
+        playlist.write_text("#EXTM3U\n")
+        self.store.upload_file(playlist, "7/480p/index.m3u8")
+        self.store.upload_file(playlist, "7/index.m3u8")
+        self.store.upload_file(self.source, "7/480p/000.ts")
+
+        self.assertEqual(list(self.store.iter_playlists(7)), [("480p", b"#EXTM3U\n")])
+
+    def test_delete_prefix_only_removes_one_video(self):
+        for key in ("7/480p/000.ts", "7/480p/001.ts", "70/480p/000.ts"):
+            self.store.upload_file(self.source, key)
+
+        self.assertEqual(self.store.delete_prefix(7), 200)
+        self.assertIsNone(self.store.read_bytes("7/480p/000.ts"))
+        self.assertEqual(self.store.read_bytes("70/480p/000.ts"), b"x" * 100)
+        self.assertEqual([video_id for video_id, _ in self.store.iter_video_ids()], [70])
+
+    def test_iter_video_ids_reports_newest_object(self):
+        started = time.time() - 1
+        for key in ("7/480p/000.ts", "7/index.m3u8", "8/480p/000.ts"):
+            self.store.upload_file(self.source, key)
+
+        trees = dict(self.store.iter_video_ids())
+        self.assertEqual(sorted(trees), [7, 8])
+        self.assertTrue(all(modified >= started for modified in trees.values()))
+
+    def test_presigned_url_uses_public_endpoint(self):
+        url = self.store.presigned_url("7/480p/000.ts")
+
+        self.assertTrue(url.startswith("https://media.example.com/videoflix/hls/7/480p/000.ts?"), url)
+        self.assertIn("X-Amz-Expires=60", url)
+
+
+class GroupedCatalogTests(TestCase):
+
+    def setUp(self):
+        self.addCleanup(cache.delete, GROUPED_SNAPSHOT_KEY)
+
+    def test_thumbnail_urls_are_built_per_field(self):
+        tricky = Video.objects.create(title='Quote "/media/thumbnail/" in title', description="d", category="Drama")
+        Video.objects.create(title="Other", description="d", category="Comedy")
+        groups, etag = build_grouped_catalog()
+        request = APIRequestFactory().get("/api/video/", HTTP_HOST="cdn.example.com")
+
+        with override_settings(MEDIA_URL="/assets/"):
+            data = serialize_grouped_catalog(groups, request)
+
+        video = next(group for group in data if group["category"] == "Drama")["videos"][0]
+        self.assertEqual(video["title"], tricky.title)
+        self.assertEqual(video["thumbnail_url"], f"http://cdn.example.com/assets/thumbnail/{tricky.pk}.jpg")
+        self.assertEqual(build_grouped_catalog()[1], etag)
+
+
+class VideoSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="searcher", email="searcher@example.com", password="pw")
+        cls.title_match = Video.objects.create(title="Kubernetes Basics", description="Containers in production")
+        cls.description_match = Video.objects.create(title="Cluster Operations", description="Running kubernetes nodes")
+        cls.unrelated = Video.objects.create(title="Baking Bread", description="Sourdough for beginners")
+
+    def titles(self, term):
+        return [video.title for video in search_videos(term)]
+
+    def test_title_matches_rank_first(self):
+        self.assertEqual(self.titles("kubernetes"), ["Kubernetes Basics", "Cluster Operations"])
+
+    def test_terms_are_stemmed(self):
+        self.assertEqual(self.titles("containers running"), [])
+        self.assertEqual(self.titles("container"), ["Kubernetes Basics"])
+
+    def test_typos_fall_back_to_title_similarity(self):
+        self.assertEqual(self.titles("Kubernetis Basic"), ["Kubernetes Basics"])
+
+    def test_vector_follows_title_changes(self):
+        self.unrelated.title = "Kubernetes Bread"
+        self.unrelated.save()
+        self.assertIn("Kubernetes Bread", self.titles("kubernetes"))
+
+    def test_view_requires_a_term(self):
+        factory = APIRequestFactory()
+        request = factory.get("/api/video/search/", {"q": "  "})
+        force_authenticate(request, user=self.user)
+        self.assertEqual(VideoSearchView.as_view()(request).status_code, 400)
+
+        request = factory.get("/api/video/search/", {"q": "bread"})
+        force_authenticate(request, user=self.user)
+        response = VideoSearchView.as_view()(request)
+        self.assertEqual([video["title"] for video in response.data["results"]], ["Baking Bread"])
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class CatalogVersionTests(SimpleTestCase):
+
+    def test_evicted_version_never_goes_back(self):
+        version = get_catalog_version()
+        bump_catalog_version()
+        self.assertEqual(get_catalog_version(), version + 1)
+
+        cache.delete(CATALOG_VERSION_KEY)
+        with mock.patch("videoflix_app.api.catalog.time.time", return_value=time.time() + 1):
+            self.assertGreater(get_catalog_version(), version + 1)
+
+
+@mock.patch("core.metrics.generate_latest", return_value=b"")
+class MetricsViewTests(SimpleTestCase):
+
+    def get(self, **headers):
+        return metrics.metrics_view(APIRequestFactory().get("/metrics", **headers))
+
+    @override_settings(METRICS_TOKEN="", DEBUG="False")
+    def test_refused_without_token_in_production(self, generate):
+        self.assertEqual(self.get().status_code, 403)
+        generate.assert_not_called()
+
+    @override_settings(METRICS_TOKEN="", DEBUG="True")
+    def test_open_without_token_in_debug(self, generate):
+        self.assertEqual(self.get().status_code, 200)
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_token_is_required(self, generate):
+        self.assertEqual(self.get().status_code, 403)
+        self.assertEqual(self.get(HTTP_AUTHORIZATION="Bearer wrong").status_code, 403)
+        self.assertEqual(self.get(HTTP_AUTHORIZATION="Bearer s3cret").status_code, 200)
+
+
+class MetricsMiddlewareTests(SimpleTestCase):
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_records_latency_stages_and_size(self):
+        def view(request):
+            with metrics.stage("fs"):
+                pass
+            return HttpResponse(b"abc")
+
+        before = (
+            self.sample("videoflix_request_seconds_count", endpoint="unmatched", method="GET", status="200"),
+            self.sample("videoflix_request_stage_seconds_count", endpoint="unmatched", stage="fs"),
+            self.sample("videoflix_response_bytes_sum", endpoint="unmatched"),
+        )
+        metrics.MetricsMiddleware(view)(APIRequestFactory().get("/somewhere"))
+
+        self.assertEqual(
+            self.sample("videoflix_request_seconds_count", endpoint="unmatched", method="GET", status="200"), before[0] + 1,
+        )
+        self.assertEqual(self.sample("videoflix_request_stage_seconds_count", endpoint="unmatched", stage="fs"), before[1] + 1)
+        self.assertEqual(self.sample("videoflix_response_bytes_sum", endpoint="unmatched"), before[2] + 3)
+
+    def test_stage_outside_a_request_is_a_no_op(self):
+        with metrics.stage("fs"):
+            pass
+
+
+class ConversionTelemetryTests(TestCase):
+
+    def setUp(self):
+        self.video = Video.objects.create(title="Encoded", description="Encoded clip")
+
+    def test_run_is_stored_with_stage_timings(self):
+        renditions = {"480p": {"bytes": 100, "segments": 2}, "720p": {"bytes": 300, "segments": 2}}
+        clock = mock.Mock(perf_counter=mock.Mock(side_effect=[0.0, 1.0, 3.0, 10.0]))
+        with mock.patch.object(telemetry, "time", clock):
+            with telemetry.record_conversion(self.video) as run:
+                with telemetry.stage("encode"):
+                    telemetry.record(source_duration=60.0, renditions=renditions)
+                run.save("completed")
+
+        row = ConversionTelemetry.objects.get()
+        self.assertEqual((row.video, row.status, row.total_seconds), (self.video, "completed", 10.0))
+        self.assertEqual(row.stages, {"encode": 2.0})
+        self.assertEqual((row.encode_speed, row.output_bytes), (30.0, 400))
+        self.assertIsNone(row.queued_seconds)
+
+    def test_failed_stage_is_noted_and_kept_after_the_video_is_deleted(self):
+        with telemetry.record_conversion(self.video) as run:
+            with self.assertRaises(RuntimeError):
+                with telemetry.stage("probe"):
+                    raise RuntimeError("no streams")
+            self.video.delete()
+            run.save("failed")
+
+        row = ConversionTelemetry.objects.get()
+        self.assertIsNone(row.video)
+        self.assertEqual((row.source_video_id, row.video_title), (run.video_id, "Encoded"))
+        self.assertIn("probe: RuntimeError('no streams')", row.error)
+        self.assertIn("probe", row.stages)
+
+    def test_stage_and_record_outside_a_run_are_no_ops(self):
+        with telemetry.stage("encode"):
+            telemetry.record(source_duration=60.0)
+        self.assertFalse(ConversionTelemetry.objects.exists())
+
+
+@override_settings(RQ_QUEUES={"default": {}, "low": {}})
+class RQQueueCollectorTests(SimpleTestCase):
+
+    def collect(self, queues):
+        with mock.patch.object(metrics.django_rq, "get_queue", side_effect=queues.get):
+            return {
+                family.name: {sample.labels["queue"]: sample.value for sample in family.samples}
+                for family in metrics.RQQueueCollector().collect()
+            }
+
+    def test_depth_and_age_of_the_oldest_job(self):
+        job = SimpleNamespace(enqueued_at=datetime.now(dt_timezone.utc).replace(tzinfo=None) - timedelta(seconds=30))
+        busy = mock.Mock(count=3)
+        busy.get_job_ids.return_value = ["job"]
+        busy.fetch_job.return_value = job
+        empty = mock.Mock(count=0)
+        empty.get_job_ids.return_value = []
+
+        families = self.collect({"default": busy, "low": empty})
+
+        self.assertEqual(families["videoflix_rq_queue_depth"], {"default": 3, "low": 0})
+        self.assertAlmostEqual(families["videoflix_rq_oldest_job_age_seconds"]["default"], 30, delta=5)
+        self.assertEqual(families["videoflix_rq_oldest_job_age_seconds"]["low"], 0.0)
+
+    def test_unreadable_queue_is_skipped(self):
+        broken = mock.Mock(count=1)
+        broken.get_job_ids.side_effect = RedisError("connection refused")
+        empty = mock.Mock(count=0)
+        empty.get_job_ids.return_value = []
+
+        families = self.collect({"default": broken, "low": empty})
+
+        self.assertEqual(families["videoflix_rq_oldest_job_age_seconds"], {"low": 0.0})